@@ -5,10 +5,14 @@ import sys
 import os
 from dotenv import load_dotenv
 
+# Permitir importar los módulos del backend (pacing.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pacing import AdaptivePacer
+
 # Cargar variables de entorno
 load_dotenv()
 
-def validate_emails_batch(emails, client):
+def validate_emails_batch(emails, client, pacer=None):
     # Preparar el input para el actor
     run_input = {
         "emails": emails
@@ -16,6 +20,7 @@ def validate_emails_batch(emails, client):
     
     try:
         # Ejecutar el actor de validación de correos
+        run_started = time.monotonic()
         run = client.actor("Bo8mCdzyMcSK2mbTN").call(run_input=run_input)
         
         # Obtener los resultados
@@ -25,10 +30,14 @@ def validate_emails_batch(emails, client):
             is_valid = item.get('Deliverable Email', 'False') == 'True'
             results.append(is_valid)
         
+        if pacer:
+            pacer.record_success(len(emails), time.monotonic() - run_started)
         return results
     
     except Exception as e:
         print(f"Error al validar el lote de correos: {str(e)}")
+        if pacer:
+            pacer.record_failure(e)
         return [False] * len(emails)
 
 try:
@@ -66,21 +75,26 @@ try:
     if total_emails > 0:
         print(f"Iniciando validación de {total_emails} correos...")
         
-        # Validar en lotes de 10 correos
-        batch_size = 10
+        # Validar en lotes que empiezan en 10 correos y se adaptan al ritmo de la API
+        pacer = AdaptivePacer(batch_size=10, min_batch_size=5, max_batch_size=100, batch_step=5, delay=1.0)
         validated_results = []
         
-        for i in range(0, total_emails, batch_size):
+        i = 0
+        while i < total_emails:
+            batch_size = pacer.batch_size
             batch = emails_to_validate[i:i + batch_size]
             print(f"\nValidando correos {i+1} a {min(i+batch_size, total_emails)} de {total_emails}...")
             
             # Validar el lote actual
-            batch_results = validate_emails_batch(batch, client)
+            batch_results = validate_emails_batch(batch, client, pacer)
             validated_results.extend(batch_results)
+            i += len(batch)
             
-            # Esperar 1 segundo entre lotes para no sobrecargar la API
-            if i + batch_size < total_emails:
-                time.sleep(1)
+            # Pausa entre lotes para no sobrecargar la API (crece tras errores)
+            if i < total_emails:
+                time.sleep(pacer.delay)
+        
+        print(f"\nRitmo de validación: {pacer.stats()}")
         
         # Crear un diccionario de correos y sus resultados
         email_validation_dict = dict(zip(emails_to_validate, validated_results))
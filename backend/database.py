@@ -1,21 +1,443 @@
 import sqlite3
 import pandas as pd
 import os
+import json
+import base64
+import re
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+from url_utils import canonicalize_profile_url, canonicalize_search_url
 
 logger = logging.getLogger(__name__)
 
+# Columnas de perfiles que pueden pedirse por proyección (``fields=``)
+PROFILE_COLUMNS = (
+    'id', 'fullName', 'headline', 'linkedin_id', 'lastName', 'location', 'picture',
+    'profileId', 'profileUrl', 'canonical_url', 'email', 'mobileNumber', 'email_checked',
+    'hubspot_id', 'hubspot_synced_at', 'created_at', 'updated_at'
+)
+
+# Columnas de la tabla jobs; las de JOB_JSON_COLUMNS se guardan como JSON
+JOB_COLUMNS = (
+    'id', 'type', 'status', 'params', 'progress', 'result', 'error', 'stages',
+    'created_at', 'started_at', 'finished_at', 'priority', 'dedup_key'
+)
+JOB_JSON_COLUMNS = ('params', 'progress', 'result', 'stages')
+
+def encode_cursor(*values) -> str:
+    """Codificar la clave de la última fila de una página como cursor opaco"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> List:
+    """Decodificar un cursor generado por ``encode_cursor``"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Cursor de paginación inválido")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Cursor de paginación inválido")
+    return values
+
+# Claves por sentencia en las búsquedas masivas por clave
+DEFAULT_LOOKUP_CHUNK_SIZE = 5000
+
+# Conexiones del pool global: una por hilo de trabajo (las fijan en sus tramos de
+# base de datos) más margen para los hilos de Flask
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', str(int(os.getenv('JOB_WORKERS', '4')) + 8)))
+
+def fetch_by_keys(cursor, query: str, keys: List, chunk_size: int = DEFAULT_LOOKUP_CHUNK_SIZE) -> List:
+    """Ejecutar una consulta por bloques de claves y devolver todas las filas.
+
+    ``query`` marca con ``{keys}`` el lugar de la lista de claves, que se
+    sustituye por ``SELECT value FROM json_each(?)``: un único parámetro por
+    bloque, de modo que no hay límite de variables de SQLite y el texto de la
+    sentencia (y su plan en caché) es siempre el mismo.
+    """
+    sql = query.format(keys='SELECT value FROM json_each(?)')
+    rows = []
+    for start in range(0, len(keys), chunk_size):
+        cursor.execute(sql, (json.dumps(keys[start:start + chunk_size]),))
+        rows.extend(cursor.fetchall())
+    return rows
+
+def project_columns(fields: Optional[List[str]], table_alias: str = '') -> List[str]:
+    """Validar una proyección de columnas; siempre incluye la clave de paginación"""
+    if not fields:
+        columns = list(PROFILE_COLUMNS)
+    else:
+        unknown = [f for f in fields if f not in PROFILE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+        columns = ['id', 'created_at'] + [f for f in fields if f not in ('id', 'created_at')]
+    prefix = f'{table_alias}.' if table_alias else ''
+    return [f'{prefix}{column}' for column in columns]
+
+# Upsert de un perfil por URL canónica. Los valores vacíos del scraping no
+# sobrescriben datos existentes y el WHERE evita reescribir filas sin cambios.
+UPSERT_PROFILE_SQL = '''
+    INSERT INTO profiles
+    (fullName, headline, linkedin_id, lastName, location, picture, profileId, profileUrl, canonical_url, email, mobileNumber, email_checked)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(canonical_url) DO UPDATE SET
+        fullName = COALESCE(NULLIF(excluded.fullName, ''), profiles.fullName),
+        headline = COALESCE(NULLIF(excluded.headline, ''), profiles.headline),
+        linkedin_id = COALESCE(NULLIF(excluded.linkedin_id, ''), profiles.linkedin_id),
+        lastName = COALESCE(NULLIF(excluded.lastName, ''), profiles.lastName),
+        location = COALESCE(NULLIF(excluded.location, ''), profiles.location),
+        picture = COALESCE(NULLIF(excluded.picture, ''), profiles.picture),
+        profileId = COALESCE(NULLIF(excluded.profileId, ''), profiles.profileId),
+        email = COALESCE(NULLIF(excluded.email, ''), profiles.email),
+        mobileNumber = COALESCE(NULLIF(excluded.mobileNumber, ''), profiles.mobileNumber),
+        email_checked = MAX(profiles.email_checked, excluded.email_checked),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (excluded.fullName != '' AND excluded.fullName IS NOT profiles.fullName)
+       OR (excluded.headline != '' AND excluded.headline IS NOT profiles.headline)
+       OR (excluded.linkedin_id != '' AND excluded.linkedin_id IS NOT profiles.linkedin_id)
+       OR (excluded.lastName != '' AND excluded.lastName IS NOT profiles.lastName)
+       OR (excluded.location != '' AND excluded.location IS NOT profiles.location)
+       OR (excluded.picture != '' AND excluded.picture IS NOT profiles.picture)
+       OR (excluded.profileId != '' AND excluded.profileId IS NOT profiles.profileId)
+       OR (excluded.email != '' AND excluded.email IS NOT profiles.email)
+       OR (excluded.mobileNumber != '' AND excluded.mobileNumber IS NOT profiles.mobileNumber)
+       OR excluded.email_checked > profiles.email_checked
+    RETURNING id
+'''
+
+def build_match_query(search_term: str) -> Optional[str]:
+    """Convertir el texto del usuario en una consulta FTS5 de prefijos (todos los términos)"""
+    terms = re.findall(r'\w+', search_term or '', re.UNICODE)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+# Pragmas del modo concurrente: WAL permite lectores simultáneos a un escritor
+WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,       # ~64 MB de caché de páginas por conexión
+    'mmap_size': 268435456,     # 256 MB mapeados en memoria
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY'
+}
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Optional[Dict]):
+    """Aplicar pragmas a una conexión recién abierta"""
+    for name, value in (pragmas or {}).items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite con afinidad por hilo.
+
+    Cada hilo reutiliza su conexión mientras la tenga prestada (llamadas
+    anidadas no vuelven al pool) y los hilos de larga duración pueden fijarla
+    con ``pinned()``. Las conexiones ociosas se verifican antes de reutilizarse.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 30.0,
+                 health_check_interval: float = 30.0, pragmas: Optional[Dict] = None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = pragmas
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        # LIFO para reutilizar primero la conexión con la caché más caliente
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'thread_hits': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_check_failures': 0
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _create_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _checkout(self) -> sqlite3.Connection:
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.max_size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        conn = self._create_connection()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    self._count('misses')
+                    return conn
+
+                # Pool lleno: esperar a que otro hilo devuelva una conexión
+                self._count('waits')
+                try:
+                    conn, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    self._count('timeouts')
+                    raise sqlite3.OperationalError(
+                        f"No hay conexiones disponibles en el pool tras {self.timeout}s"
+                    )
+
+            if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+                self._count('health_check_failures')
+                self._discard(conn)
+                continue
+
+            self._count('hits')
+            return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        if self._closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Prestar una conexión; las llamadas anidadas del mismo hilo la comparten"""
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            self._count('thread_hits')
+            local.depth += 1
+            try:
+                yield conn
+            finally:
+                local.depth -= 1
+            return
+
+        conn = self._checkout()
+        local.conn = conn
+        local.depth = 1
+        try:
+            yield conn
+        finally:
+            local.depth -= 1
+            if local.depth == 0 and not getattr(local, 'pinned', False):
+                local.conn = None
+                self._release(conn)
+
+    @contextmanager
+    def pinned(self):
+        """Fijar una conexión al hilo actual mientras dure el bloque (hilos de trabajo largos)"""
+        local = self._local
+        if getattr(local, 'pinned', False):
+            yield
+            return
+        local.pinned = True
+        try:
+            with self.connection():
+                yield
+        finally:
+            local.pinned = False
+            conn = getattr(local, 'conn', None)
+            if conn is not None and getattr(local, 'depth', 0) == 0:
+                local.conn = None
+                self._release(conn)
+
+    def stats(self) -> Dict:
+        """Contadores de aciertos/fallos y ocupación del pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._created
+        stats['idle'] = self._idle.qsize()
+        stats['max_size'] = self.max_size
+        return stats
+
+    def close_all(self):
+        """Cerrar las conexiones ociosas y dejar de aceptar devoluciones"""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+class WriteQueue:
+    """Hilo escritor único que agrupa las escrituras encoladas en una sola transacción.
+
+    Cada operación recibe la conexión del escritor y corre dentro de un
+    SAVEPOINT propio, de modo que un error sólo revierte esa operación y el
+    resto del grupo se confirma con un único COMMIT.
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict] = None, max_group_size: int = 64):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.max_group_size = max_group_size
+        self._queue = queue.Queue()
+        self._stats = {'operations': 0, 'commits': 0, 'failed': 0, 'max_group': 0}
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, operation) -> Future:
+        """Encolar una operación ``operation(conn)`` y devolver su Future"""
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                group = [item]
+                stop = False
+                while len(group) < self.max_group_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    group.append(item)
+                self._execute_group(conn, group)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _execute_group(self, conn: sqlite3.Connection, group: List):
+        completed = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for operation, future in group:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT write_op')
+                try:
+                    result = operation(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_op')
+                    conn.execute('RELEASE write_op')
+                    self._stats['failed'] += 1
+                    future.set_exception(e)
+                else:
+                    conn.execute('RELEASE write_op')
+                    completed.append((future, result))
+            conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Error en la transacción del escritor: {str(e)}")
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # Nada del grupo quedó confirmado: propagar el error a todos
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._stats['operations'] += len(group)
+        self._stats['commits'] += 1
+        self._stats['max_group'] = max(self._stats['max_group'], len(group))
+        for future, result in completed:
+            future.set_result(result)
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "profiles.db"):
+    def __init__(self, db_path: str = "profiles.db", pool_size: int = 8, concurrency_mode: str = "default",
+                 lookup_chunk_size: int = DEFAULT_LOOKUP_CHUNK_SIZE):
+        """``concurrency_mode='wal'`` activa WAL y envía todas las escrituras al hilo escritor"""
         self.db_path = db_path
+        self.lookup_chunk_size = lookup_chunk_size
+        self.concurrency_mode = concurrency_mode
+        pragmas = WAL_PRAGMAS if concurrency_mode == 'wal' else None
+        self.pool = ConnectionPool(db_path, max_size=pool_size, pragmas=pragmas)
         self.init_database()
+        self.writer = WriteQueue(db_path, pragmas) if concurrency_mode == 'wal' else None
     
+    @contextmanager
+    def _connection(self):
+        """Obtener una conexión del pool; confirma al salir o revierte si hay error"""
+        with self.pool.connection() as conn:
+            try:
+                yield conn
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            else:
+                if conn.in_transaction:
+                    conn.commit()
+
+    def _write(self, operation):
+        """Ejecutar ``operation(conn)`` como escritura.
+
+        En modo WAL la operación se encola en el hilo escritor y se espera su
+        resultado; en modo normal se ejecuta con una conexión del pool.
+        """
+        if self.writer is not None:
+            return self.writer.submit(operation).result()
+        with self._connection() as conn:
+            return operation(conn)
+
+    def get_pool_stats(self) -> Dict:
+        """Obtener estadísticas del pool de conexiones"""
+        stats = self.pool.stats()
+        if self.writer is not None:
+            stats['writer'] = self.writer.stats()
+        return stats
+
     def init_database(self):
         """Inicializar la base de datos y crear las tablas necesarias"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 # Crear tabla de búsquedas
@@ -26,11 +448,31 @@ class DatabaseManager:
                         description TEXT,
                         search_url TEXT NOT NULL,
                         status TEXT DEFAULT 'active',
+                        profile_count INTEGER NOT NULL DEFAULT 0,
+                        last_found_at TIMESTAMP,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 ''')
                 
+                # Migrar bases anteriores al conteo desnormalizado de perfiles
+                added_profile_count = self._ensure_column(cursor, 'searches', 'profile_count', 'INTEGER NOT NULL DEFAULT 0')
+                self._ensure_column(cursor, 'searches', 'last_found_at', 'TIMESTAMP')
+                # Refresco periódico: cada cuántas horas se vuelve a scrapear (NULL = nunca)
+                # y cuándo terminó el último scraping
+                self._ensure_column(cursor, 'searches', 'refresh_interval_hours', 'INTEGER')
+                self._ensure_column(cursor, 'searches', 'last_scraped_at', 'TIMESTAMP')
+                # URL de búsqueda canónica, para reconocer la misma búsqueda escrita distinto
+                if self._ensure_column(cursor, 'searches', 'canonical_search_url', 'TEXT'):
+                    cursor.execute('SELECT id, search_url FROM searches')
+                    cursor.executemany(
+                        'UPDATE searches SET canonical_search_url = ? WHERE id = ?',
+                        [(canonicalize_search_url(row[1]), row[0]) for row in cursor.fetchall()]
+                    )
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_searches_canonical_url ON searches(canonical_search_url)
+                ''')
+                
                 # Crear tabla de perfiles
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS profiles (
@@ -43,14 +485,24 @@ class DatabaseManager:
                         picture TEXT,
                         profileId TEXT,
                         profileUrl TEXT UNIQUE,
+                        canonical_url TEXT,
                         email TEXT,
                         mobileNumber TEXT,
                         email_checked BOOLEAN DEFAULT FALSE,
+                        hubspot_id TEXT,
+                        hubspot_synced_at TIMESTAMP,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 ''')
                 
+                # Migrar bases existentes anteriores a la columna canonical_url
+                self._ensure_column(cursor, 'profiles', 'canonical_url', 'TEXT')
+                
+                # Migrar bases anteriores a la exportación a HubSpot
+                self._ensure_column(cursor, 'profiles', 'hubspot_id', 'TEXT')
+                self._ensure_column(cursor, 'profiles', 'hubspot_synced_at', 'TIMESTAMP')
+                
                 # Crear tabla de relación muchos a muchos entre búsquedas y perfiles
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS search_profiles (
@@ -85,84 +537,535 @@ class DatabaseManager:
                     CREATE INDEX IF NOT EXISTS idx_searches_status ON searches(status)
                 ''')
                 
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_searches_profile_count ON searches(profile_count DESC)
+                ''')
+                
+                # Índices para la paginación por cursor
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_profiles_created_id ON profiles(created_at, id)
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_search_profiles_page ON search_profiles(search_id, found_at, id)
+                ''')
+                
+                # Índice de texto completo para search_profiles
+                self.fts_enabled = self._init_search_index(cursor)
+                
+                # Contadores materializados para las estadísticas
+                self._init_statistics(cursor)
+                
+                # Conteo de perfiles por búsqueda mantenido por triggers
+                self._init_search_counts(cursor, backfill=added_profile_count)
+                
+                # Estado por perfil de la búsqueda de emails (intentos, reintentos)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS enrichment_state (
+                        profile_id INTEGER PRIMARY KEY,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        last_attempt_at TIMESTAMP,
+                        status TEXT NOT NULL DEFAULT 'pending',
+                        next_eligible_at TIMESTAMP,
+                        FOREIGN KEY (profile_id) REFERENCES profiles (id) ON DELETE CASCADE
+                    )
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_enrichment_state_eligible ON enrichment_state(next_eligible_at)
+                ''')
+                
+                # Registro persistente de trabajos en segundo plano (scraping, emails, HubSpot)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        type TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        params TEXT,
+                        progress TEXT,
+                        result TEXT,
+                        error TEXT,
+                        stages TEXT,
+                        created_at TIMESTAMP,
+                        started_at TIMESTAMP,
+                        finished_at TIMESTAMP,
+                        updated_at TIMESTAMP
+                    )
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_jobs_type_created ON jobs(type, created_at)
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)
+                ''')
+                
+                # Prioridad del planificador y clave de deduplicación (p. ej. la URL de búsqueda)
+                self._ensure_column(cursor, 'jobs', 'priority', 'INTEGER NOT NULL DEFAULT 0')
+                self._ensure_column(cursor, 'jobs', 'dedup_key', 'TEXT')
+                
+                # Las claves foráneas no están activas: limpiar el estado al borrar el perfil
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS enrichment_state_profile_delete AFTER DELETE ON profiles BEGIN
+                        DELETE FROM enrichment_state WHERE profile_id = old.id;
+                    END
+                ''')
+                
                 conn.commit()
-                logger.info("Base de datos inicializada correctamente")
+            
+            # Completar canonical_url en filas antiguas y crear su índice único
+            self.backfill_canonical_urls()
+            logger.info("Base de datos inicializada correctamente")
                 
         except Exception as e:
             logger.error(f"Error al inicializar la base de datos: {str(e)}")
             raise
     
-    def insert_profile(self, profile_data: Dict) -> bool:
-        """Insertar un nuevo perfil en la base de datos"""
+    def _init_search_index(self, cursor) -> bool:
+        """Crear la tabla FTS5 de perfiles y los triggers que la sincronizan.
+
+        Si la tabla no existía se reconstruye con los perfiles actuales.
+        Devuelve False si SQLite no tiene FTS5 (se usa LIKE como respaldo).
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profiles_fts'")
+        existed = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS profiles_fts USING fts5(
+                    fullName, headline, location, email, mobileNumber,
+                    content='profiles', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 no disponible, la búsqueda usará LIKE: {str(e)}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS profiles_fts_insert AFTER INSERT ON profiles BEGIN
+                INSERT INTO profiles_fts(rowid, fullName, headline, location, email, mobileNumber)
+                VALUES (new.id, new.fullName, new.headline, new.location, new.email, new.mobileNumber);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS profiles_fts_delete AFTER DELETE ON profiles BEGIN
+                INSERT INTO profiles_fts(profiles_fts, rowid, fullName, headline, location, email, mobileNumber)
+                VALUES ('delete', old.id, old.fullName, old.headline, old.location, old.email, old.mobileNumber);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS profiles_fts_update
+            AFTER UPDATE OF fullName, headline, location, email, mobileNumber ON profiles BEGIN
+                INSERT INTO profiles_fts(profiles_fts, rowid, fullName, headline, location, email, mobileNumber)
+                VALUES ('delete', old.id, old.fullName, old.headline, old.location, old.email, old.mobileNumber);
+                INSERT INTO profiles_fts(rowid, fullName, headline, location, email, mobileNumber)
+                VALUES (new.id, new.fullName, new.headline, new.location, new.email, new.mobileNumber);
+            END
+        ''')
+        
+        if not existed:
+            cursor.execute("INSERT INTO profiles_fts(profiles_fts) VALUES ('rebuild')")
+            logger.info("Índice de búsqueda de texto completo creado")
+        return True
+    
+    def _init_statistics(self, cursor):
+        """Crear la tabla de contadores y los triggers que la mantienen al día.
+
+        Si la tabla no existía se siembra con ``recompute_statistics``.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'")
+        existed = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        # Cada trigger suma o resta la contribución de la fila a cada contador
+        profile_delta = '''
+            UPDATE stats_counters SET value = value + {sign} * CASE name
+                WHEN 'total_profiles' THEN 1
+                WHEN 'profiles_with_email' THEN ({row}.email IS NOT NULL AND {row}.email != '')
+                WHEN 'profiles_checked' THEN ({row}.email_checked = 1)
+                WHEN 'profiles_unchecked' THEN ({row}.email_checked = 0)
+                WHEN 'profiles_with_url' THEN ({row}.profileUrl IS NOT NULL AND {row}.profileUrl != '')
+                ELSE 0 END
+            WHERE name IN ('total_profiles', 'profiles_with_email', 'profiles_checked',
+                           'profiles_unchecked', 'profiles_with_url');
+        '''
+        search_delta = '''
+            UPDATE stats_counters SET value = value + {sign} * CASE name
+                WHEN 'total_searches' THEN 1
+                WHEN 'active_searches' THEN ({row}.status = 'active')
+                ELSE 0 END
+            WHERE name IN ('total_searches', 'active_searches');
+        '''
+        # Un perfil cuenta como único en búsquedas mientras tenga al menos una relación
+        link_added = '''
+            UPDATE stats_counters SET value = value + 1
+            WHERE name = 'unique_profiles'
+            AND (SELECT COUNT(*) FROM search_profiles WHERE profile_id = new.profile_id) = 1;
+        '''
+        link_removed = '''
+            UPDATE stats_counters SET value = value - 1
+            WHERE name = 'unique_profiles'
+            AND NOT EXISTS (SELECT 1 FROM search_profiles WHERE profile_id = old.profile_id);
+        '''
+        triggers = {
+            'stats_profiles_insert': ('AFTER INSERT ON profiles',
+                                      profile_delta.format(sign='1', row='new')),
+            'stats_profiles_delete': ('AFTER DELETE ON profiles',
+                                      profile_delta.format(sign='-1', row='old')),
+            'stats_profiles_update': ('AFTER UPDATE OF email, email_checked, profileUrl ON profiles',
+                                      profile_delta.format(sign='-1', row='old') + profile_delta.format(sign='1', row='new')),
+            'stats_searches_insert': ('AFTER INSERT ON searches',
+                                      search_delta.format(sign='1', row='new')),
+            'stats_searches_delete': ('AFTER DELETE ON searches',
+                                      search_delta.format(sign='-1', row='old')),
+            'stats_searches_update': ('AFTER UPDATE OF status ON searches',
+                                      search_delta.format(sign='-1', row='old') + search_delta.format(sign='1', row='new')),
+            'stats_links_insert': ('AFTER INSERT ON search_profiles', link_added),
+            'stats_links_delete': ('AFTER DELETE ON search_profiles', link_removed),
+            'stats_links_update': ('AFTER UPDATE OF profile_id ON search_profiles', link_removed + link_added),
+        }
+        for name, (event, body) in triggers.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
+        
+        if not existed:
+            self._write_statistics(cursor, self._compute_statistics(cursor))
+    
+    def _init_search_counts(self, cursor, backfill: bool = False):
+        """Triggers que mantienen searches.profile_count y searches.last_found_at.
+
+        Con ``backfill`` se calculan una vez los valores de las búsquedas existentes.
+        """
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS search_counts_insert AFTER INSERT ON search_profiles BEGIN
+                UPDATE searches SET
+                    profile_count = profile_count + 1,
+                    last_found_at = CASE
+                        WHEN last_found_at IS NULL OR new.found_at > last_found_at THEN new.found_at
+                        ELSE last_found_at END
+                WHERE id = new.search_id;
+            END
+        ''')
+        # Al borrar, last_found_at se recalcula con el índice (search_id, found_at, id)
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS search_counts_delete AFTER DELETE ON search_profiles BEGIN
+                UPDATE searches SET
+                    profile_count = profile_count - 1,
+                    last_found_at = (SELECT MAX(found_at) FROM search_profiles WHERE search_id = old.search_id)
+                WHERE id = old.search_id;
+            END
+        ''')
+        if backfill:
+            cursor.execute('''
+                UPDATE searches SET
+                    profile_count = (SELECT COUNT(*) FROM search_profiles WHERE search_id = searches.id),
+                    last_found_at = (SELECT MAX(found_at) FROM search_profiles WHERE search_id = searches.id)
+            ''')
+    
+    def _compute_statistics(self, cursor) -> Dict[str, int]:
+        """Calcular todos los contadores con un solo recorrido por tabla (agregación condicional)"""
+        cursor.execute('''
+            SELECT
+                COUNT(*),
+                COALESCE(SUM(email IS NOT NULL AND email != ''), 0),
+                COALESCE(SUM(email_checked = 1), 0),
+                COALESCE(SUM(email_checked = 0), 0),
+                COALESCE(SUM(profileUrl IS NOT NULL AND profileUrl != ''), 0)
+            FROM profiles
+        ''')
+        total, with_email, checked, unchecked, with_url = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(status = 'active'), 0) FROM searches")
+        total_searches, active_searches = cursor.fetchone()
+        cursor.execute('SELECT COUNT(DISTINCT profile_id) FROM search_profiles')
+        unique_profiles = cursor.fetchone()[0]
+        return {
+            'total_profiles': total,
+            'profiles_with_email': with_email,
+            'profiles_checked': checked,
+            'profiles_unchecked': unchecked,
+            'profiles_with_url': with_url,
+            'total_searches': total_searches,
+            'active_searches': active_searches,
+            'unique_profiles': unique_profiles
+        }
+    
+    def _write_statistics(self, cursor, statistics: Dict[str, int]):
+        cursor.executemany(
+            'INSERT OR REPLACE INTO stats_counters (name, value) VALUES (?, ?)',
+            list(statistics.items())
+        )
+    
+    def recompute_statistics(self) -> Dict[str, int]:
+        """Recalcular los contadores desde cero (reparación si se editó la base a mano)"""
+        def operation(conn):
+            cursor = conn.cursor()
+            statistics = self._compute_statistics(cursor)
+            self._write_statistics(cursor, statistics)
+            return statistics
+        
+        return self._write(operation)
+    
+    def get_statistics(self) -> Dict[str, int]:
+        """Leer los contadores materializados (lectura O(1))"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
-                
+                cursor.execute('SELECT name, value FROM stats_counters')
+                return {row['name']: row['value'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error al obtener contadores de estadísticas: {str(e)}")
+            return {}
+    
+    def rebuild_search_index(self) -> bool:
+        """Reconstruir el índice FTS5 a partir de la tabla de perfiles"""
+        if not self.fts_enabled:
+            logger.warning("FTS5 no disponible, no hay índice que reconstruir")
+            return False
+        
+        def operation(conn):
+            conn.execute("INSERT INTO profiles_fts(profiles_fts) VALUES ('rebuild')")
+            conn.execute("INSERT INTO profiles_fts(profiles_fts) VALUES ('optimize')")
+            return True
+        
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al reconstruir el índice de búsqueda: {str(e)}")
+            return False
+    
+    def _ensure_column(self, cursor, table: str, column: str, declaration: str) -> bool:
+        """Agregar una columna a una tabla existente si todavía no la tiene.
+
+        Devuelve True si la columna se acaba de crear.
+        """
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+            return True
+        return False
+    
+    def backfill_canonical_urls(self, batch_size: int = 1000) -> int:
+        """Migración única: calcular canonical_url de las filas antiguas por lotes.
+
+        Cada lote se confirma por separado. Después fusiona los perfiles que
+        resultan duplicados al normalizar (conservando el de menor id, sus
+        búsquedas y los datos de contacto) y crea el índice único.
+        """
+        filled = 0
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_profiles_canonical_url'
+            ''')
+            index_exists = cursor.fetchone() is not None
+            
+            last_id = 0
+            while True:
                 cursor.execute('''
-                    INSERT OR IGNORE INTO profiles 
-                    (fullName, headline, linkedin_id, lastName, location, picture, profileId, profileUrl, email, mobileNumber, email_checked)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    profile_data.get('fullName', ''),
-                    profile_data.get('headline', ''),
-                    profile_data.get('id', ''),
-                    profile_data.get('lastName', ''),
-                    profile_data.get('location', ''),
-                    profile_data.get('picture', ''),
-                    profile_data.get('profileId', ''),
-                    profile_data.get('profileUrl', ''),
-                    profile_data.get('email', ''),
-                    profile_data.get('mobileNumber', ''),
-                    profile_data.get('email_checked', False)
-                ))
-                
+                    SELECT id, profileUrl FROM profiles
+                    WHERE canonical_url IS NULL AND profileUrl IS NOT NULL AND profileUrl != '' AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                updates = [(canonicalize_profile_url(row['profileUrl']), row['id']) for row in rows]
+                # Con el índice ya creado, una fila que colisiona queda para la fusión manual
+                cursor.executemany(
+                    f"UPDATE {'OR IGNORE ' if index_exists else ''}profiles SET canonical_url = ? WHERE id = ?",
+                    updates
+                )
                 conn.commit()
-                return cursor.rowcount > 0
-                
+                filled += len(updates)
+            
+            if not index_exists:
+                merged = self._merge_duplicate_canonical_urls(cursor)
+                cursor.execute('''
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_profiles_canonical_url ON profiles(canonical_url)
+                ''')
+                conn.commit()
+                if merged:
+                    logger.info(f"Perfiles duplicados fusionados al normalizar URLs: {merged}")
+        
+        if filled:
+            logger.info(f"URLs canónicas completadas: {filled}")
+        return filled
+    
+    def _merge_duplicate_canonical_urls(self, cursor) -> int:
+        """Fusionar perfiles que comparten canonical_url en el de menor id"""
+        cursor.execute('''
+            SELECT canonical_url, MIN(id) AS keep_id
+            FROM profiles
+            WHERE canonical_url IS NOT NULL
+            GROUP BY canonical_url
+            HAVING COUNT(*) > 1
+        ''')
+        merged = 0
+        for row in cursor.fetchall():
+            keep_id = row['keep_id']
+            cursor.execute('''
+                SELECT id, email, mobileNumber, email_checked FROM profiles
+                WHERE canonical_url = ? AND id != ?
+            ''', (row['canonical_url'], keep_id))
+            for duplicate in cursor.fetchall():
+                cursor.execute('''
+                    UPDATE profiles SET
+                        email = COALESCE(NULLIF(email, ''), ?),
+                        mobileNumber = COALESCE(NULLIF(mobileNumber, ''), ?),
+                        email_checked = MAX(email_checked, ?)
+                    WHERE id = ?
+                ''', (duplicate['email'], duplicate['mobileNumber'], duplicate['email_checked'], keep_id))
+                cursor.execute('''
+                    UPDATE OR IGNORE search_profiles SET profile_id = ? WHERE profile_id = ?
+                ''', (keep_id, duplicate['id']))
+                cursor.execute('DELETE FROM search_profiles WHERE profile_id = ?', (duplicate['id'],))
+                cursor.execute('DELETE FROM profiles WHERE id = ?', (duplicate['id'],))
+                merged += 1
+        return merged
+    
+    def insert_profile(self, profile_data: Dict) -> bool:
+        """Insertar un nuevo perfil en la base de datos"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                INSERT OR IGNORE INTO profiles 
+                (fullName, headline, linkedin_id, lastName, location, picture, profileId, profileUrl, canonical_url, email, mobileNumber, email_checked)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                profile_data.get('fullName', ''),
+                profile_data.get('headline', ''),
+                profile_data.get('id', ''),
+                profile_data.get('lastName', ''),
+                profile_data.get('location', ''),
+                profile_data.get('picture', ''),
+                profile_data.get('profileId', ''),
+                profile_data.get('profileUrl', ''),
+                canonicalize_profile_url(profile_data.get('profileUrl')),
+                profile_data.get('email', ''),
+                profile_data.get('mobileNumber', ''),
+                profile_data.get('email_checked', False)
+            ))
+
+            return cursor.rowcount > 0
+
+        try:
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al insertar perfil: {str(e)}")
             return False
     
     def insert_profiles_batch(self, profiles: List[Dict]) -> int:
         """Insertar múltiples perfiles en la base de datos"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            data_to_insert = []
+            for profile in profiles:
+                data_to_insert.append((
+                    profile.get('fullName', ''),
+                    profile.get('headline', ''),
+                    profile.get('id', ''),
+                    profile.get('lastName', ''),
+                    profile.get('location', ''),
+                    profile.get('picture', ''),
+                    profile.get('profileId', ''),
+                    profile.get('profileUrl', ''),
+                    canonicalize_profile_url(profile.get('profileUrl')),
+                    profile.get('email', ''),
+                    profile.get('mobileNumber', ''),
+                    profile.get('email_checked', False)
+                ))
+
+            # rowcount suma las filas insertadas por cada sentencia sin contar las de los
+            # triggers de contadores (conn.total_changes sí las cuenta)
+            cursor.executemany('''
+                INSERT OR IGNORE INTO profiles
+                (fullName, headline, linkedin_id, lastName, location, picture, profileId, profileUrl, canonical_url, email, mobileNumber, email_checked)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', data_to_insert)
+
+            return cursor.rowcount
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                data_to_insert = []
-                for profile in profiles:
-                    data_to_insert.append((
-                        profile.get('fullName', ''),
-                        profile.get('headline', ''),
-                        profile.get('id', ''),
-                        profile.get('lastName', ''),
-                        profile.get('location', ''),
-                        profile.get('picture', ''),
-                        profile.get('profileId', ''),
-                        profile.get('profileUrl', ''),
-                        profile.get('email', ''),
-                        profile.get('mobileNumber', ''),
-                        profile.get('email_checked', False)
-                    ))
-                
-                cursor.executemany('''
-                    INSERT OR IGNORE INTO profiles 
-                    (fullName, headline, linkedin_id, lastName, location, picture, profileId, profileUrl, email, mobileNumber, email_checked)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', data_to_insert)
-                
-                conn.commit()
-                return cursor.rowcount
-                
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al insertar perfiles en lote: {str(e)}")
             return 0
     
+    def upsert_profiles_batch(self, profiles: List[Dict], search_id: Optional[int] = None) -> Dict:
+        """Insertar o actualizar perfiles y vincularlos a una búsqueda en una sola transacción.
+
+        Cada perfil se resuelve con ``INSERT ... ON CONFLICT(canonical_url) DO
+        UPDATE ... RETURNING id``. Los campos vacíos no pisan datos existentes y
+        las filas sin cambios no se reescriben. Devuelve los IDs por URL canónica
+        y el desglose de insertados, actualizados y sin cambios.
+        """
+        def operation(conn):
+            cursor = conn.cursor()
+            # Los IDs AUTOINCREMENT son crecientes: todo id mayor es una inserción
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM profiles')
+            max_id_before = cursor.fetchone()[0]
+            
+            result = {'ids': {}, 'inserted': [], 'updated': [], 'unchanged': [], 'invalid': [], 'linked': 0}
+            for profile in profiles:
+                canonical_url = canonicalize_profile_url(profile.get('profileUrl'))
+                if not canonical_url:
+                    result['invalid'].append(profile.get('profileUrl', ''))
+                    continue
+                if canonical_url in result['ids']:
+                    continue
+                
+                cursor.execute(UPSERT_PROFILE_SQL, (
+                    profile.get('fullName') or '',
+                    profile.get('headline') or '',
+                    profile.get('id') or '',
+                    profile.get('lastName') or '',
+                    profile.get('location') or '',
+                    profile.get('picture') or '',
+                    profile.get('profileId') or '',
+                    profile.get('profileUrl'),
+                    canonical_url,
+                    profile.get('email') or '',
+                    profile.get('mobileNumber') or '',
+                    bool(profile.get('email_checked', False))
+                ))
+                row = cursor.fetchone()
+                if row is not None:
+                    profile_id = row[0]
+                    result['inserted' if profile_id > max_id_before else 'updated'].append(profile_id)
+                else:
+                    # Sin cambios: el DO UPDATE no se aplicó y RETURNING no devuelve fila
+                    cursor.execute('SELECT id FROM profiles WHERE canonical_url = ?', (canonical_url,))
+                    profile_id = cursor.fetchone()[0]
+                    result['unchanged'].append(profile_id)
+                result['ids'][canonical_url] = profile_id
+            
+            if search_id and result['ids']:
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO search_profiles (search_id, profile_id)
+                    VALUES (?, ?)
+                ''', [(search_id, profile_id) for profile_id in result['ids'].values()])
+                result['linked'] = cursor.rowcount
+            return result
+        
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al insertar/actualizar perfiles en lote: {str(e)}")
+            raise
+    
     def get_all_profiles(self) -> List[Dict]:
         """Obtener todos los perfiles de la base de datos"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -176,11 +1079,59 @@ class DatabaseManager:
             logger.error(f"Error al obtener perfiles: {str(e)}")
             return []
     
+    def get_profiles_page(self, limit: int = 100, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict:
+        """Obtener una página de perfiles ordenada por (created_at, id) descendente.
+
+        ``cursor`` es el ``next_cursor`` de la página anterior. Lanza ValueError
+        si el cursor o los campos pedidos no son válidos.
+        """
+        columns = project_columns(fields)
+        params = []
+        where = ''
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            where = 'WHERE (created_at, id) < (?, ?)'
+            params.extend([created_at, last_id])
+        params.append(limit + 1)
+        
+        with self._connection() as conn:
+            cursor_db = conn.cursor()
+            cursor_db.execute(f'''
+                SELECT {', '.join(columns)} FROM profiles
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', params)
+            rows = [dict(row) for row in cursor_db.fetchall()]
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+        return {'profiles': rows, 'next_cursor': next_cursor, 'has_more': has_more}
+    
+    def iter_profiles(self, fields: Optional[List[str]] = None, batch_size: int = 500):
+        """Iterar todos los perfiles en bloques de ``fetchmany`` sin cargarlos en memoria.
+
+        La conexión queda prestada hasta agotar o cerrar el generador.
+        """
+        columns = project_columns(fields)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(columns)} FROM profiles
+                ORDER BY created_at DESC, id DESC
+            ''')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+    
     def get_profiles_without_email(self) -> List[Dict]:
         """Obtener perfiles que no han sido verificados para email"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -198,67 +1149,249 @@ class DatabaseManager:
             logger.error(f"Error al obtener perfiles sin email: {str(e)}")
             return []
     
-    def update_profile_contact_info(self, profile_url: str, email: str, mobile_number: str) -> bool:
-        """Actualizar información de contacto de un perfil"""
+    def count_profiles_pending_enrichment(self) -> int:
+        """Perfiles que ``claim_profiles_for_enrichment`` reservaría ahora"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
+                return conn.execute('''
+                    SELECT COUNT(*) FROM profiles p
+                    LEFT JOIN enrichment_state e ON e.profile_id = p.id
+                    WHERE p.email_checked = FALSE
+                    AND p.profileUrl IS NOT NULL
+                    AND p.profileUrl != ''
+                    AND (e.next_eligible_at IS NULL OR e.next_eligible_at <= datetime('now'))
+                ''').fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error al contar perfiles pendientes de búsqueda de emails: {str(e)}")
+            return 0
+    
+    def claim_profiles_for_enrichment(self, limit: Optional[int] = None, lease_seconds: int = 3600) -> List[Dict]:
+        """Reservar los perfiles pendientes de búsqueda de email que no están en espera.
+
+        Cada perfil reservado suma un intento y queda ``in_progress`` hasta
+        ``lease_seconds``: si el proceso se interrumpe, vuelve a ser elegible
+        al vencer la reserva. Los perfiles con ``next_eligible_at`` futuro se omiten.
+        """
+        def operation(conn):
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT p.* FROM profiles p
+                LEFT JOIN enrichment_state e ON e.profile_id = p.id
+                WHERE p.email_checked = FALSE
+                AND p.profileUrl IS NOT NULL
+                AND p.profileUrl != ''
+                AND (e.next_eligible_at IS NULL OR e.next_eligible_at <= datetime('now'))
+                ORDER BY p.created_at DESC
+                LIMIT ?
+            ''', (limit if limit is not None else -1,))
+            profiles = [dict(row) for row in cursor.fetchall()]
+            
+            cursor.execute('''
+                INSERT INTO enrichment_state (profile_id, attempts, last_attempt_at, status, next_eligible_at)
+                SELECT value, 1, datetime('now'), 'in_progress', datetime('now', ?)
+                FROM json_each(?)
+                WHERE true
+                ON CONFLICT(profile_id) DO UPDATE SET
+                    attempts = attempts + 1,
+                    last_attempt_at = excluded.last_attempt_at,
+                    status = excluded.status,
+                    next_eligible_at = excluded.next_eligible_at
+            ''', (f'+{int(lease_seconds)} seconds', json.dumps([profile['id'] for profile in profiles])))
+            return profiles
+        
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al reservar perfiles para búsqueda de emails: {str(e)}")
+            return []
+    
+    def record_enrichment_outcome(self, profile_ids: List[int], status: str,
+                                  backoff_seconds: int = 21600, max_attempts: int = 3) -> int:
+        """Registrar el resultado de un lote de la búsqueda de emails (checkpoint).
+
+        ``status`` es ``done`` (el actor devolvió datos), ``no_result`` (no
+        devolvió nada para el perfil) o ``failed`` (falló la ejecución). En los
+        dos últimos casos el perfil espera ``backoff_seconds * 2^(intentos-1)``
+        antes de volver a intentarse; tras ``max_attempts`` intentos queda
+        ``exhausted`` y se marca email_checked para no volver a enviarlo.
+        """
+        if status not in ('done', 'no_result', 'failed'):
+            raise ValueError(f"Estado de búsqueda de email desconocido: {status}")
+        if not profile_ids:
+            return 0
+        
+        def operation(conn):
+            cursor = conn.cursor()
+            ids = json.dumps(list(profile_ids))
+            
+            if status == 'done':
+                cursor.execute('''
+                    UPDATE enrichment_state SET status = 'done', next_eligible_at = NULL
+                    WHERE profile_id IN (SELECT value FROM json_each(?))
+                ''', (ids,))
+                return cursor.rowcount
+            
+            cursor.execute('''
+                UPDATE enrichment_state SET
+                    status = CASE WHEN attempts >= ? THEN 'exhausted' ELSE ? END,
+                    next_eligible_at = CASE WHEN attempts >= ? THEN NULL
+                        ELSE datetime('now', '+' || (? << (attempts - 1)) || ' seconds') END
+                WHERE profile_id IN (SELECT value FROM json_each(?))
+            ''', (max_attempts, status, max_attempts, int(backoff_seconds), ids))
+            recorded = cursor.rowcount
+            
+            # Los perfiles agotados salen de la cola de la búsqueda de emails
+            cursor.execute('''
+                UPDATE profiles SET email_checked = TRUE, updated_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT profile_id FROM enrichment_state
+                    WHERE status = 'exhausted' AND profile_id IN (SELECT value FROM json_each(?))
+                )
+                AND email_checked = FALSE
+            ''', (ids,))
+            return recorded
+        
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al registrar resultado de búsqueda de emails: {str(e)}")
+            return 0
+    
+    def get_enrichment_summary(self) -> Dict[str, int]:
+        """Perfiles por estado de la búsqueda de emails, y cuántos están en espera"""
+        try:
+            with self._connection() as conn:
                 cursor = conn.cursor()
-                
                 cursor.execute('''
-                    UPDATE profiles 
-                    SET email = ?, mobileNumber = ?, email_checked = TRUE, updated_at = CURRENT_TIMESTAMP
-                    WHERE profileUrl = ?
-                ''', (email, mobile_number, profile_url))
-                
-                conn.commit()
-                return cursor.rowcount > 0
-                
+                    SELECT status, COUNT(*),
+                        COALESCE(SUM(next_eligible_at > datetime('now')), 0)
+                    FROM enrichment_state
+                    GROUP BY status
+                ''')
+                summary = {}
+                cooling_down = 0
+                for status, count, waiting in cursor.fetchall():
+                    summary[status] = count
+                    if status != 'in_progress':
+                        cooling_down += waiting
+                summary['cooling_down'] = cooling_down
+                return summary
+        except Exception as e:
+            logger.error(f"Error al obtener estado de la búsqueda de emails: {str(e)}")
+            return {}
+    
+    def update_profile_contact_info(self, profile_url: str, email: str, mobile_number: str) -> bool:
+        """Actualizar información de contacto de un perfil"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                UPDATE profiles 
+                SET email = ?, mobileNumber = ?, email_checked = TRUE, updated_at = CURRENT_TIMESTAMP
+                WHERE canonical_url = ?
+            ''', (email, mobile_number, canonicalize_profile_url(profile_url)))
+
+            return cursor.rowcount > 0
+
+        try:
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al actualizar información de contacto: {str(e)}")
             return False
 
     def update_profile_contact(self, profile_id: int, email: str, mobile_number: str) -> bool:
         """Actualizar información de contacto de un perfil por ID"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                UPDATE profiles 
+                SET email = ?, mobileNumber = ?, email_checked = TRUE, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (email, mobile_number, profile_id))
+
+            return cursor.rowcount > 0
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    UPDATE profiles 
-                    SET email = ?, mobileNumber = ?, email_checked = TRUE, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (email, mobile_number, profile_id))
-                
-                conn.commit()
-                return cursor.rowcount > 0
-                
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al actualizar información de contacto: {str(e)}")
             return False
     
+    def bulk_update_contact_info(self, contact_updates: List[Dict]) -> Dict:
+        """Actualizar la información de contacto de muchos perfiles con una sola sentencia.
+
+        Las actualizaciones se cargan en una tabla temporal y se aplican con un
+        único ``UPDATE ... FROM`` (SQLite >= 3.33). Devuelve el resultado por
+        fila: URLs actualizadas, sin perfil coincidente e inválidas.
+        """
+        def operation(conn):
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS contact_updates_stage (
+                    canonical_url TEXT PRIMARY KEY,
+                    profile_url TEXT,
+                    email TEXT,
+                    mobileNumber TEXT
+                )
+            ''')
+            cursor.execute('DELETE FROM contact_updates_stage')
+            
+            staged = []
+            invalid = []
+            for contact in contact_updates:
+                profile_url = contact.get('profileUrl', '')
+                canonical_url = canonicalize_profile_url(profile_url)
+                if not canonical_url:
+                    invalid.append(profile_url)
+                    continue
+                staged.append((
+                    canonical_url,
+                    profile_url,
+                    contact.get('email') or '',
+                    contact.get('mobileNumber') or ''
+                ))
+            
+            # Si una URL llega repetida prevalece la última actualización
+            cursor.executemany('''
+                INSERT OR REPLACE INTO contact_updates_stage (canonical_url, profile_url, email, mobileNumber)
+                VALUES (?, ?, ?, ?)
+            ''', staged)
+            
+            cursor.execute('''
+                UPDATE profiles
+                SET email = s.email, mobileNumber = s.mobileNumber, email_checked = TRUE, updated_at = CURRENT_TIMESTAMP
+                FROM contact_updates_stage s
+                WHERE profiles.canonical_url = s.canonical_url
+            ''')
+            updated_count = cursor.rowcount
+            
+            cursor.execute('''
+                SELECT s.profile_url, p.id
+                FROM contact_updates_stage s
+                LEFT JOIN profiles p ON p.canonical_url = s.canonical_url
+            ''')
+            updated = []
+            not_found = []
+            for row in cursor.fetchall():
+                (updated if row['id'] is not None else not_found).append(row['profile_url'])
+            
+            cursor.execute('DELETE FROM contact_updates_stage')
+            return {
+                'updated_count': updated_count,
+                'updated': updated,
+                'not_found': not_found,
+                'invalid': invalid
+            }
+        
+        if not contact_updates:
+            return {'updated_count': 0, 'updated': [], 'not_found': [], 'invalid': []}
+        return self._write(operation)
+    
     def update_profiles_contact_info_batch(self, contact_updates: List[Dict]) -> int:
         """Actualizar información de contacto de múltiples perfiles"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                updated_count = 0
-                for contact in contact_updates:
-                    profile_url = contact.get('profileUrl', '')
-                    email = contact.get('email', '')
-                    mobile_number = contact.get('mobileNumber', '')
-                    
-                    if profile_url:
-                        cursor.execute('''
-                            UPDATE profiles 
-                            SET email = ?, mobileNumber = ?, email_checked = TRUE, updated_at = CURRENT_TIMESTAMP
-                            WHERE profileUrl = ?
-                        ''', (email, mobile_number, profile_url))
-                        updated_count += cursor.rowcount
-                
-                conn.commit()
-                return updated_count
-                
+            return self.bulk_update_contact_info(contact_updates)['updated_count']
         except Exception as e:
             logger.error(f"Error al actualizar información de contacto en lote: {str(e)}")
             return 0
@@ -266,9 +1399,9 @@ class DatabaseManager:
     def get_profile_count(self) -> int:
         """Obtener el número total de perfiles"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM profiles')
+                cursor.execute("SELECT value FROM stats_counters WHERE name = 'total_profiles'")
                 return cursor.fetchone()[0]
         except Exception as e:
             logger.error(f"Error al obtener conteo de perfiles: {str(e)}")
@@ -277,9 +1410,9 @@ class DatabaseManager:
     def get_profile_id_by_url(self, profile_url: str) -> Optional[int]:
         """Obtener el ID de un perfil por su URL"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT id FROM profiles WHERE profileUrl = ?', (profile_url,))
+                cursor.execute('SELECT id FROM profiles WHERE canonical_url = ?', (canonicalize_profile_url(profile_url),))
                 result = cursor.fetchone()
                 return result[0] if result else None
         except Exception as e:
@@ -287,32 +1420,100 @@ class DatabaseManager:
             return None
 
     def get_profile_ids_by_urls(self, profile_urls: List[str]) -> Dict[str, int]:
-        """Obtener los IDs de múltiples perfiles por sus URLs"""
+        """Obtener los IDs de múltiples perfiles por sus URLs.
+
+        Si la consulta falla se propaga el error: un resultado vacío se leería
+        como que ninguno de los perfiles existe.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
-                # Filtrar URLs válidas
-                valid_urls = [url for url in profile_urls if url is not None and url.strip()]
-                if not valid_urls:
+                # Filtrar URLs válidas y normalizarlas
+                canonical_by_url = {url: canonicalize_profile_url(url) for url in profile_urls if url is not None and url.strip()}
+                if not canonical_by_url:
                     return {}
                 
-                # Crear placeholders para la consulta SQL
-                placeholders = ','.join(['?' for _ in valid_urls])
-                cursor.execute(f'SELECT id, profileUrl FROM profiles WHERE profileUrl IN ({placeholders})', valid_urls)
+                # Buscar por bloques de claves (sin límite de variables de SQLite)
+                rows = fetch_by_keys(
+                    cursor,
+                    'SELECT id, canonical_url FROM profiles WHERE canonical_url IN ({keys})',
+                    list(set(canonical_by_url.values())),
+                    self.lookup_chunk_size
+                )
                 
-                results = cursor.fetchall()
-                return {row[1]: row[0] for row in results}
+                ids_by_canonical = {row[1]: row[0] for row in rows}
+                return {url: ids_by_canonical[canonical] for url, canonical in canonical_by_url.items() if canonical in ids_by_canonical}
                 
         except Exception as e:
             logger.error(f"Error al obtener IDs de perfiles por URLs: {str(e)}")
+            raise
+    
+    def get_hubspot_ids(self, profile_ids: List[int]) -> Dict[int, str]:
+        """IDs de HubSpot de los perfiles ya exportados, por ID de perfil"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                rows = fetch_by_keys(
+                    cursor,
+                    'SELECT id, hubspot_id FROM profiles WHERE hubspot_id IS NOT NULL AND id IN ({keys})',
+                    list(set(profile_ids)),
+                    self.lookup_chunk_size
+                )
+                return {row[0]: row[1] for row in rows}
+        except Exception as e:
+            logger.error(f"Error al obtener IDs de HubSpot: {str(e)}")
+            return {}
+    
+    def mark_profiles_exported(self, exports: List[Tuple[int, str]]) -> int:
+        """Guardar el ID de HubSpot de cada perfil exportado (``[(profile_id, hubspot_id), ...]``)"""
+        if not exports:
+            return 0
+        
+        def operation(conn):
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE profiles SET
+                    hubspot_id = json_extract(e.value, '$[1]'),
+                    hubspot_synced_at = CURRENT_TIMESTAMP
+                FROM json_each(?) AS e
+                WHERE profiles.id = json_extract(e.value, '$[0]')
+            ''', (json.dumps([[profile_id, str(hubspot_id)] for profile_id, hubspot_id in exports]),))
+            return cursor.rowcount
+        
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al guardar IDs de HubSpot: {str(e)}")
+            return 0
+    
+    def get_profiles_by_canonical_urls(self, profile_urls: List[str]) -> Dict[str, Dict]:
+        """Obtener perfiles existentes indexados por su URL canónica.
+
+        Las URLs de entrada se normalizan y se resuelven con búsquedas sobre el
+        índice único de canonical_url, sin cargar la tabla completa.
+        """
+        keys = list(dict.fromkeys(filter(None, (canonicalize_profile_url(url) for url in profile_urls))))
+        if not keys:
+            return {}
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                rows = fetch_by_keys(cursor, '''
+                    SELECT id, fullName, profileUrl, canonical_url, email, mobileNumber
+                    FROM profiles
+                    WHERE canonical_url IN ({keys})
+                ''', keys, self.lookup_chunk_size)
+                return {row['canonical_url']: dict(row) for row in rows}
+                
+        except Exception as e:
+            logger.error(f"Error al obtener perfiles por URLs canónicas: {str(e)}")
             return {}
     
     def get_profiles_with_emails(self) -> List[Dict]:
         """Obtener perfiles que tienen emails"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -330,41 +1531,12 @@ class DatabaseManager:
 
     def debug_profiles_status(self) -> Dict:
         """Método de debug para verificar el estado de los perfiles"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Total de perfiles
-                cursor.execute('SELECT COUNT(*) FROM profiles')
-                total_profiles = cursor.fetchone()[0]
-                
-                # Perfiles con email
-                cursor.execute('SELECT COUNT(*) FROM profiles WHERE email IS NOT NULL AND email != ""')
-                profiles_with_email = cursor.fetchone()[0]
-                
-                # Perfiles marcados como email_checked = TRUE
-                cursor.execute('SELECT COUNT(*) FROM profiles WHERE email_checked = TRUE')
-                profiles_checked = cursor.fetchone()[0]
-                
-                # Perfiles marcados como email_checked = FALSE
-                cursor.execute('SELECT COUNT(*) FROM profiles WHERE email_checked = FALSE')
-                profiles_unchecked = cursor.fetchone()[0]
-                
-                # Perfiles con URL válida
-                cursor.execute('SELECT COUNT(*) FROM profiles WHERE profileUrl IS NOT NULL AND profileUrl != ""')
-                profiles_with_url = cursor.fetchone()[0]
-                
-                return {
-                    'total_profiles': total_profiles,
-                    'profiles_with_email': profiles_with_email,
-                    'profiles_checked': profiles_checked,
-                    'profiles_unchecked': profiles_unchecked,
-                    'profiles_with_url': profiles_with_url
-                }
-                
-        except Exception as e:
-            logger.error(f"Error en debug_profiles_status: {str(e)}")
-            return {}
+        statistics = self.get_statistics()
+        return {
+            key: statistics.get(key, 0)
+            for key in ('total_profiles', 'profiles_with_email', 'profiles_checked',
+                        'profiles_unchecked', 'profiles_with_url')
+        }
     
     def export_to_excel(self, filename: str = "profiles_export.xlsx") -> bool:
         """Exportar todos los perfiles a un archivo Excel"""
@@ -410,60 +1582,147 @@ class DatabaseManager:
     
     def delete_profile(self, profile_id: int) -> bool:
         """Eliminar un perfil por ID"""
+        def operation(conn):
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM profiles WHERE id = ?', (profile_id,))
+            return cursor.rowcount > 0
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM profiles WHERE id = ?', (profile_id,))
-                conn.commit()
-                return cursor.rowcount > 0
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al eliminar perfil: {str(e)}")
             return False
     
-    def search_profiles(self, search_term: str) -> List[Dict]:
-        """Buscar perfiles por nombre o ubicación"""
+    def _profile_search_query(self, search_term: str, columns: List[str]) -> Optional[Tuple[str, List]]:
+        """Consulta de búsqueda de perfiles con su clave de orden (``sort_key``, ``sort_id``), ascendente.
+
+        Con FTS5 la clave es la puntuación bm25 (el nombre pesa más); sin FTS5,
+        la fecha de alta más reciente primero. Devuelve None si el término no
+        tiene nada que buscar.
+        """
+        match_query = build_match_query(search_term)
+        if match_query is None:
+            return None
+        if self.fts_enabled:
+            return f'''
+                SELECT {', '.join(columns)}, bm25(profiles_fts, 10.0, 5.0, 2.0, 1.0, 1.0) AS sort_key, p.id AS sort_id
+                FROM profiles_fts
+                JOIN profiles p ON p.id = profiles_fts.rowid
+                WHERE profiles_fts MATCH ?
+            ''', [match_query]
+        # Las mismas columnas que indexa FTS5, para que el resultado no dependa de su disponibilidad
+        pattern = f'%{search_term}%'
+        return f'''
+            SELECT {', '.join(columns)}, -julianday(p.created_at) AS sort_key, p.id AS sort_id
+            FROM profiles p
+            WHERE p.fullName LIKE ? OR p.location LIKE ? OR p.headline LIKE ?
+               OR p.email LIKE ? OR p.mobileNumber LIKE ?
+        ''', [pattern] * 5
+
+    @staticmethod
+    def _without_sort_keys(rows) -> List[Dict]:
+        profiles = []
+        for row in rows:
+            profile = dict(row)
+            profile.pop('sort_key')
+            profile.pop('sort_id')
+            profiles.append(profile)
+        return profiles
+
+    def search_profiles(self, search_term: str, limit: Optional[int] = None, offset: int = 0,
+                        fields: Optional[List[str]] = None) -> List[Dict]:
+        """Buscar perfiles por nombre, cargo, ubicación o contacto.
+
+        Con FTS5 los resultados se ordenan por relevancia (bm25, el nombre pesa
+        más) y cada término se busca como prefijo ("jua" encuentra "Juan").
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT * FROM profiles 
-                    WHERE fullName LIKE ? OR location LIKE ? OR headline LIKE ?
-                    ORDER BY created_at DESC
-                ''', (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
-                
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
-                
+            query = self._profile_search_query(search_term, project_columns(fields, 'p'))
+            if query is None:
+                return []
+            sql, params = query
+            
+            with self._connection() as conn:
+                rows = conn.execute(f'''
+                    SELECT * FROM ({sql})
+                    ORDER BY sort_key, sort_id
+                    LIMIT ? OFFSET ?
+                ''', params + [limit if limit is not None else -1, offset]).fetchall()
+                return self._without_sort_keys(rows)
+                
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Error al buscar perfiles: {str(e)}")
             return []
 
+    def search_profiles_page(self, search_term: str, limit: int = 100, cursor: Optional[str] = None,
+                             fields: Optional[List[str]] = None) -> Dict:
+        """Página de resultados de búsqueda.
+
+        El cursor guarda la clave de orden de la última fila (puntuación o fecha
+        y id), así las páginas profundas no recorren las anteriores.
+        """
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if not isinstance(after[0], (int, float)) or isinstance(after[0], bool) or not isinstance(after[1], int):
+                raise ValueError("Cursor de paginación inválido")
+        
+        try:
+            query = self._profile_search_query(search_term, project_columns(fields, 'p'))
+            if query is None:
+                return {'profiles': [], 'next_cursor': None, 'has_more': False}
+            sql, params = query
+            condition = ''
+            if after:
+                condition = 'WHERE sort_key > ? OR (sort_key = ? AND sort_id > ?)'
+                params = params + [after[0], after[0], after[1]]
+            
+            with self._connection() as conn:
+                rows = conn.execute(f'''
+                    SELECT * FROM ({sql})
+                    {condition}
+                    ORDER BY sort_key, sort_id
+                    LIMIT ?
+                ''', params + [limit + 1]).fetchall()
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error al buscar perfiles: {str(e)}")
+            rows = []
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'profiles': self._without_sort_keys(rows),
+            'next_cursor': encode_cursor(rows[-1]['sort_key'], rows[-1]['sort_id']) if has_more else None,
+            'has_more': has_more
+        }
+
     # Métodos para manejar búsquedas
     def create_search(self, name: str, description: str, search_url: str) -> Optional[int]:
         """Crear una nueva búsqueda"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                INSERT INTO searches (name, description, search_url, canonical_search_url)
+                VALUES (?, ?, ?, ?)
+            ''', (name, description, search_url, canonicalize_search_url(search_url)))
+
+            return cursor.lastrowid
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO searches (name, description, search_url)
-                    VALUES (?, ?, ?)
-                ''', (name, description, search_url))
-                
-                conn.commit()
-                return cursor.lastrowid
-                
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al crear búsqueda: {str(e)}")
             return None
 
     def get_all_searches(self) -> List[Dict]:
-        """Obtener todas las búsquedas"""
+        """Obtener todas las búsquedas, con su profile_count y last_found_at"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -480,8 +1739,7 @@ class DatabaseManager:
     def get_search_by_id(self, search_id: int) -> Optional[Dict]:
         """Obtener una búsqueda por ID"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -495,58 +1753,114 @@ class DatabaseManager:
             logger.error(f"Error al obtener búsqueda: {str(e)}")
             return None
 
-    def update_search(self, search_id: int, name: Optional[str] = None, description: Optional[str] = None, status: Optional[str] = None) -> bool:
-        """Actualizar una búsqueda"""
+    def update_search(self, search_id: int, name: Optional[str] = None, description: Optional[str] = None, status: Optional[str] = None,
+                      refresh_interval_hours: Optional[int] = None) -> bool:
+        """Actualizar una búsqueda; ``refresh_interval_hours=0`` desactiva el refresco periódico"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            updates = []
+            params = []
+
+            if name is not None:
+                updates.append("name = ?")
+                params.append(name)
+
+            if description is not None:
+                updates.append("description = ?")
+                params.append(description)
+
+            if status is not None:
+                updates.append("status = ?")
+                params.append(status)
+
+            if refresh_interval_hours is not None:
+                updates.append("refresh_interval_hours = ?")
+                params.append(refresh_interval_hours if refresh_interval_hours > 0 else None)
+
+            if not updates:
+                return False
+
+            updates.append("updated_at = CURRENT_TIMESTAMP")
+            params.append(search_id)
+
+            query = f"UPDATE searches SET {', '.join(updates)} WHERE id = ?"
+            cursor.execute(query, params)
+
+            return cursor.rowcount > 0
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                updates = []
-                params = []
-                
-                if name is not None:
-                    updates.append("name = ?")
-                    params.append(name)
-                
-                if description is not None:
-                    updates.append("description = ?")
-                    params.append(description)
-                
-                if status is not None:
-                    updates.append("status = ?")
-                    params.append(status)
-                
-                if not updates:
-                    return False
-                
-                updates.append("updated_at = CURRENT_TIMESTAMP")
-                params.append(search_id)
-                
-                query = f"UPDATE searches SET {', '.join(updates)} WHERE id = ?"
-                cursor.execute(query, params)
-                
-                conn.commit()
-                return cursor.rowcount > 0
-                
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al actualizar búsqueda: {str(e)}")
             return False
 
+    def get_searches_due_for_refresh(self) -> List[Dict]:
+        """Búsquedas activas con refresco periódico cuyo intervalo ya venció.
+
+        Las que nunca se scrapearon cuentan desde su creación.
+        """
+        try:
+            with self._connection() as conn:
+                rows = conn.execute('''
+                    SELECT * FROM searches
+                    WHERE status = 'active'
+                      AND refresh_interval_hours IS NOT NULL
+                      AND COALESCE(search_url, '') != ''
+                      AND datetime(COALESCE(last_scraped_at, created_at),
+                                   '+' || refresh_interval_hours || ' hours') <= datetime('now')
+                    ORDER BY COALESCE(last_scraped_at, created_at)
+                ''').fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error al obtener búsquedas para refrescar: {str(e)}")
+            return []
+
+    def get_fresh_search(self, search_url: str, max_age_minutes: float) -> Optional[Dict]:
+        """Búsqueda con la misma URL canónica scrapeada hace menos de ``max_age_minutes``"""
+        try:
+            with self._connection() as conn:
+                row = conn.execute('''
+                    SELECT * FROM searches
+                    WHERE canonical_search_url = ?
+                      AND last_scraped_at >= datetime('now', ?)
+                    ORDER BY last_scraped_at DESC
+                    LIMIT 1
+                ''', (canonicalize_search_url(search_url), f'-{float(max_age_minutes)} minutes')).fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Error al buscar resultados recientes para {search_url}: {str(e)}")
+            return None
+
+    def mark_search_scraped(self, search_id: int) -> bool:
+        """Registrar que la búsqueda se acaba de scrapear"""
+        def operation(conn):
+            cursor = conn.execute(
+                'UPDATE searches SET last_scraped_at = CURRENT_TIMESTAMP WHERE id = ?', (search_id,)
+            )
+            return cursor.rowcount > 0
+
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al registrar scraping de búsqueda {search_id}: {str(e)}")
+            return False
+
     def delete_search(self, search_id: int) -> bool:
         """Eliminar una búsqueda y sus relaciones"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            # Eliminar relaciones primero (CASCADE debería hacerlo automáticamente)
+            cursor.execute('DELETE FROM search_profiles WHERE search_id = ?', (search_id,))
+
+            # Eliminar la búsqueda
+            cursor.execute('DELETE FROM searches WHERE id = ?', (search_id,))
+
+            return cursor.rowcount > 0
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Eliminar relaciones primero (CASCADE debería hacerlo automáticamente)
-                cursor.execute('DELETE FROM search_profiles WHERE search_id = ?', (search_id,))
-                
-                # Eliminar la búsqueda
-                cursor.execute('DELETE FROM searches WHERE id = ?', (search_id,))
-                
-                conn.commit()
-                return cursor.rowcount > 0
-                
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al eliminar búsqueda: {str(e)}")
             return False
@@ -554,8 +1868,7 @@ class DatabaseManager:
     def get_profiles_by_search(self, search_id: int) -> List[Dict]:
         """Obtener todos los perfiles de una búsqueda específica"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -573,90 +1886,233 @@ class DatabaseManager:
             logger.error(f"Error al obtener perfiles de búsqueda: {str(e)}")
             return []
 
+    def get_search_profiles_page(self, search_id: int, limit: int = 100, cursor: Optional[str] = None,
+                                 fields: Optional[List[str]] = None) -> Dict:
+        """Obtener una página de perfiles de una búsqueda ordenada por (found_at, id) descendente"""
+        columns = project_columns(fields, 'p')
+        params = [search_id]
+        where = ''
+        if cursor:
+            found_at, last_id = decode_cursor(cursor)
+            where = 'AND (sp.found_at, sp.id) < (?, ?)'
+            params.extend([found_at, last_id])
+        params.append(limit + 1)
+        
+        with self._connection() as conn:
+            cursor_db = conn.cursor()
+            cursor_db.execute(f'''
+                SELECT {', '.join(columns)}, sp.found_at, sp.id AS search_profile_id
+                FROM search_profiles sp
+                INNER JOIN profiles p ON p.id = sp.profile_id
+                WHERE sp.search_id = ? {where}
+                ORDER BY sp.found_at DESC, sp.id DESC
+                LIMIT ?
+            ''', params)
+            rows = [dict(row) for row in cursor_db.fetchall()]
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(rows[-1]['found_at'], rows[-1]['search_profile_id'])
+        for row in rows:
+            row.pop('search_profile_id', None)
+        return {'profiles': rows, 'next_cursor': next_cursor, 'has_more': has_more}
+
+    def iter_search_profiles(self, search_id: int, fields: Optional[List[str]] = None, batch_size: int = 500):
+        """Iterar los perfiles de una búsqueda en bloques de ``fetchmany``"""
+        columns = project_columns(fields, 'p')
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {', '.join(columns)}, sp.found_at
+                FROM search_profiles sp
+                INNER JOIN profiles p ON p.id = sp.profile_id
+                WHERE sp.search_id = ?
+                ORDER BY sp.found_at DESC, sp.id DESC
+            ''', (search_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+
     def get_search_profile_count(self, search_id: int) -> int:
         """Obtener el número de perfiles de una búsqueda específica"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    SELECT COUNT(*) FROM search_profiles WHERE search_id = ?
+                    SELECT profile_count FROM searches WHERE id = ?
                 ''', (search_id,))
-                return cursor.fetchone()[0]
+                row = cursor.fetchone()
+                return row[0] if row else 0
         except Exception as e:
             logger.error(f"Error al obtener conteo de perfiles de búsqueda: {str(e)}")
             return 0
 
     def add_profile_to_search(self, search_id: int, profile_id: int) -> bool:
         """Agregar un perfil a una búsqueda específica"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                INSERT OR IGNORE INTO search_profiles (search_id, profile_id)
+                VALUES (?, ?)
+            ''', (search_id, profile_id))
+
+            return cursor.rowcount > 0
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT OR IGNORE INTO search_profiles (search_id, profile_id)
-                    VALUES (?, ?)
-                ''', (search_id, profile_id))
-                
-                conn.commit()
-                return cursor.rowcount > 0
-                
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al agregar perfil a búsqueda: {str(e)}")
             return False
 
     def add_profiles_to_search_batch(self, search_id: int, profile_ids: List[int]) -> int:
         """Agregar múltiples perfiles a una búsqueda específica"""
+        def operation(conn):
+            cursor = conn.cursor()
+
+            data_to_insert = [(search_id, profile_id) for profile_id in profile_ids]
+
+            cursor.executemany('''
+                INSERT OR IGNORE INTO search_profiles (search_id, profile_id)
+                VALUES (?, ?)
+            ''', data_to_insert)
+
+            return cursor.rowcount
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                data_to_insert = [(search_id, profile_id) for profile_id in profile_ids]
-                
-                cursor.executemany('''
-                    INSERT OR IGNORE INTO search_profiles (search_id, profile_id)
-                    VALUES (?, ?)
-                ''', data_to_insert)
-                
-                conn.commit()
-                return cursor.rowcount
-                
+            return self._write(operation)
         except Exception as e:
             logger.error(f"Error al agregar perfiles a búsqueda en lote: {str(e)}")
             return 0
 
+    def save_job(self, job: Dict) -> bool:
+        """Insertar o reemplazar un trabajo; los campos dict se guardan como JSON"""
+        def operation(conn):
+            row = {column: job.get(column) for column in JOB_COLUMNS}
+            for column in JOB_JSON_COLUMNS:
+                row[column] = json.dumps(row[column]) if row[column] is not None else None
+            row['updated_at'] = datetime.now().isoformat()
+            conn.execute(f'''
+                INSERT OR REPLACE INTO jobs ({', '.join(row)})
+                VALUES ({', '.join('?' for _ in row)})
+            ''', list(row.values()))
+            return True
+        
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al guardar trabajo {job.get('id')}: {str(e)}")
+            return False
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Obtener un trabajo por ID (búsqueda por clave primaria)"""
+        try:
+            with self._connection() as conn:
+                row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                return self._decode_job(row) if row else None
+        except Exception as e:
+            logger.error(f"Error al obtener trabajo {job_id}: {str(e)}")
+            return None
+    
+    def list_jobs(self, job_type: Optional[str] = None, status: Optional[str] = None,
+                  limit: int = 50) -> List[Dict]:
+        """Listar trabajos, los más recientes primero"""
+        try:
+            with self._connection() as conn:
+                conditions, params = [], []
+                if job_type:
+                    conditions.append('type = ?')
+                    params.append(job_type)
+                if status:
+                    conditions.append('status = ?')
+                    params.append(status)
+                where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+                rows = conn.execute(
+                    f'SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?',
+                    params + [limit]
+                ).fetchall()
+                return [self._decode_job(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error al listar trabajos: {str(e)}")
+            return []
+    
+    def get_queued_jobs(self, job_types: List[str]) -> List[Dict]:
+        """Trabajos en cola de los tipos dados, en orden de ejecución (prioridad y llegada)"""
+        if not job_types:
+            return []
+        try:
+            with self._connection() as conn:
+                rows = conn.execute(f'''
+                    SELECT * FROM jobs
+                    WHERE status = 'queued' AND type IN ({', '.join('?' for _ in job_types)})
+                    ORDER BY priority DESC, created_at ASC
+                ''', list(job_types)).fetchall()
+                return [self._decode_job(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error al obtener trabajos en cola: {str(e)}")
+            return []
+    
+    def mark_interrupted_jobs(self, resumable_types: Optional[List[str]] = None) -> int:
+        """Marcar como interrumpidos los trabajos que quedaron activos al reiniciar.
+
+        Los trabajos en cola de ``resumable_types`` se conservan para volver a
+        encolarlos; los que estaban en ejecución siempre se interrumpen.
+        """
+        resumable_types = list(resumable_types or [])
+        def operation(conn):
+            now = datetime.now().isoformat()
+            cursor = conn.execute(f'''
+                UPDATE jobs SET status = 'interrupted', finished_at = ?, updated_at = ?,
+                    error = 'El servidor se reinició antes de terminar el trabajo'
+                WHERE status = 'running'
+                   OR (status = 'queued' AND type NOT IN ({', '.join('?' for _ in resumable_types)}))
+            ''', [now, now] + resumable_types)
+            return cursor.rowcount
+        
+        try:
+            return self._write(operation)
+        except Exception as e:
+            logger.error(f"Error al marcar trabajos interrumpidos: {str(e)}")
+            return 0
+    
+    @staticmethod
+    def _decode_job(row) -> Dict:
+        job = dict(row)
+        for column in JOB_JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job[column] else ({} if column != 'result' else None)
+        return job
+    
     def get_search_statistics(self) -> Dict:
         """Obtener estadísticas de todas las búsquedas"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
-                # Total de búsquedas
-                cursor.execute('SELECT COUNT(*) FROM searches')
-                total_searches = cursor.fetchone()[0]
-                
-                # Búsquedas activas
-                cursor.execute("SELECT COUNT(*) FROM searches WHERE status = 'active'")
-                active_searches = cursor.fetchone()[0]
-                
-                # Total de perfiles únicos
-                cursor.execute('SELECT COUNT(DISTINCT profile_id) FROM search_profiles')
-                unique_profiles = cursor.fetchone()[0]
+                # Totales desde los contadores materializados
+                cursor.execute('''
+                    SELECT name, value FROM stats_counters
+                    WHERE name IN ('total_searches', 'active_searches', 'unique_profiles')
+                ''')
+                counters = {row['name']: row['value'] for row in cursor.fetchall()}
                 
                 # Búsquedas con más perfiles
                 cursor.execute('''
-                    SELECT s.name, COUNT(sp.profile_id) as profile_count
-                    FROM searches s
-                    LEFT JOIN search_profiles sp ON s.id = sp.search_id
-                    GROUP BY s.id, s.name
+                    SELECT name, profile_count
+                    FROM searches
                     ORDER BY profile_count DESC
                     LIMIT 5
                 ''')
                 top_searches = [{'name': str(row[0]), 'count': row[1]} for row in cursor.fetchall()]
                 
                 return {
-                    'total_searches': total_searches,
-                    'active_searches': active_searches,
-                    'unique_profiles': unique_profiles,
+                    'total_searches': counters.get('total_searches', 0),
+                    'active_searches': counters.get('active_searches', 0),
+                    'unique_profiles': counters.get('unique_profiles', 0),
                     'top_searches': top_searches
                 }
                 
@@ -665,4 +2121,5 @@ class DatabaseManager:
             return {}
 
 # Instancia global de la base de datos
-db_manager = DatabaseManager() 
\ No newline at end of file
+db_manager = DatabaseManager(os.getenv('DB_PATH', 'profiles.db'), pool_size=DB_POOL_SIZE,
+                             concurrency_mode=os.getenv('DB_CONCURRENCY_MODE', 'wal')) 
\ No newline at end of file
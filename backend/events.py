@@ -0,0 +1,54 @@
+"""Publicación y suscripción de eventos dentro del proceso (progreso de trabajos)"""
+
+import queue
+import threading
+from collections import defaultdict
+from typing import Dict
+
+class EventBus:
+    """Pub/sub en memoria: cada suscriptor de un tema recibe los eventos en su propia cola.
+
+    ``publish`` nunca bloquea: si un suscriptor no consume y su cola se llena,
+    se descarta su evento más antiguo. Los eventos solo llegan a los
+    suscriptores de este proceso.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str) -> queue.Queue:
+        subscription = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, topic: str, subscription: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topic: str, event: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            while True:
+                try:
+                    subscription.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        subscription.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(topic, ()))
+
+# Instancia global compartida por el planificador de trabajos y el servidor
+event_bus = EventBus()
@@ -2,6 +2,7 @@ from apify_client import ApifyClient
 import os
 from dotenv import load_dotenv
 from database import DatabaseManager
+from url_utils import canonicalize_profile_url
 
 # Cargar variables de entorno
 load_dotenv()
@@ -61,8 +62,8 @@ for item in client.dataset(run["defaultDatasetId"]).iterate_items():
     print(f"Número: {mobile}")
     
     if profile_url:
-        # Limpiar la URL para que coincida con el formato de la base de datos
-        clean_url = profile_url.split('?')[0]  # Remover parámetros de la URL
+        # Normalizar la URL para que coincida con el formato de la base de datos
+        clean_url = canonicalize_profile_url(profile_url)
         contactos[clean_url] = {
             'email': email if email is not None else '',
             'mobileNumber': mobile if mobile is not None else ''
@@ -74,8 +75,8 @@ updated_count = 0
 for profile in profiles:
     profile_url = profile.get('profileUrl')
     if profile_url:
-        # Limpiar la URL para que coincida con el formato de la API
-        clean_url = profile_url.split('?')[0]  # Remover parámetros de la URL
+        # Normalizar la URL para que coincida con el formato de la API
+        clean_url = profile.get('canonical_url') or canonicalize_profile_url(profile_url)
         if clean_url in contactos:
             # Actualizar el perfil en la base de datos
             success = db_manager.update_profile_contact(
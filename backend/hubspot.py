@@ -0,0 +1,236 @@
+"""Exportación de contactos a HubSpot mediante la API por lotes"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HUBSPOT_BASE_URL = "https://api.hubapi.com"
+# Máximo de contactos por llamada a los endpoints batch de HubSpot
+HUBSPOT_BATCH_SIZE = 100
+# Respuestas que se reintentan: límite de peticiones y errores del servidor
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+class RateLimiter:
+    """Ventana deslizante: como mucho ``max_calls`` llamadas cada ``period`` segundos.
+
+    HubSpot limita las apps privadas por ventanas de 10 segundos; el límite se
+    comparte entre todos los hilos que usan el mismo cliente.
+    """
+
+    def __init__(self, max_calls: int, period: float = 10.0):
+        self.max_calls = max(1, max_calls)
+        self.period = period
+        self._calls = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._calls = [t for t in self._calls if now - t < self.period]
+                if len(self._calls) < self.max_calls:
+                    self._calls.append(now)
+                    return
+                wait = self.period - (now - self._calls[0])
+            time.sleep(wait)
+
+def build_contact_properties(contact: Dict) -> Dict:
+    """Propiedades de HubSpot (nombres internos estándar) de un perfil"""
+    name_parts = (contact.get('fullName') or '').split()
+    return {
+        "firstname": name_parts[0] if name_parts else '',
+        "lastname": ' '.join(name_parts[1:]),
+        "email": contact.get('email') or '',
+        "phone": contact.get('mobileNumber') or '',
+        "city": contact.get('location') or '',
+        "lifecyclestage": "lead",
+        "hs_lead_status": "NEW"
+    }
+
+class HubSpotClient:
+    """Cliente de HubSpot con una sesión HTTP persistente (keep-alive).
+
+    Los contactos con email se envían a ``batch/upsert`` usando el email como
+    clave, así reenviar un contacto lo actualiza en lugar de duplicarlo; los que
+    no tienen email van a ``batch/create``. Hasta ``concurrency`` llamadas de
+    100 contactos se hacen a la vez.
+    """
+
+    def __init__(self, token: str, base_url: str = HUBSPOT_BASE_URL, concurrency: int = 3,
+                 timeout: float = 30.0, calls_per_10s: int = 100, max_retries: int = 5,
+                 backoff_seconds: float = 1.0):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = RateLimiter(calls_per_10s, 10.0)
+        # Una sola sesión con un pool del tamaño de la ventana: las conexiones
+        # TLS se reutilizan entre lotes y entre exportaciones
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def test_connection(self) -> requests.Response:
+        """Consultar un contacto para comprobar el token"""
+        return self.session.get(f"{self.base_url}/crm/v3/objects/contacts", params={'limit': 1},
+                                timeout=self.timeout)
+
+    def export_contacts(self, contacts: List[Dict], progress_callback=None) -> Dict[str, List[Dict]]:
+        """Enviar contactos a HubSpot por lotes.
+
+        Devuelve ``{'successful': [...], 'failed': [...]}``: cada éxito lleva
+        el nombre, el email y el ``hubspot_id``; cada fallo, el error de su lote.
+        ``progress_callback`` (opcional) recibe el avance tras cada lote.
+        """
+        by_email = {}
+        without_email = []
+        for contact in contacts:
+            email = (contact.get('email') or '').strip().lower()
+            if email:
+                # HubSpot rechaza lotes con el mismo email repetido
+                by_email.setdefault(email, []).append(contact)
+            else:
+                without_email.append(contact)
+
+        chunks = []
+        emails = list(by_email)
+        for start in range(0, len(emails), HUBSPOT_BATCH_SIZE):
+            chunks.append(('upsert', [by_email[email] for email in emails[start:start + HUBSPOT_BATCH_SIZE]]))
+        for start in range(0, len(without_email), HUBSPOT_BATCH_SIZE):
+            chunks.append(('create', [[contact] for contact in without_email[start:start + HUBSPOT_BATCH_SIZE]]))
+
+        result = {'successful': [], 'failed': []}
+        if not chunks:
+            return result
+
+        progress = {'total': len(contacts), 'sent': 0, 'failed': 0,
+                    'batches_total': len(chunks), 'batches_done': 0}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='hubspot') as executor:
+            futures = [executor.submit(self._send_chunk, *chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                successful, failed = future.result()
+                result['successful'].extend(successful)
+                result['failed'].extend(failed)
+                progress['sent'] += len(successful)
+                progress['failed'] += len(failed)
+                progress['batches_done'] += 1
+                if progress_callback:
+                    progress_callback(**progress)
+
+        logger.info(f"Exportación a HubSpot: {len(result['successful'])} contactos enviados, "
+                    f"{len(result['failed'])} fallidos en {len(chunks)} lotes")
+        return result
+
+    def _send_chunk(self, mode: str, groups: List[List[Dict]]):
+        """Enviar un lote; ``groups`` agrupa los contactos que comparten entrada"""
+        if mode == 'upsert':
+            inputs = [{
+                'idProperty': 'email',
+                'id': (group[0].get('email') or '').strip().lower(),
+                'properties': build_contact_properties(group[0])
+            } for group in groups]
+        else:
+            # batch/create no tiene clave propia: cada entrada lleva un id de traza
+            # que HubSpot devuelve en su resultado
+            inputs = [{
+                'objectWriteTraceId': str(index),
+                'properties': build_contact_properties(group[0])
+            } for index, group in enumerate(groups)]
+
+        try:
+            response = self._post(f"/crm/v3/objects/contacts/batch/{mode}", {'inputs': inputs})
+        except Exception as e:
+            logger.error(f"Error de conexión con HubSpot en lote {mode}: {str(e)}")
+            return [], self._failures(groups, str(e))
+
+        if response.status_code not in (200, 201, 207):
+            logger.error(f"HubSpot rechazó el lote {mode} de {len(groups)} contactos: HTTP {response.status_code}")
+            return [], self._failures(groups, f"HTTP {response.status_code}: {response.text[:500]}")
+
+        body = response.json()
+        results = body.get('results', [])
+        successful = []
+        matched = set()
+        if mode == 'upsert':
+            ids_by_email = {(item.get('properties', {}).get('email') or '').lower(): item.get('id') for item in results}
+            for index, group in enumerate(groups):
+                hubspot_id = ids_by_email.get(inputs[index]['id'])
+                if hubspot_id:
+                    matched.add(index)
+                    successful.extend(self._successes(group, hubspot_id))
+        else:
+            # Un 207 omite las entradas rechazadas y el orden no está garantizado:
+            # lo que no se pueda asociar por su id de traza cuenta como fallo
+            for item in results:
+                trace_id = item.get('objectWriteTraceId')
+                index = int(trace_id) if trace_id is not None and str(trace_id).isdigit() else None
+                if index is None or index >= len(groups) or index in matched or not item.get('id'):
+                    continue
+                matched.add(index)
+                successful.extend(self._successes(groups[index], item.get('id')))
+
+        errors = '; '.join(error.get('message', '') for error in body.get('errors', [])) or 'Sin resultado de HubSpot'
+        failed = self._failures([group for index, group in enumerate(groups) if index not in matched], errors)
+        return successful, failed
+
+    def _post(self, path: str, payload: Dict) -> requests.Response:
+        """POST respetando el límite por ventana; reintenta 429, 5xx y errores de conexión.
+
+        La espera entre intentos es ``Retry-After`` si HubSpot lo envía y, si no,
+        un backoff exponencial desde ``backoff_seconds``.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt)
+                logger.warning(f"Error de conexión con HubSpot ({str(e)}), reintento en {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRYABLE_STATUS or attempt == self.max_retries:
+                return response
+
+            delay = self._retry_after(response) or self.backoff_seconds * (2 ** attempt)
+            logger.warning(f"HubSpot respondió HTTP {response.status_code}, reintento en {delay:.1f}s")
+            time.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _successes(group: List[Dict], hubspot_id: Optional[str]) -> List[Dict]:
+        return [{
+            'name': contact.get('fullName', 'N/A'),
+            'email': contact.get('email', ''),
+            'profile_id': contact.get('id'),
+            'hubspot_id': hubspot_id
+        } for contact in group]
+
+    @staticmethod
+    def _failures(groups: List[List[Dict]], error: str) -> List[Dict]:
+        return [{
+            'name': contact.get('fullName', 'N/A'),
+            'profile_id': contact.get('id'),
+            'error': error
+        } for group in groups for contact in group]
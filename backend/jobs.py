@@ -0,0 +1,385 @@
+"""Ejecución de tareas largas en segundo plano con seguimiento de progreso"""
+
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from database import db_manager
+from events import event_bus
+
+logger = logging.getLogger(__name__)
+
+# Estados de un trabajo
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_INTERRUPTED = 'interrupted'
+
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+class JobCancelled(Exception):
+    """Se lanza desde ``progress_callback`` cuando se pidió cancelar el trabajo"""
+
+class DuplicateJobError(Exception):
+    """Ya hay un trabajo activo con la misma clave de deduplicación"""
+
+    def __init__(self, job: Dict):
+        super().__init__(f"Ya existe el trabajo activo {job['id']} para {job.get('dedup_key')}")
+        self.job = job
+
+class JobQueueFull(Exception):
+    """La cola de un tipo de trabajo alcanzó su máximo"""
+
+class JobManager:
+    """Planificador de trabajos con un pool fijo de hilos, independiente de los hilos de Flask.
+
+    Los trabajos esperan en una cola por prioridad (mayor primero) y, a igual
+    prioridad, por orden de llegada. Cada tipo puede limitar cuántos trabajos
+    corren a la vez (``register``); los que no caben esperan sin ocupar hilo.
+
+    Cada trabajo recibe un ``progress_callback`` con el que publica su avance;
+    si el avance incluye ``stage``, se mide la duración de cada etapa, y si se
+    pidió cancelar el trabajo, la llamada lanza ``JobCancelled``. Los trabajos
+    se guardan en la tabla ``jobs`` (``store``), así el historial sobrevive a
+    los reinicios; los activos se mantienen además en memoria. Cada cambio se
+    publica en ``events`` con el id del trabajo como tema: ``status`` al
+    cambiar de estado, ``stage`` al cambiar de etapa y ``progress`` en el resto.
+    """
+
+    def __init__(self, store=None, max_workers: int = 4, persist_interval: float = 1.0, events=None):
+        self.store = store
+        self.events = events
+        self.persist_interval = persist_interval
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._handlers = {}
+        self._limits = {}
+        self._running = defaultdict(int)
+        self._deferred = defaultdict(list)
+        self._calls = {}
+        self._jobs = {}
+        self._timing = {}
+        self._cancel_requested = set()
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f'job-worker-{index}', daemon=True)
+            for index in range(max(1, max_workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def register(self, job_type: str, func: Callable, max_concurrent: Optional[int] = None,
+                 max_queued: Optional[int] = None):
+        """Registrar la función de un tipo de trabajo encolable con ``enqueue``.
+
+        Los trabajos registrados se guardan solo con sus ``params``, así los que
+        siguen en cola tras un reinicio se retoman en ``recover``.
+        ``max_concurrent`` limita cuántos corren a la vez y ``max_queued``
+        cuántos pueden estar activos (en cola o en ejecución).
+        """
+        self._handlers[job_type] = func
+        self._limits[job_type] = (max_concurrent, max_queued)
+
+    def recover(self):
+        """Tras un reinicio: interrumpir lo que estaba en ejecución y retomar la cola"""
+        if not self.store:
+            return
+        job_types = list(self._handlers)
+        interrupted = self.store.mark_interrupted_jobs(job_types)
+        if interrupted:
+            logger.warning(f"{interrupted} trabajos quedaron interrumpidos por un reinicio del servidor")
+
+        queued = self.store.get_queued_jobs(job_types)
+        for job in queued:
+            job.pop('updated_at', None)
+            with self._lock:
+                self._add(job, (self._handlers[job['type']], (), dict(job['params'])))
+        if queued:
+            logger.info(f"{len(queued)} trabajos en cola retomados tras el reinicio")
+
+    def enqueue(self, job_type: str, params: Optional[Dict] = None, priority: int = 0,
+                dedup_key: Optional[str] = None) -> Dict:
+        """Encolar un trabajo de un tipo registrado; la función recibe ``params`` como kwargs.
+
+        Lanza ``DuplicateJobError`` si ya hay un trabajo activo con la misma
+        ``dedup_key`` y ``JobQueueFull`` si el tipo alcanzó ``max_queued``.
+        """
+        params = params or {}
+        return self._create(job_type, (self._handlers[job_type], (), dict(params)), params,
+                            priority=priority, dedup_key=dedup_key)
+
+    def submit(self, job_type: str, func: Callable, *args, single_flight: bool = False,
+               params: Optional[Dict] = None, priority: int = 0, **kwargs) -> Dict:
+        """Encolar la llamada ``func(*args, **kwargs)`` y devolver el estado inicial del trabajo.
+
+        Con ``single_flight`` no se crea un trabajo nuevo si ya hay uno del
+        mismo tipo en cola o en ejecución: se devuelve ese. Estos trabajos no
+        se retoman tras un reinicio.
+        """
+        return self._create(job_type, (func, args, kwargs), params or {}, priority=priority,
+                            single_flight=single_flight)
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancelar un trabajo activo.
+
+        Uno en cola se cancela de inmediato; uno en ejecución se detiene en su
+        próximo aviso de progreso. Devuelve el estado del trabajo o ``None`` si
+        no está activo.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            if job['status'] == JOB_RUNNING:
+                self._cancel_requested.add(job_id)
+                logger.info(f"Cancelación solicitada para el trabajo en ejecución {job_id}")
+                return self._copy(job)
+            # En cola: si esperaba cupo se quita de los diferidos, así al liberarse
+            # un cupo pasa el siguiente; si sigue en la cola, el hilo que lo saque
+            # lo descartará
+            deferred = self._deferred[job['type']]
+            remaining = [entry for entry in deferred if entry[2] != job_id]
+            if len(remaining) != len(deferred):
+                heapq.heapify(remaining)
+                self._deferred[job['type']] = remaining
+            snapshot = self._pop_finished(job_id, status=JOB_CANCELLED)
+
+        self._persist(snapshot)
+        self._publish('status', snapshot)
+        logger.info(f"Trabajo en cola {job_id} cancelado")
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Obtener una copia del estado de un trabajo (en memoria si está activo)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return self._copy(job)
+        return self.store.get_job(job_id) if self.store else None
+
+    def list(self, job_type: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Listar trabajos, los más recientes primero"""
+        jobs = self.store.list_jobs(job_type, limit=limit) if self.store else []
+        with self._lock:
+            # Los activos tienen en memoria un progreso más reciente que el guardado
+            return [self._copy(self._jobs[job['id']]) if job['id'] in self._jobs else job for job in jobs]
+
+    def active_count(self, job_type: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job_type is None or job['type'] == job_type)
+
+    def shutdown(self, wait: bool = True):
+        """Detener los hilos cuando terminen los trabajos ya encolados"""
+        for _ in self._workers:
+            self._queue.put((float('inf'), next(self._sequence), None))
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _create(self, job_type: str, call, params: Dict, priority: int = 0,
+                dedup_key: Optional[str] = None, single_flight: bool = False) -> Dict:
+        with self._lock:
+            active = [job for job in self._jobs.values() if job['type'] == job_type]
+            if single_flight and active:
+                return self._copy(active[0])
+            if dedup_key is not None:
+                for job in active:
+                    if job['dedup_key'] == dedup_key:
+                        raise DuplicateJobError(self._copy(job))
+            max_queued = self._limits.get(job_type, (None, None))[1]
+            if max_queued is not None and len(active) >= max_queued:
+                raise JobQueueFull(f"Hay {len(active)} trabajos {job_type} activos (máximo {max_queued})")
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'type': job_type,
+                'status': JOB_QUEUED,
+                'params': params,
+                'progress': {},
+                'result': None,
+                'error': None,
+                'stages': {},
+                'created_at': self._now(),
+                'started_at': None,
+                'finished_at': None,
+                'priority': priority,
+                'dedup_key': dedup_key
+            }
+            # Registrado (cuenta para dedup y límites) pero todavía fuera de la cola
+            snapshot = self._register(job, call)
+
+        # Guardar sin el lock y antes de que un hilo pueda tomarlo: si no, el estado
+        # en cola podría pisar el estado en ejecución que guarda ese hilo
+        self._persist(snapshot)
+        self._publish('status', snapshot)
+        with self._lock:
+            queued = self._jobs.get(job['id']) is job
+            if queued:
+                self._queue.put((-priority, next(self._sequence), job['id']))
+            else:
+                # Cancelado mientras se guardaba: que el estado final sea lo último guardado
+                snapshot = self._copy(job)
+        if not queued:
+            self._persist(snapshot)
+            return snapshot
+
+        logger.info(f"Trabajo {job_type} encolado con id {job['id']} (prioridad {priority})")
+        return snapshot
+
+    def _register(self, job: Dict, call) -> Dict:
+        # Requiere self._lock
+        self._jobs[job['id']] = job
+        self._calls[job['id']] = call
+        self._timing[job['id']] = {'stage': None, 'stage_started': None, 'persisted': 0.0}
+        return self._copy(job)
+
+    def _add(self, job: Dict, call) -> Dict:
+        # Requiere self._lock
+        snapshot = self._register(job, call)
+        self._queue.put((-job['priority'], next(self._sequence), job['id']))
+        return snapshot
+
+    def _worker(self):
+        while True:
+            entry = self._queue.get()
+            job_id = entry[2]
+            if job_id is None:
+                return
+
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if not job or job['status'] != JOB_QUEUED:
+                    # Cancelado mientras esperaba
+                    continue
+                max_concurrent = self._limits.get(job['type'], (None, None))[0]
+                if max_concurrent is not None and self._running[job['type']] >= max_concurrent:
+                    # Sin cupo para su tipo: espera fuera de la cola sin ocupar el hilo
+                    heapq.heappush(self._deferred[job['type']], entry)
+                    continue
+                self._running[job['type']] += 1
+                job_type = job['type']
+                func, args, kwargs = self._calls.pop(job_id)
+                job.update(status=JOB_RUNNING, started_at=self._now())
+                snapshot = self._copy(job)
+
+            try:
+                self._persist(snapshot)
+                self._publish('status', snapshot)
+                self._run(job_id, func, args, kwargs)
+            finally:
+                with self._lock:
+                    self._running[job_type] -= 1
+                    if self._deferred[job_type]:
+                        self._queue.put(heapq.heappop(self._deferred[job_type]))
+
+    def _run(self, job_id: str, func: Callable, args, kwargs):
+        def progress_callback(**progress):
+            self._progress(job_id, progress)
+
+        try:
+            result = func(*args, progress_callback=progress_callback, **kwargs)
+            self._finish(job_id, status=JOB_COMPLETED, result=result)
+            logger.info(f"Trabajo {job_id} completado")
+        except JobCancelled:
+            logger.info(f"Trabajo {job_id} cancelado durante la ejecución")
+            self._finish(job_id, status=JOB_CANCELLED)
+        except Exception as e:
+            logger.error(f"Error en el trabajo {job_id}: {str(e)}")
+            self._finish(job_id, status=JOB_FAILED, error=str(e))
+
+    def _progress(self, job_id: str, progress: Dict):
+        now = time.monotonic()
+        with self._lock:
+            if job_id in self._cancel_requested:
+                raise JobCancelled(job_id)
+            job = self._jobs[job_id]
+            timing = self._timing[job_id]
+            job['progress'].update(progress)
+            stage = progress.get('stage')
+            stage_changed = stage is not None and stage != timing['stage']
+            if stage_changed:
+                self._close_stage(job, timing, now)
+                timing['stage'], timing['stage_started'] = stage, now
+            # Guardar al cambiar de etapa o, como mucho, una vez por persist_interval
+            persist = stage_changed or now - timing['persisted'] >= self.persist_interval
+            if persist:
+                timing['persisted'] = now
+            snapshot = self._copy(job)
+        if persist:
+            self._persist(snapshot)
+        self._publish('stage' if stage_changed else 'progress', snapshot)
+
+    def _finish(self, job_id: str, **fields):
+        with self._lock:
+            snapshot = self._pop_finished(job_id, **fields)
+        self._persist(snapshot)
+        self._publish('status', snapshot)
+
+    def _pop_finished(self, job_id: str, **fields) -> Dict:
+        # Requiere self._lock
+        job = self._jobs.pop(job_id)
+        self._calls.pop(job_id, None)
+        self._cancel_requested.discard(job_id)
+        self._close_stage(job, self._timing.pop(job_id), time.monotonic())
+        job.update(fields, finished_at=self._now())
+        return self._copy(job)
+
+    @staticmethod
+    def _close_stage(job: Dict, timing: Dict, now: float):
+        # Acumular la duración (segundos) de la etapa que termina
+        if timing['stage'] is not None:
+            elapsed = now - timing['stage_started']
+            job['stages'][timing['stage']] = round(job['stages'].get(timing['stage'], 0) + elapsed, 3)
+
+    def _publish(self, event: str, job: Dict):
+        if self.events:
+            self.events.publish(job['id'], {'event': event, 'job': job})
+
+    def _persist(self, job: Dict):
+        if self.store:
+            self.store.save_job(job)
+
+    @staticmethod
+    def _copy(job: Dict) -> Dict:
+        return dict(job, progress=dict(job['progress']), stages=dict(job['stages']))
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat()
+
+class PeriodicTask:
+    """Ejecuta ``func`` cada ``interval`` segundos en un hilo daemon hasta ``stop``"""
+
+    def __init__(self, name: str, interval: float, func: Callable):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Tarea periódica {self.name} iniciada (cada {self.interval:.0f}s)")
+
+    def stop(self):
+        self._stopped.set()
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.func()
+            except Exception as e:
+                logger.error(f"Error en la tarea periódica {self.name}: {str(e)}")
+
+# Instancia global del planificador, con historial en la base de datos y eventos de progreso
+job_manager = JobManager(db_manager, max_workers=int(os.getenv('JOB_WORKERS', '4')), events=event_bus)
@@ -0,0 +1,28 @@
+"""Configuración de logging del pipeline de scraping y búsqueda de emails"""
+
+import logging
+import os
+import sys
+
+# Nivel de log del pipeline (DEBUG muestra el detalle muestreado por elemento)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# En DEBUG se registra uno de cada LOG_SAMPLE_EVERY elementos de un lote
+LOG_SAMPLE_EVERY = max(1, int(os.getenv('LOG_SAMPLE_EVERY', '100')))
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Configurar el logging de los scripts de consola (salida en UTF-8)"""
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8')
+    logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
+
+def log_sampled(logger: logging.Logger, index: int, message: str, *args):
+    """Registrar en DEBUG solo uno de cada LOG_SAMPLE_EVERY elementos.
+
+    Con el nivel por encima de DEBUG no se formatea nada, así los bucles por
+    elemento no escriben en consola y el coste es una comparación.
+    """
+    if index % LOG_SAMPLE_EVERY == 0 and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, *args)
@@ -3,30 +3,131 @@ import pandas as pd
 import json
 from datetime import datetime
 import os
-import sys
-import io
+import time
+import logging
 from dotenv import load_dotenv
 from database import db_manager
+from url_utils import canonicalize_profile_url
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from pacing import AdaptivePacer, is_retryable_error
+from log_utils import configure_logging, log_sampled
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Configurar la codificación de la consola
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+logger = logging.getLogger(__name__)
 
-def scrape_linkedin_profiles(search_name: str = None, search_description: str = None, search_url: str = None):
-    print("\n=== Iniciando búsqueda de perfiles de LinkedIn ===")
+# Perfiles del dataset del scraping que se guardan por transacción
+INGEST_BATCH_SIZE = max(1, int(os.getenv('INGEST_BATCH_SIZE', '200')))
+
+# Actor de Apify que recorre la búsqueda de LinkedIn
+SCRAPER_ACTOR_ID = "pdcNMezBkIlhX0LwO"
+# El dataset se lee mientras el actor corre: ítems por lectura y pausa (segundos)
+# cuando todavía no hay ítems nuevos
+DATASET_PAGE_SIZE = 100
+DATASET_POLL_SECONDS = float(os.getenv('DATASET_POLL_SECONDS', '5'))
+# Estados de una ejecución de Apify que todavía no terminó
+ACTIVE_RUN_STATUSES = ('READY', 'RUNNING', 'TIMING-OUT', 'ABORTING')
+# En un refresco incremental, perfiles ya conocidos seguidos tras los que se detiene el actor
+REFRESH_KNOWN_STREAK = max(1, int(os.getenv('REFRESH_KNOWN_STREAK', '25')))
+
+# Actor de Apify para la búsqueda de emails y teléfonos
+EMAIL_ACTOR_ID = "2SyF0bVxmgGr8IVCZ"
+# Valores iniciales del control de ritmo del actor de emails (ver pacing.AdaptivePacer):
+# ejecuciones simultáneas, máximo al que puede crecer, tamaño de lote y pausa (segundos)
+EMAIL_ACTOR_CONCURRENCY = max(1, int(os.getenv('EMAIL_ACTOR_CONCURRENCY', '4')))
+EMAIL_MAX_CONCURRENCY = max(EMAIL_ACTOR_CONCURRENCY, int(os.getenv('EMAIL_MAX_CONCURRENCY', '8')))
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '50'))
+EMAIL_BATCH_DELAY = float(os.getenv('EMAIL_BATCH_DELAY', '5'))
+# Intentos por lote cuando el actor responde con 429 o timeout
+EMAIL_MAX_ATTEMPTS = 3
+# Reserva de los perfiles durante una ejecución, espera base antes de reintentar
+# un perfil sin resultados (se duplica en cada intento) e intentos antes de darlo por agotado
+ENRICHMENT_LEASE_SECONDS = int(os.getenv('ENRICHMENT_LEASE_SECONDS', '3600'))
+ENRICHMENT_BACKOFF_SECONDS = int(os.getenv('ENRICHMENT_BACKOFF_SECONDS', '21600'))
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv('ENRICHMENT_MAX_ATTEMPTS', '3'))
+
+def iterate_run_items(client: ApifyClient, run_input: dict, known_streak_limit: int = None):
+    """Iniciar el actor de scraping y leer su dataset mientras corre.
+
+    Con ``known_streak_limit``, al encontrar esa cantidad de perfiles seguidos
+    que ya están en la base de datos se aborta el actor: lo que sigue en la
+    búsqueda ya se scrapeó antes. Si se deja de consumir el generador (por
+    ejemplo, al cancelar el trabajo) también se aborta la ejecución.
+    """
+    run = client.actor(SCRAPER_ACTOR_ID).start(run_input=run_input)
+    run_client = client.run(run['id'])
+    dataset_client = client.dataset(run['defaultDatasetId'])
+    offset = 0
+    known_streak = 0
+    status = run.get('status')
+    try:
+        while True:
+            # Leer el estado antes que los ítems: si ya terminó, esta lectura trae los últimos
+            status = (run_client.get() or {}).get('status')
+            items = dataset_client.list_items(offset=offset, limit=DATASET_PAGE_SIZE).items
+            offset += len(items)
+            
+            if known_streak_limit and items:
+                known = db_manager.get_profiles_by_canonical_urls(
+                    [item.get('linkedinUrl', '') or item.get('profileUrl', '') for item in items]
+                )
+            for item in items:
+                if known_streak_limit:
+                    profile_url = item.get('linkedinUrl', '') or item.get('profileUrl', '')
+                    known_streak = known_streak + 1 if profile_url and canonicalize_profile_url(profile_url) in known else 0
+                    if known_streak >= known_streak_limit:
+                        logger.info(f"{known_streak} perfiles conocidos seguidos tras {offset} ítems: "
+                                    f"se detiene el refresco")
+                        return
+                yield item
+            
+            if len(items) < DATASET_PAGE_SIZE:
+                if status not in ACTIVE_RUN_STATUSES:
+                    break
+                time.sleep(DATASET_POLL_SECONDS)
+        
+        if status != 'SUCCEEDED':
+            logger.warning(f"El actor de scraping terminó con estado {status}")
+    finally:
+        if status in ACTIVE_RUN_STATUSES:
+            try:
+                run_client.abort()
+                logger.info(f"Ejecución {run['id']} del actor de scraping abortada")
+            except Exception as e:
+                logger.error(f"Error al abortar la ejecución {run['id']}: {str(e)}")
+
+def scrape_linkedin_profiles(search_name: str = None, search_description: str = None, search_url: str = None,
+                             progress_callback=None, search_id: int = None, incremental: bool = False):
+    """Ejecutar el actor de scraping, guardar los perfiles y buscar sus emails.
+
+    ``progress_callback`` (opcional) recibe la etapa en curso (``actor``,
+    ``ingest`` o ``enrichment``) y los contadores de la ingesta; durante la
+    etapa ``enrichment`` el avance de la búsqueda de emails llega en
+    ``enrichment``.
+
+    Con ``search_id`` los perfiles se asocian a esa búsqueda existente. Con
+    ``incremental`` el actor se detiene al llegar a perfiles ya conocidos
+    (ver ``iterate_run_items``), así un refresco cuesta solo lo nuevo; el
+    refresco no busca emails: los perfiles nuevos quedan pendientes para la
+    próxima búsqueda de emails.
+    """
+    logger.info("Iniciando búsqueda de perfiles de LinkedIn")
+    
+    def report(**progress):
+        if progress_callback:
+            progress_callback(**progress)
     
     # Verificar que se proporcione una URL de búsqueda
     if not search_url:
-        print("Error: Se requiere una URL de búsqueda de LinkedIn")
+        logger.error("Se requiere una URL de búsqueda de LinkedIn")
         return None
     
     # Obtener API key desde variables de entorno
     APIFY_API_KEY = os.getenv('APIFY_API_KEY')
     if not APIFY_API_KEY:
-        print("Error: No se encontró la variable de entorno APIFY_API_KEY")
+        logger.error("No se encontró la variable de entorno APIFY_API_KEY")
         return None
     
     urlsearch = search_url
@@ -126,264 +227,353 @@ def scrape_linkedin_profiles(search_name: str = None, search_description: str =
         "startPage": 1
     }
     
-    # Run the Actor and wait for it to finish
-    run = client.actor("pdcNMezBkIlhX0LwO").call(run_input=run_input)
-    
-    if not run:
-        print("Error: No se pudo ejecutar el actor de Apify")
-        return None
-    
-    # Obtener perfiles existentes de la base de datos
-    existing_profiles = db_manager.get_all_profiles()
-    existing_urls = {profile['profileUrl'].split('?')[0] for profile in existing_profiles if isinstance(profile.get('profileUrl'), str)}
-    
-    print(f"Se encontraron {len(existing_profiles)} registros existentes en la base de datos.")
-    
-    # Listas para almacenar los datos procesados y todos los perfiles encontrados
-    datos_procesados = []
-    all_found_urls = []  # URLs de todos los perfiles encontrados en esta búsqueda
-    all_found_profiles = []  # Perfiles completos encontrados (nuevos o existentes)
-    
-    # Fetch and process Actor results from the run's dataset
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+    # Iniciar el actor y leer el dataset por micro-lotes mientras corre: cada lote
+    # se guarda y se asocia a la búsqueda en su propia transacción, así la memoria
+    # no depende del tamaño del dataset y los perfiles aparecen en la interfaz
+    # mientras se procesa
+    report(stage='actor')
+    run_started = time.monotonic()
+    totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'linked': 0, 'profiles': 0, 'batches': 0}
+    
+    def ingest_batch(batch_profiles):
+        nonlocal search_id
+        # Una sola conexión del pool para las consultas del lote; se devuelve al
+        # terminarlo, así no queda fijada mientras se espera al actor
+        with db_manager.pool.pinned():
+            # La búsqueda se crea con el primer lote, así no quedan búsquedas vacías
+            if search_name and search_id is None:
+                search_id = db_manager.create_search(search_name, search_description or "", search_url)
+                if not search_id:
+                    raise RuntimeError("No se pudo crear la búsqueda en la base de datos")
+                logger.info(f"Búsqueda creada con ID: {search_id}")
+            
+            # Los perfiles existentes solo se reescriben si el scraping trae datos nuevos
+            batch_started = time.monotonic()
+            ingest_result = db_manager.upsert_profiles_batch(batch_profiles, search_id)
+        totals['inserted'] += len(ingest_result['inserted'])
+        totals['updated'] += len(ingest_result['updated'])
+        totals['unchanged'] += len(ingest_result['unchanged'])
+        totals['linked'] += ingest_result['linked']
+        totals['profiles'] += len(batch_profiles)
+        totals['batches'] += 1
+        logger.info(f"Lote {totals['batches']}: {len(batch_profiles)} perfiles, {len(ingest_result['inserted'])} nuevos, "
+                    f"{len(ingest_result['updated'])} actualizados, {len(ingest_result['unchanged'])} sin cambios, "
+                    f"{ingest_result['linked']} asociados en {time.monotonic() - batch_started:.2f}s")
+        report(search_id=search_id, **totals)
+    
+    batch_profiles = {}
+    items = iterate_run_items(client, run_input, REFRESH_KNOWN_STREAK if incremental else None)
+    for item_index, item in enumerate(items):
+        if item_index == 0:
+            report(stage='ingest', **totals)
+        
         # El actor devuelve 'linkedinUrl' en lugar de 'profileUrl'
         profile_url = item.get('linkedinUrl', '') or item.get('profileUrl', '')
         if not profile_url:
             continue
         
-        # Log para debug: ver qué campos trae el scraping masivo
-        print(f"\n=== DEBUG: Campos del perfil {item.get('fullName', 'N/A')} ===")
-        print(f"URL: {profile_url}")
-        print(f"Email del scraping: {item.get('email', 'NO ENCONTRADO')}")
-        print(f"Teléfono del scraping: {item.get('mobileNumber', 'NO ENCONTRADO')}")
-        print(f"Campos disponibles: {list(item.keys())}")
+        # Muestra de los campos que trae el scraping masivo (solo en DEBUG)
+        log_sampled(logger, item_index, "Perfil %s (%s): email=%r, teléfono=%r, campos=%s",
+                    item.get('fullName', 'N/A'), profile_url, item.get('email'), item.get('mobileNumber'), list(item.keys()))
         
-        clean_url = profile_url.split('?')[0]
-        all_found_urls.append(clean_url)
-        email_scraped = item.get('email', '')
-        mobile_scraped = item.get('mobileNumber', '')
-        # Si es nuevo, lo agregamos a datos_procesados
-        if clean_url not in existing_urls:
-            dato_procesado = {
-                'fullName': item.get('fullName', ''),
-                'headline': item.get('headline', ''),
-                'id': item.get('id', ''),
-                'lastName': item.get('lastName', ''),
-                'location': item.get('location', ''),
-                'picture': item.get('picture', ''),
-                'profileId': item.get('profileId', ''),
-                'profileUrl': profile_url,
-                'email': email_scraped,
-                'mobileNumber': mobile_scraped,
-                'email_checked': bool(email_scraped)
-            }
-            datos_procesados.append(dato_procesado)
-            all_found_profiles.append(dato_procesado)
-            existing_urls.add(clean_url)
-            print(f"Nuevo registro encontrado: {dato_procesado['fullName']}")
-        else:
-            # Buscar el perfil existente y agregarlo a la lista de encontrados
-            for p in existing_profiles:
-                if p['profileUrl'].split('?')[0] == clean_url:
-                    all_found_profiles.append(p)
-                    # Si el scraping trae un email o teléfono nuevo, actualizar el perfil
-                    update_needed = False
-                    new_email = email_scraped if email_scraped else p.get('email', '')
-                    new_mobile = mobile_scraped if mobile_scraped else p.get('mobileNumber', '')
-                    if (email_scraped and email_scraped != p.get('email', '')) or (mobile_scraped and mobile_scraped != p.get('mobileNumber', '')):
-                        db_manager.update_profiles_contact_info_batch([
-                            {'profileUrl': profile_url, 'email': new_email, 'mobileNumber': new_mobile}
-                        ])
-                        print(f"Perfil existente actualizado con nuevo email/teléfono: {p.get('fullName', '')}")
-                    break
-            print(f"Registro existente encontrado: {item.get('fullName', '')}")
-    
-    # Si no se encontró ningún perfil (ni nuevo ni existente), no crear la búsqueda
-    if not all_found_profiles:
-        print("No se encontraron perfiles (ni nuevos ni existentes). No se creará la búsqueda.")
+        # Un perfil por URL canónica dentro del lote; entre lotes el upsert es idempotente
+        clean_url = canonicalize_profile_url(profile_url)
+        if clean_url in batch_profiles:
+            continue
+        email_scraped = item.get('email') or ''
+        batch_profiles[clean_url] = {
+            'fullName': item.get('fullName', ''),
+            'headline': item.get('headline', ''),
+            'id': item.get('id', ''),
+            'lastName': item.get('lastName', ''),
+            'location': item.get('location', ''),
+            'picture': item.get('picture', ''),
+            'profileId': item.get('profileId', ''),
+            'profileUrl': profile_url,
+            'email': email_scraped,
+            'mobileNumber': item.get('mobileNumber') or '',
+            'email_checked': bool(email_scraped)
+        }
+        
+        if len(batch_profiles) >= INGEST_BATCH_SIZE:
+            ingest_batch(list(batch_profiles.values()))
+            batch_profiles = {}
+    
+    if batch_profiles:
+        ingest_batch(list(batch_profiles.values()))
+    logger.info(f"Actor de scraping terminado en {time.monotonic() - run_started:.1f}s")
+    if search_id:
+        db_manager.mark_search_scraped(search_id)
+    
+    # Si no se encontró ningún perfil (ni nuevo ni existente), no se creó la búsqueda
+    if totals['batches'] == 0:
+        if search_id:
+            logger.info(f"La búsqueda {search_id} no tiene perfiles nuevos")
+            return search_id
+        logger.warning("No se encontraron perfiles (ni nuevos ni existentes). No se creará la búsqueda.")
         return None
     
-    # Crear la búsqueda en la base de datos
-    if search_name:
-        search_id = db_manager.create_search(search_name, search_description or "", search_url)
-        if not search_id:
-            print("Error: No se pudo crear la búsqueda en la base de datos")
-            return None
-        print(f"Búsqueda creada con ID: {search_id}")
-    else:
-        search_id = None
-    
-    # Insertar nuevos perfiles en la base de datos
-    if datos_procesados:
-        inserted_count = db_manager.insert_profiles_batch(datos_procesados)
-        print(f"\nNuevos registros insertados en la base de datos: {inserted_count}")
-    
-    # Asociar TODOS los perfiles encontrados a la búsqueda
-    if search_id and all_found_profiles:
-        # Obtener los IDs de todos los perfiles encontrados (nuevos y existentes)
-        profile_urls_to_find = [p['profileUrl'] for p in all_found_profiles if p.get('profileUrl')]
-        profile_ids_by_url = db_manager.get_profile_ids_by_urls(profile_urls_to_find)
-        profile_ids_to_add = list(profile_ids_by_url.values())
-        # Eliminar duplicados manteniendo el orden
-        unique_profile_ids = list(dict.fromkeys(profile_ids_to_add))
-        added_to_search = db_manager.add_profiles_to_search_batch(search_id, unique_profile_ids)
-        print(f"Perfiles agregados a la búsqueda {search_id}: {added_to_search}")
-        print(f"Total de perfiles únicos encontrados en esta búsqueda: {len(unique_profile_ids)}")
-    
-    total_profiles = db_manager.get_profile_count()
-    print(f"Total de registros en la base de datos: {total_profiles}")
-    print(f"Nuevos registros agregados: {len(datos_procesados)}")
-    print(f"Total de perfiles encontrados en esta búsqueda: {len(all_found_profiles)}")
+    logger.info(f"Scraping guardado en {totals['batches']} lotes: {totals['profiles']} perfiles procesados, "
+                f"{totals['inserted']} nuevos, {totals['updated']} actualizados, {totals['unchanged']} sin cambios")
+    if search_id:
+        logger.info(f"Perfiles agregados a la búsqueda {search_id}: {totals['linked']} "
+                    f"(perfiles únicos en la búsqueda: {db_manager.get_search_profile_count(search_id)})")
+    logger.info(f"Total de registros en la base de datos: {db_manager.get_profile_count()}")
+    
+    if incremental:
+        # Cada búsqueda de emails recorre todo el backlog: no lanzar una por refresco
+        logger.info("Refresco terminado; los perfiles nuevos esperan a la próxima búsqueda de emails")
+        return search_id if search_id else "profiles.db"
     
     # Buscar emails automáticamente después del scraping
-    print("\n=== Iniciando búsqueda automática de emails ===")
-    find_emails()
+    logger.info("Iniciando búsqueda automática de emails")
+    report(stage='enrichment')
+    find_emails(progress_callback=lambda **progress: report(enrichment=progress))
     
     return search_id if search_id else "profiles.db"
 
-def find_emails():
-    print("\n=== Iniciando búsqueda de emails y números ===")
+def find_emails(progress_callback=None):
+    """Buscar emails y teléfonos de los perfiles sin verificar, por lotes.
+
+    ``progress_callback`` (opcional) recibe tras cada lote las URLs en cola,
+    terminadas y fallidas y una estimación del tiempo restante en segundos.
+    Devuelve un resumen de la ejecución.
+    """
+    logger.info("Iniciando búsqueda de emails y números")
     
     # Obtener API key desde variables de entorno
     APIFY_API_KEY = os.getenv('APIFY_API_KEY')
     if not APIFY_API_KEY:
-        print("Error: No se encontró la variable de entorno APIFY_API_KEY")
-        return
+        logger.error("No se encontró la variable de entorno APIFY_API_KEY")
+        raise ValueError("No se encontró la variable de entorno APIFY_API_KEY")
     
     # Initialize the ApifyClient with your API token
     client = ApifyClient(APIFY_API_KEY)
     
-    # DEBUG: Verificar estado de los perfiles
-    debug_status = db_manager.debug_profiles_status()
-    print(f"\n=== DEBUG: Estado de la base de datos ===")
-    print(f"Total de perfiles: {debug_status.get('total_profiles', 0)}")
-    print(f"Perfiles con email: {debug_status.get('profiles_with_email', 0)}")
-    print(f"Perfiles marcados como verificados: {debug_status.get('profiles_checked', 0)}")
-    print(f"Perfiles marcados como NO verificados: {debug_status.get('profiles_unchecked', 0)}")
-    print(f"Perfiles con URL válida: {debug_status.get('profiles_with_url', 0)}")
-    
-    # Obtener perfiles que no han sido verificados para email
-    perfiles_sin_procesar = db_manager.get_profiles_without_email()
-    
-    print(f"DEBUG: Perfiles sin procesar encontrados: {len(perfiles_sin_procesar)}")
-    
-    if len(perfiles_sin_procesar) == 0:
-        print("No hay perfiles nuevos para buscar contactos.")
-        return
-    
-    # Mostrar algunos perfiles para debug
-    print("DEBUG: Primeros 3 perfiles sin procesar:")
-    for i, profile in enumerate(perfiles_sin_procesar[:3]):
-        print(f"  {i+1}. {profile.get('fullName', 'N/A')} - {profile.get('profileUrl', 'N/A')} - email_checked: {profile.get('email_checked', 'N/A')}")
-    
-    # Filtrar solo perfiles que tienen URL válida
-    perfiles_con_url = [profile for profile in perfiles_sin_procesar if profile.get('profileUrl') and profile['profileUrl'].strip()]
-    
-    print(f"DEBUG: Perfiles con URL válida: {len(perfiles_con_url)}")
-    
-    if len(perfiles_con_url) == 0:
-        print("No hay perfiles con URLs válidas para procesar.")
-        return
-    
-    # Limpiar URLs para el actor de emails (remover parámetros de query)
-    listprofile = []
-    for profile in perfiles_con_url:
-        url = profile['profileUrl']
-        # Remover parámetros de query para obtener la URL base del perfil
-        clean_url = url.split('?')[0]
-        listprofile.append(clean_url)
-        print(f"DEBUG: URL original: {url}")
-        print(f"DEBUG: URL limpia para email search: {clean_url}")
-    print(f"URLs a procesar: {len(listprofile)}")
-    
-    # Limitar el número de URLs por lote para evitar timeouts
-    batch_size = 50
+    # Estado de los perfiles antes de empezar
+    logger.debug(f"Estado de la base de datos: {db_manager.debug_profiles_status()}")
+    
+    # Los perfiles se reservan lote a lote al lanzar cada ejecución del actor: los
+    # intentos y la reserva solo cuentan para las URLs que realmente se envían
+    enrichment_summary = db_manager.get_enrichment_summary()
+    logger.info(f"Perfiles en espera por intentos anteriores: {enrichment_summary.get('cooling_down', 0)}, "
+                f"agotados tras {ENRICHMENT_MAX_ATTEMPTS} intentos: {enrichment_summary.get('exhausted', 0)}")
+    pending_estimate = db_manager.count_profiles_pending_enrichment()
+    
+    if pending_estimate == 0:
+        logger.info("No hay perfiles nuevos para buscar contactos.")
+        return {'total_urls': 0, 'done': 0, 'failed': 0, 'updated': 0}
+    logger.info(f"URLs a procesar: {pending_estimate}")
+    
+    # Perfiles reservados indexados por URL canónica para cruzar los resultados en O(1)
+    perfiles_por_url = {}
+    
+    # El tamaño de lote, la concurrencia y la pausa se ajustan según cómo respondan las ejecuciones
+    pacer = AdaptivePacer(
+        batch_size=EMAIL_BATCH_SIZE,
+        concurrency=EMAIL_ACTOR_CONCURRENCY,
+        max_concurrency=EMAIL_MAX_CONCURRENCY,
+        delay=EMAIL_BATCH_DELAY
+    )
     total_processed = 0
-    
-    for i in range(0, len(listprofile), batch_size):
-        batch_urls = listprofile[i:i + batch_size]
-        print(f"\nProcesando lote {i//batch_size + 1} de {(len(listprofile) + batch_size - 1)//batch_size}")
-        print(f"URLs en este lote: {len(batch_urls)}")
-        
-        # Prepare the Actor input
-        run_input = { "profileUrls": batch_urls }
-        
-        # Run the Actor and wait for it to finish
-        print("Iniciando búsqueda de emails y números...")
-        run = client.actor("2SyF0bVxmgGr8IVCZ").call(run_input=run_input)
-        
+    claimed_total = 0
+    backlog_exhausted = False
+    # Lotes a reintentar tras un 429 o timeout, con su número de intentos
+    retry_batches = deque()
+    progress = {'total_urls': pending_estimate, 'queued': pending_estimate, 'done': 0, 'failed': 0,
+                'batches_total': 0, 'batches_done': 0, 'updated': 0, 'eta_seconds': None,
+                'throughput_per_minute': 0.0}
+    started_at = time.monotonic()
+    
+    def report_batch(batch_urls, failed):
+        # Actualizar el progreso y estimar el tiempo restante con el ritmo medio
+        progress['failed' if failed else 'done'] += len(batch_urls)
+        progress['batches_done'] += 1
+        # Los totales son estimaciones: el tamaño de lote cambia durante la ejecución
+        # y otros procesos pueden reservar perfiles del mismo backlog
+        progress['total_urls'] = claimed_total if backlog_exhausted else max(pending_estimate, claimed_total)
+        finished = progress['done'] + progress['failed']
+        progress['queued'] = max(0, progress['total_urls'] - finished)
+        in_flight = sum(len(urls) for urls, _ in pending.values()) + sum(len(urls) for urls, _ in retry_batches)
+        batches_left = (max(0, progress['queued'] - in_flight) + pacer.batch_size - 1) // pacer.batch_size
+        progress['batches_total'] = progress['batches_done'] + len(pending) + len(retry_batches) + batches_left
+        progress['updated'] = total_processed
+        progress['throughput_per_minute'] = pacer.throughput()
+        progress['eta_seconds'] = round((time.monotonic() - started_at) / finished * progress['queued'], 1)
+        if progress_callback:
+            progress_callback(**progress)
+    
+    if progress_callback:
+        progress_callback(**progress)
+    
+    def record_outcome(batch_urls, status):
+        profile_ids = [perfiles_por_url[url]['id'] for url in batch_urls if url in perfiles_por_url]
+        db_manager.record_enrichment_outcome(
+            profile_ids, status,
+            backoff_seconds=ENRICHMENT_BACKOFF_SECONDS,
+            max_attempts=ENRICHMENT_MAX_ATTEMPTS
+        )
+    
+    def run_batch(batch_urls):
+        # Se ejecuta en un hilo del pool: lanza el actor y lee su dataset
+        logger.debug(f"Iniciando lote de {len(batch_urls)} URLs")
+        run_started = time.monotonic()
+        # El actor recibe la URL guardada sin la query: la canónica va en minúsculas y
+        # decodificada, y con eso puede no encontrar los slugs con acentos o escapes
+        profile_urls = [perfiles_por_url[url]['profileUrl'].split('?')[0] for url in batch_urls]
+        run = client.actor(EMAIL_ACTOR_ID).call(run_input={ "profileUrls": profile_urls })
         if not run:
-            print("Error: No se pudo ejecutar el actor de Apify para búsqueda de emails")
-            continue
-        
-        # Lista para almacenar actualizaciones de contactos
-        contact_updates = []
-        
-        # Fetch and process Actor results
-        print("Procesando resultados...")
-        results_count = 0
-        for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-            results_count += 1
-            # El actor de emails devuelve 'linkedinUrl'
-            profile_url = item.get('linkedinUrl', '') or item.get('profileUrl', '')
-            email = item.get('email', '')
-            mobile = item.get('mobileNumber', '')
-            
-            # DEBUG: Mostrar información del resultado
-            print(f"DEBUG: Resultado {results_count} - URL: {profile_url}")
-            print(f"DEBUG: Email encontrado: {email}")
-            print(f"DEBUG: Teléfono encontrado: {mobile}")
-            print(f"DEBUG: Todos los campos: {list(item.keys())}")
+            return None, time.monotonic() - run_started
+        items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
+        return items, time.monotonic() - run_started
+    
+    def next_batch():
+        nonlocal claimed_total, backlog_exhausted
+        if retry_batches:
+            return retry_batches.popleft()
+        # Reservar el siguiente lote del backlog (suma un intento e inicia la reserva)
+        while True:
+            claimed = db_manager.claim_profiles_for_enrichment(
+                limit=pacer.batch_size, lease_seconds=ENRICHMENT_LEASE_SECONDS
+            )
+            if not claimed:
+                backlog_exhausted = True
+                return None
+            batch_urls = []
+            for profile in claimed:
+                # Los lotes se identifican por URL canónica, que es con la que se cruzan los resultados
+                clean_url = profile.get('canonical_url') or canonicalize_profile_url(profile['profileUrl'])
+                if clean_url and clean_url not in perfiles_por_url:
+                    perfiles_por_url[clean_url] = profile
+                    batch_urls.append(clean_url)
+                    log_sampled(logger, claimed_total + len(batch_urls), "URL original %s, URL canónica %s",
+                                profile['profileUrl'], clean_url)
+            claimed_total += len(batch_urls)
+            if batch_urls:
+                return batch_urls, 1
+    
+    # Mantener en vuelo tantas ejecuciones del actor como permita el controlador
+    # y volcar cada dataset a la base de datos en cuanto su ejecución termina
+    pending = {}
+    with ThreadPoolExecutor(max_workers=pacer.max_concurrency, thread_name_prefix='email-actor') as executor:
+        first_start = True
+        while not backlog_exhausted or retry_batches or pending:
+            while (not backlog_exhausted or retry_batches) and len(pending) < pacer.concurrency:
+                if not first_start and pacer.delay > 0:
+                    # Pausa entre arranques para no saturar la API
+                    time.sleep(pacer.delay)
+                first_start = False
+                batch = next_batch()
+                if batch is None:
+                    break
+                batch_urls, attempt = batch
+                pending[executor.submit(run_batch, batch_urls)] = (batch_urls, attempt)
             
-            if profile_url:
-                # Buscar el perfil original en la base de datos usando la URL limpia
-                clean_url = profile_url.split('?')[0]
-                # Buscar perfiles que coincidan con esta URL limpia
-                matching_profiles = [p for p in perfiles_con_url if p['profileUrl'].split('?')[0] == clean_url]
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch_urls, attempt = pending.pop(future)
+                try:
+                    items, elapsed = future.result()
+                except Exception as e:
+                    logger.error(f"Error al ejecutar el actor de Apify para búsqueda de emails: {str(e)}")
+                    pacer.record_failure(e)
+                    if is_retryable_error(e) and attempt < EMAIL_MAX_ATTEMPTS:
+                        logger.warning(f"Reintentando lote de {len(batch_urls)} URLs (intento {attempt + 1})")
+                        retry_batches.append((batch_urls, attempt + 1))
+                    else:
+                        record_outcome(batch_urls, 'failed')
+                        report_batch(batch_urls, failed=True)
+                    continue
                 
-                if matching_profiles:
-                    # Usar la URL original del perfil para la actualización
-                    original_url = matching_profiles[0]['profileUrl']
-                    contact_updates.append({
-                        'profileUrl': original_url,
-                        'email': email if email is not None else '',
-                        'mobileNumber': mobile if mobile is not None else ''
-                    })
-                    print(f"DEBUG: Perfil encontrado para actualizar: {matching_profiles[0].get('fullName', 'N/A')}")
-                else:
-                    print(f"DEBUG: No se encontró perfil coincidente para URL: {clean_url}")
-        
-        print(f"DEBUG: Total de resultados procesados: {results_count}")
-        
-        # Actualizar la base de datos con los nuevos datos de contacto
-        if contact_updates:
-            updated_count = db_manager.update_profiles_contact_info_batch(contact_updates)
-            print(f"Perfiles actualizados en este lote: {updated_count}")
-            total_processed += updated_count
-        
-        # Pequeña pausa entre lotes para evitar sobrecarga
-        if i + batch_size < len(listprofile):
-            print("Esperando 5 segundos antes del siguiente lote...")
-            import time
-            time.sleep(5)
+                if items is None:
+                    logger.error("No se pudo ejecutar el actor de Apify para búsqueda de emails")
+                    pacer.record_failure()
+                    record_outcome(batch_urls, 'failed')
+                    report_batch(batch_urls, failed=True)
+                    continue
+                
+                pacer.record_success(len(batch_urls), elapsed)
+                
+                # Lista para almacenar actualizaciones de contactos
+                contact_updates = []
+                found_urls = set()
+                unmatched = 0
+                
+                # Fetch and process Actor results
+                db_started = time.monotonic()
+                for results_count, item in enumerate(items):
+                    # El actor de emails devuelve 'linkedinUrl'
+                    profile_url = item.get('linkedinUrl', '') or item.get('profileUrl', '')
+                    email = item.get('email', '')
+                    mobile = item.get('mobileNumber', '')
+                    
+                    # Muestra de los resultados del actor (solo en DEBUG)
+                    log_sampled(logger, results_count, "Resultado %s: email=%r, teléfono=%r, campos=%s",
+                                profile_url, email, mobile, list(item.keys()))
+                    
+                    if profile_url:
+                        # Buscar el perfil original usando la URL canónica
+                        clean_url = canonicalize_profile_url(profile_url)
+                        matching_profile = perfiles_por_url.get(clean_url)
+                        
+                        if matching_profile:
+                            found_urls.add(clean_url)
+                            # Usar la URL original del perfil para la actualización
+                            original_url = matching_profile['profileUrl']
+                            contact_updates.append({
+                                'profileUrl': original_url,
+                                'email': email if email is not None else '',
+                                'mobileNumber': mobile if mobile is not None else ''
+                            })
+                        else:
+                            unmatched += 1
+                
+                # Actualizar la base de datos con los nuevos datos de contacto; el
+                # tramo usa una sola conexión del pool y la devuelve al terminar
+                updated_count = 0
+                with db_manager.pool.pinned():
+                    if contact_updates:
+                        updated_count = db_manager.update_profiles_contact_info_batch(contact_updates)
+                        total_processed += updated_count
+                    
+                    # Checkpoint del lote: los perfiles sin resultados esperan antes de reintentarse
+                    record_outcome([url for url in batch_urls if url in found_urls], 'done')
+                    record_outcome([url for url in batch_urls if url not in found_urls], 'no_result')
+                
+                logger.info(f"Lote de {len(batch_urls)} URLs: {len(items)} resultados, {updated_count} perfiles actualizados, "
+                            f"{unmatched} sin perfil coincidente; actor {elapsed:.1f}s, base de datos {time.monotonic() - db_started:.2f}s")
+                report_batch(batch_urls, failed=False)
     
     # Obtener estadísticas finales
-    total_profiles = db_manager.get_profile_count()
-    profiles_with_emails = len(db_manager.get_profiles_with_emails())
-    
-    print(f"\n=== Resumen de la búsqueda de emails ===")
-    print(f"Total de perfiles en la base de datos: {total_profiles}")
-    print(f"Perfiles con emails: {profiles_with_emails}")
-    print(f"Perfiles procesados en esta sesión: {total_processed}")
-    print(f"Perfiles restantes sin verificar: {len(perfiles_sin_procesar) - total_processed}")
+    with db_manager.pool.pinned():
+        total_profiles = db_manager.get_profile_count()
+        profiles_with_emails = db_manager.get_statistics().get('profiles_with_email', 0)
+    
+    logger.info(f"Resumen de la búsqueda de emails: {total_profiles} perfiles en la base de datos, "
+                f"{profiles_with_emails} con email, {total_processed} procesados en esta sesión, "
+                f"{claimed_total - total_processed} de {claimed_total} reservados sin email, "
+                f"{time.monotonic() - started_at:.1f}s")
+    logger.info(f"Ritmo del actor: {pacer.stats()}")
+    
+    return {
+        'total_urls': claimed_total,
+        'done': progress['done'],
+        'failed': progress['failed'],
+        'updated': total_processed,
+        'profiles_with_email': profiles_with_emails,
+        'pacing': pacer.stats()
+    }
 
 def main():
-    print("=== Iniciando proceso de búsqueda de emails ===")
+    logger.info("Iniciando proceso de búsqueda de emails")
     
     # Solo buscar emails y números (el scraping se hace desde el servidor)
     find_emails()
     
-    print("\n=== Proceso completado ===")
+    logger.info("Proceso completado")
 
 if __name__ == "__main__":
+    configure_logging()
     main() 
\ No newline at end of file
@@ -53,7 +53,7 @@ def migrate_excel_files():
     
     # Mostrar estadísticas finales
     total_profiles = db_manager.get_profile_count()
-    profiles_with_emails = len(db_manager.get_profiles_with_emails())
+    profiles_with_emails = db_manager.get_statistics().get('profiles_with_email', 0)
     
     logger.info(f"Estadísticas finales:")
     logger.info(f"- Total de perfiles en la base de datos: {total_profiles}")
@@ -0,0 +1,114 @@
+"""Control adaptativo del ritmo de llamadas a los actores de Apify"""
+
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+# Fragmentos de mensajes de error que indican límite de peticiones o saturación
+_RETRYABLE_MARKERS = ('429', 'too many requests', 'rate limit', 'timeout', 'timed out')
+
+def is_retryable_error(error: Exception) -> bool:
+    """Indica si un error de Apify es por límite de peticiones o timeout (vale la pena reintentar)"""
+    if getattr(error, 'status_code', None) == 429 or isinstance(error, TimeoutError):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _RETRYABLE_MARKERS)
+
+class AdaptivePacer:
+    """Controlador AIMD del tamaño de lote, la concurrencia y la pausa entre lotes.
+
+    Mientras las ejecuciones terminan bien y dentro de ``target_seconds``, el
+    tamaño de lote crece de forma aditiva, la concurrencia sube en uno por cada
+    ronda completa de éxitos y la pausa se reduce a la mitad. Ante un error
+    (429, timeouts, fallos del actor) tamaño y concurrencia se reducen a la
+    mitad y la pausa se duplica. Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self, batch_size: int = 50, min_batch_size: int = 10, max_batch_size: int = 200,
+                 batch_step: int = 10, concurrency: int = 1, max_concurrency: int = 1,
+                 delay: float = 5.0, min_delay: float = 0.0, max_delay: float = 120.0,
+                 target_seconds: float = 300.0):
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max(max_batch_size, min_batch_size)
+        self.batch_step = batch_step
+        self.max_concurrency = max(1, max_concurrency, concurrency)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_seconds = target_seconds
+
+        self._batch_size = min(max(batch_size, min_batch_size), self.max_batch_size)
+        self._concurrency = max(1, concurrency)
+        self._delay = min(max(delay, min_delay), max_delay)
+        self._successes_in_round = 0
+        self._lock = threading.Lock()
+
+        self._started_at = time.monotonic()
+        self._items = 0
+        self._runs = 0
+        self._failures = 0
+
+    @property
+    def batch_size(self) -> int:
+        with self._lock:
+            return self._batch_size
+
+    @property
+    def concurrency(self) -> int:
+        with self._lock:
+            return self._concurrency
+
+    @property
+    def delay(self) -> float:
+        with self._lock:
+            return self._delay
+
+    def record_success(self, items: int, elapsed: float):
+        """Registrar una ejecución correcta de ``items`` elementos que tardó ``elapsed`` segundos"""
+        with self._lock:
+            self._items += items
+            self._runs += 1
+            self._delay = max(self.min_delay, self._delay / 2)
+
+            if elapsed > self.target_seconds:
+                # Ejecución lenta: encoger el lote para volver al tiempo objetivo
+                scaled = int(self._batch_size * self.target_seconds / elapsed)
+                self._batch_size = max(self.min_batch_size, scaled)
+                self._successes_in_round = 0
+                return
+
+            self._batch_size = min(self.max_batch_size, self._batch_size + self.batch_step)
+            self._successes_in_round += 1
+            if self._successes_in_round >= self._concurrency:
+                self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+                self._successes_in_round = 0
+
+    def record_failure(self, error: Optional[Exception] = None, retry_after: Optional[float] = None):
+        """Registrar un fallo: reducción multiplicativa y pausa más larga"""
+        with self._lock:
+            self._runs += 1
+            self._failures += 1
+            self._batch_size = max(self.min_batch_size, self._batch_size // 2)
+            self._concurrency = max(1, math.ceil(self._concurrency / 2))
+            self._delay = min(self.max_delay, max(self._delay * 2, 1.0, retry_after or 0.0))
+            self._successes_in_round = 0
+
+    def throughput(self) -> float:
+        """Elementos procesados por minuto desde la creación del controlador"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at
+            return round(self._items / elapsed * 60, 1) if elapsed > 0 else 0.0
+
+    def stats(self) -> Dict:
+        """Estado actual del controlador y rendimiento alcanzado"""
+        throughput = self.throughput()
+        with self._lock:
+            return {
+                'batch_size': self._batch_size,
+                'concurrency': self._concurrency,
+                'delay': round(self._delay, 2),
+                'runs': self._runs,
+                'failures': self._failures,
+                'items': self._items,
+                'throughput_per_minute': throughput
+            }
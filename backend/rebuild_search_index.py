@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir el índice de búsqueda de texto completo (FTS5) de perfiles
+"""
+
+import logging
+import time
+from database import db_manager
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Reconstruir el índice a partir de la tabla de perfiles"""
+    logger.info("Reconstruyendo índice de búsqueda...")
+    start = time.time()
+    
+    if db_manager.rebuild_search_index():
+        logger.info(f"Índice reconstruido en {time.time() - start:.2f}s "
+                    f"({db_manager.get_profile_count()} perfiles)")
+    else:
+        logger.error("No se pudo reconstruir el índice de búsqueda")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from apify_client import ApifyClient
 from flask_cors import CORS
 import pandas as pd
@@ -6,24 +6,26 @@ import os
 import logging
 import numpy as np
 import io
+import json
 import codecs
-import threading
-import time
-from queue import Queue
+import queue
 import traceback
-import requests
-from datetime import datetime
-import pytz
 import secrets
 from functools import wraps
 from dotenv import load_dotenv
 from database import db_manager
 from main import scrape_linkedin_profiles, find_emails
-
-# Configurar logging
+from jobs import (job_manager, PeriodicTask, DuplicateJobError, JobQueueFull, ACTIVE_STATES, JOB_COMPLETED,
+                  JOB_FAILED, JOB_CANCELLED, JOB_INTERRUPTED)
+from events import event_bus
+from log_utils import LOG_LEVEL, LOG_FORMAT
+from hubspot import HubSpotClient
+from url_utils import canonicalize_search_url
+
+# Configurar logging (LOG_LEVEL=DEBUG activa el detalle muestreado del pipeline)
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    level=getattr(logging, LOG_LEVEL, logging.INFO),
+    format=LOG_FORMAT
 )
 logger = logging.getLogger(__name__)
 
@@ -47,13 +49,41 @@ if not HUBSPOT_CLIENT_SECRET:
     logger.warning("HUBSPOT_CLIENT_SECRET no está configurado en las variables de entorno")
 else:
     logger.info("HUBSPOT_CLIENT_SECRET configurado correctamente")
-HUBSPOT_BASE_URL = "https://api.hubapi.com"
-
-# Cola para almacenar los resultados del scraping
-scraping_results = Queue()
-
-# Diccionario para almacenar el estado de los procesos de scraping
-scraping_processes = {}
+HUBSPOT_BASE_URL = os.getenv('HUBSPOT_BASE_URL', 'https://api.hubapi.com')
+# Llamadas batch simultáneas a HubSpot durante una exportación y límite de llamadas
+# por ventana de 10 segundos (el de la app privada de HubSpot)
+HUBSPOT_CONCURRENCY = int(os.getenv('HUBSPOT_CONCURRENCY', '3'))
+HUBSPOT_CALLS_PER_10S = int(os.getenv('HUBSPOT_CALLS_PER_10S', '100'))
+
+# Scrapings que corren a la vez (ejecuciones simultáneas del actor de Apify) y
+# máximo de scrapings activos, en cola o en ejecución
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', '2'))
+SCRAPE_MAX_QUEUED = int(os.getenv('SCRAPE_MAX_QUEUED', '20'))
+
+# Búsquedas de emails que corren a la vez y máximo activas. Cada una reserva sus
+# propios lotes de perfiles (con vencimiento), así no se pisan entre sí
+EMAIL_JOB_CONCURRENCY = int(os.getenv('EMAIL_JOB_CONCURRENCY', '2'))
+EMAIL_JOB_MAX_QUEUED = int(os.getenv('EMAIL_JOB_MAX_QUEUED', '10'))
+
+# Refresco periódico de las búsquedas activas: cada cuántos segundos se buscan
+# búsquedas vencidas (0 lo desactiva) y prioridad de sus trabajos, por debajo
+# de los scrapings lanzados a mano
+SEARCH_REFRESH_CHECK_SECONDS = float(os.getenv('SEARCH_REFRESH_CHECK_SECONDS', '300'))
+SEARCH_REFRESH_PRIORITY = -1
+
+# Minutos durante los que un scraping reciente de la misma búsqueda se sirve
+# desde la base de datos en lugar de volver a ejecutar el actor (0 lo desactiva)
+SCRAPE_FRESHNESS_MINUTES = float(os.getenv('SCRAPE_FRESHNESS_MINUTES', '60'))
+
+# Segundos sin eventos tras los que el stream SSE envía un comentario para
+# mantener viva la conexión a través de proxies
+SSE_KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+
+# Cliente con sesión persistente, compartido por todas las exportaciones
+hubspot_client = HubSpotClient(
+    HUBSPOT_API_TOKEN, HUBSPOT_BASE_URL, HUBSPOT_CONCURRENCY,
+    calls_per_10s=HUBSPOT_CALLS_PER_10S
+) if HUBSPOT_API_TOKEN else None
 
 # Sesiones simples en memoria (para demo)
 SESSIONS = set()
@@ -74,58 +104,215 @@ def clean_nan_values(obj):
         return ""
     return obj
 
-def run_scraping_process(urlsearch, process_id, search_name=None, search_description=None):
+def run_scraping_job(urlsearch, search_name=None, search_description=None, search_id=None,
+                     incremental=False, progress_callback=None):
+    """Trabajo de scraping: ejecuta el actor, guarda los perfiles y busca emails.
+
+    Con ``search_id`` e ``incremental`` es el refresco de una búsqueda guardada.
+    """
+    counts = {}
+    
+    def report(**progress):
+        # Conservar los últimos contadores de la ingesta para el resultado
+        counts.update({key: value for key, value in progress.items() if key not in ('stage', 'enrichment')})
+        progress_callback(**progress)
+    
+    logger.info(f"Iniciando scraping para URL: {urlsearch}")
+    # La búsqueda solo se crea dentro de scrape_linkedin_profiles si hay resultados
+    result = scrape_linkedin_profiles(
+        search_name or '', 
+        search_description or '', 
+        urlsearch,
+        progress_callback=report,
+        search_id=search_id,
+        incremental=incremental
+    )
+    if not result:
+        raise RuntimeError('No se pudo completar el scraping o no se encontraron perfiles')
+    
+    search_id = counts.pop('search_id', None)
+    return {
+        'message': 'Scraping completado exitosamente',
+        'search_id': search_id if search_id is not None else result,
+        'search_name': search_name,
+        'counts': counts
+    }
+
+job_manager.register('scrape', run_scraping_job, max_concurrent=SCRAPE_CONCURRENCY,
+                     max_queued=SCRAPE_MAX_QUEUED)
+job_manager.register('email_enrichment', find_emails, max_concurrent=EMAIL_JOB_CONCURRENCY,
+                     max_queued=EMAIL_JOB_MAX_QUEUED)
+
+def scrape_coalescing_key(urlsearch):
+    """Clave para unir pedidos de scraping iguales: la URL de búsqueda canónica.
+
+    El resto de la entrada del actor es fija. El modo no forma parte de la
+    clave: una búsqueda nunca tiene dos ejecuciones del actor a la vez, sea un
+    scraping completo o un refresco incremental.
+    """
+    return canonicalize_search_url(urlsearch)
+
+def enqueue_due_refreshes():
+    """Encolar un scraping incremental por cada búsqueda activa con el refresco vencido"""
+    for search in db_manager.get_searches_due_for_refresh():
+        try:
+            job = job_manager.enqueue(
+                'scrape',
+                params={'urlsearch': search['search_url'], 'search_name': search['name'],
+                        'search_id': search['id'], 'incremental': True},
+                priority=SEARCH_REFRESH_PRIORITY,
+                dedup_key=scrape_coalescing_key(search['search_url'])
+            )
+            logger.info(f"Refresco de la búsqueda {search['id']} encolado: trabajo {job['id']}")
+        except DuplicateJobError as e:
+            # Ya hay un scraping de esa URL en cola o en ejecución: ese trabajo la
+            # actualiza, el refresco se omite hasta la próxima revisión
+            logger.info(f"Refresco de la búsqueda {search['id']} omitido: ya está el trabajo {e.job['id']}")
+            continue
+        except JobQueueFull:
+            logger.warning("Cola de scraping llena: los refrescos pendientes esperan a la próxima revisión")
+            break
+
+search_refresh_task = PeriodicTask('search-refresh', SEARCH_REFRESH_CHECK_SECONDS, enqueue_due_refreshes)
+
+# Con el recargador de Flask el módulo también se ejecuta en el proceso vigilante:
+# la cola pendiente y los refrescos solo corren en el proceso que atiende las peticiones
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    job_manager.recover()
+    if SEARCH_REFRESH_CHECK_SECONDS > 0:
+        search_refresh_task.start()
+
+def run_hubspot_export(contacts, force=False, progress_callback=None):
+    """Trabajo de exportación a HubSpot; omite los perfiles ya exportados salvo con ``force``"""
+    profile_ids = [contact['id'] for contact in contacts if contact.get('id')]
+    exported = {} if force else db_manager.get_hubspot_ids(profile_ids)
+    skipped_contacts = [{
+        'name': contact.get('fullName', 'N/A'),
+        'profile_id': contact.get('id'),
+        'hubspot_id': exported[contact['id']]
+    } for contact in contacts if contact.get('id') in exported]
+    pending_contacts = [contact for contact in contacts if contact.get('id') not in exported]
+    logger.info(f"Exportación a HubSpot: {len(pending_contacts)} contactos por enviar, "
+                f"{len(skipped_contacts)} ya exportados")
+    
+    def report(**progress):
+        progress_callback(skipped=len(skipped_contacts), **progress)
+    
+    report(total=len(pending_contacts), sent=0, failed=0)
+    export_result = hubspot_client.export_contacts(pending_contacts, progress_callback=report)
+    successful_contacts = export_result['successful']
+    failed_contacts = export_result['failed']
+    
+    # Guardar los IDs de HubSpot para que las próximas exportaciones los omitan
+    db_manager.mark_profiles_exported([
+        (contact['profile_id'], contact['hubspot_id'])
+        for contact in successful_contacts if contact.get('profile_id') and contact.get('hubspot_id')
+    ])
+    
+    return {
+        'success': True,
+        'message': f'Proceso completado. {len(successful_contacts)} contactos enviados exitosamente, '
+                   f'{len(failed_contacts)} fallidos, {len(skipped_contacts)} ya exportados anteriormente.',
+        'successful_contacts': successful_contacts,
+        'failed_contacts': failed_contacts,
+        'skipped_contacts': skipped_contacts
+    }
+
+# Tamaño de página por defecto y máximo para los listados paginados
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def parse_page_args():
+    """Leer ``limit``, ``cursor`` y ``fields`` de la query string; lanza ValueError si son inválidos"""
     try:
-        logger.info(f"Iniciando proceso de scraping {process_id} para URL: {urlsearch}")
-        
-        # NO crear la búsqueda aquí. Solo la función scrape_linkedin_profiles debe crearla si hay resultados.
-        # Ejecutar el scraping directamente usando la función importada
-        result = scrape_linkedin_profiles(
-            search_name or '', 
-            search_description or '', 
-            urlsearch
-        )
-        
-        if result:
-            logger.info(f"Proceso de scraping {process_id} completado exitosamente")
-            scraping_results.put({
-                'status': 'success',
-                'message': 'Scraping completado exitosamente',
-                'search_name': search_name,
-                'search_id': result
-            })
-        else:
-            logger.error(f"Error en el proceso de scraping {process_id}: No se pudo completar el scraping")
-            scraping_results.put({
-                'status': 'error',
-                'error': 'No se pudo completar el scraping o no se encontraron perfiles'
-            })
-            
-    except Exception as e:
-        logger.error(f"Error en el proceso de scraping {process_id}: {str(e)}")
-        logger.error(traceback.format_exc())
-        scraping_results.put({
-            'status': 'error',
-            'error': f'Error al ejecutar el scraping: {str(e)}'
-        })
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("El parámetro 'limit' debe ser un entero")
+    if limit < 1:
+        raise ValueError("El parámetro 'limit' debe ser mayor que cero")
+    limit = min(limit, MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor') or None
+    fields = request.args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+    return limit, cursor, fields
+
+# Formatos admitidos por ``stream=`` en los listados masivos
+STREAM_FORMATS = ('ndjson', 'json')
+
+def stream_rows(rows, stream_format):
+    """Respuesta HTTP que serializa ``rows`` a medida que se leen del cursor.
+
+    ``ndjson`` emite un objeto JSON por línea; ``json`` emite un arreglo JSON
+    codificado de forma incremental. La memoria del servidor no depende del
+    número de filas.
+    """
+    if stream_format == 'ndjson':
+        def generate():
+            for row in rows:
+                yield json.dumps(row, default=str) + '\n'
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    def generate():
+        yield '['
+        first = True
+        for row in rows:
+            if first:
+                first = False
+                yield json.dumps(row, default=str)
+            else:
+                yield ',' + json.dumps(row, default=str)
+        yield ']'
+    return Response(generate(), mimetype='application/json')
+
+def _prepend(first, rows):
+    """Reinsertar la primera fila ya leída delante del resto del iterador"""
+    try:
+        if first is None:
+            return
+        yield first
+        yield from rows
     finally:
-        # Limpiar el proceso del diccionario
-        if process_id in scraping_processes:
-            del scraping_processes[process_id]
+        # Devolver la conexión al pool aunque el cliente corte la descarga
+        rows.close()
+
+def parse_stream_args():
+    """Leer ``stream`` y ``fields``; devuelve (formato, campos) o (None, None) si no hay streaming"""
+    stream_format = request.args.get('stream')
+    if not stream_format:
+        return None, None
+    if stream_format not in STREAM_FORMATS:
+        raise ValueError(f"Formato de streaming no soportado: {stream_format}")
+    fields = request.args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+    return stream_format, fields
 
 @app.route('/api/profiles')
 def get_profiles():
     try:
-        # Obtener todos los perfiles de la base de datos
-        profiles = db_manager.get_all_profiles()
+        stream_format, stream_fields = parse_stream_args()
+        limit, cursor, fields = parse_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        if stream_format:
+            # Volcado completo en streaming (exportaciones, integraciones)
+            rows = db_manager.iter_profiles(fields=stream_fields)
+            # Validar la proyección antes de empezar a responder
+            first = next(rows, None)
+            return stream_rows(_prepend(first, rows), stream_format)
         
-        if profiles:
-            logger.info(f"Perfiles obtenidos de la base de datos. Número de registros: {len(profiles)}")
-            logger.info(f"Primer registro: {profiles[0]}")
+        search_term = request.args.get('q', '').strip()
+        if search_term:
+            # Búsqueda de texto completo ordenada por relevancia
+            page = db_manager.search_profiles_page(search_term, limit=limit, cursor=cursor, fields=fields)
         else:
-            logger.warning("No se encontraron registros en la base de datos")
-        
-        return jsonify(profiles)
+            # Obtener una página de perfiles (paginación por cursor sobre created_at, id)
+            page = db_manager.get_profiles_page(limit=limit, cursor=cursor, fields=fields)
+        logger.info(f"Página de perfiles obtenida: {len(page['profiles'])} registros")
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error al obtener perfiles de la base de datos: {str(e)}")
         logger.error(traceback.format_exc())
@@ -141,7 +328,8 @@ def get_status():
         return jsonify({
             'database_exists': True,
             'profile_count': profile_count,
-            'database_path': db_manager.db_path
+            'database_path': db_manager.db_path,
+            'connection_pool': db_manager.get_pool_stats()
         })
     except Exception as e:
         logger.error(f"Error al verificar estado de la base de datos: {str(e)}")
@@ -164,34 +352,55 @@ def run_scraper():
                 'error': 'URL de búsqueda no proporcionada'
             }), 400
 
-        # Generar un ID único para el proceso
-        process_id = str(int(time.time()))
-        logger.info(f"Iniciando nuevo proceso de scraping con ID: {process_id}")
-
-        # Iniciar el proceso de scraping en un hilo separado
-        thread = threading.Thread(
-            target=run_scraping_process,
-            args=(urlsearch, process_id, search_name, search_description),
-            daemon=True
-        )
-        thread.start()
-
-        # Almacenar el proceso en el diccionario
-        scraping_processes[process_id] = {
-            'thread': thread,
-            'start_time': time.time(),
-            'status': 'running',
-            'search_name': search_name,
-            'search_description': search_description
-        }
+        try:
+            priority = int(data.get('priority', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': "El parámetro 'priority' debe ser un entero"}), 400
+
+        # Si la misma búsqueda se scrapeó hace poco, servir lo guardado (salvo ``force``)
+        if SCRAPE_FRESHNESS_MINUTES > 0 and not data.get('force'):
+            search = db_manager.get_fresh_search(urlsearch, SCRAPE_FRESHNESS_MINUTES)
+            if search:
+                logger.info(f"Búsqueda {search['id']} scrapeada hace menos de {SCRAPE_FRESHNESS_MINUTES:g} "
+                            f"minutos: se sirven los resultados guardados")
+                return jsonify({
+                    'status': 'completed',
+                    'fresh': True,
+                    'search_id': search['id'],
+                    'search_name': search['name'],
+                    'search': search,
+                    'message': 'Esta búsqueda se scrapeó hace poco; se muestran los resultados guardados.'
+                })
 
-        logger.info(f"Proceso de scraping {process_id} iniciado en hilo separado")
+        coalesced = False
+        try:
+            job = job_manager.enqueue(
+                'scrape',
+                params={'urlsearch': urlsearch, 'search_name': search_name, 'search_description': search_description},
+                priority=priority,
+                dedup_key=scrape_coalescing_key(urlsearch)
+            )
+        except DuplicateJobError as e:
+            # La misma búsqueda ya está en cola o en ejecución: seguir ese trabajo y su resultado
+            logger.info(f"Scraping de {urlsearch} unido al trabajo en curso {e.job['id']}")
+            job, coalesced = e.job, True
+        except JobQueueFull as e:
+            logger.warning(f"Scraping rechazado: {str(e)}")
+            return jsonify({
+                'error': 'Hay demasiados scrapings en cola. Intente de nuevo más tarde.'
+            }), 429
+        if not coalesced:
+            logger.info(f"Scraping en segundo plano: trabajo {job['id']}")
         
         return jsonify({
             'status': 'started',
-            'process_id': process_id,
-            'message': 'El proceso de scraping ha comenzado. Esto puede tomar varios minutos.',
-            'search_name': search_name
+            'process_id': job['id'],
+            'job_id': job['id'],
+            'job': job,
+            'coalesced': coalesced,
+            'message': 'Ya había un scraping en curso para esta búsqueda; se sigue ese proceso.' if coalesced
+                       else 'El proceso de scraping ha comenzado. Esto puede tomar varios minutos.',
+            'search_name': job['params'].get('search_name')
         })
 
     except Exception as e:
@@ -203,19 +412,35 @@ def run_scraper():
 
 @app.route('/api/scraping-status', methods=['GET'])
 def get_scraping_status():
+    """Estado de un scraping en el formato anterior; no consume el resultado.
+
+    Con ``job_id`` devuelve ``success``, ``error`` o ``running`` para ese
+    trabajo; sin él, el número de scrapings activos.
+    """
     try:
-        # Verificar si hay algún resultado disponible
-        try:
-            result = scraping_results.get_nowait()
-            logger.info(f"Resultado del scraping obtenido: {result['status']}")
-            return jsonify(result)
-        except:
-            # Si no hay resultado disponible, devolver el estado actual
+        job_id = request.args.get('job_id')
+        if not job_id:
             return jsonify({
                 'status': 'running',
                 'message': 'El proceso de scraping está en ejecución',
-                'active_processes': len(scraping_processes)
+                'active_processes': job_manager.active_count('scrape')
             })
+        
+        job = job_manager.get(job_id)
+        if not job or job['type'] != 'scrape':
+            return jsonify({'status': 'error', 'error': 'Trabajo no encontrado'}), 404
+        if job['status'] == JOB_COMPLETED:
+            return jsonify(dict(job['result'], status='success', job_id=job_id))
+        if job['status'] in (JOB_FAILED, JOB_INTERRUPTED):
+            return jsonify({'status': 'error', 'error': job['error'], 'job_id': job_id})
+        if job['status'] == JOB_CANCELLED:
+            return jsonify({'status': 'error', 'error': 'El scraping fue cancelado', 'job_id': job_id})
+        return jsonify({
+            'status': 'running',
+            'message': 'El proceso de scraping está en ejecución',
+            'job_id': job_id,
+            'progress': job['progress']
+        })
     except Exception as e:
         logger.error(f"Error al verificar estado del scraping: {str(e)}")
         logger.error(traceback.format_exc())
@@ -224,6 +449,75 @@ def get_scraping_status():
             'error': str(e)
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Consultar un trabajo en segundo plano de cualquier tipo por su id"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
+
+def format_sse(event, data):
+    """Serializar un evento en el formato de Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream SSE con los cambios de un trabajo.
+
+    Envía primero ``snapshot`` con el estado actual y después ``status``,
+    ``stage`` y ``progress`` a medida que ocurren; el stream se cierra cuando
+    el trabajo termina.
+    """
+    # Suscribirse antes de leer el estado para no perder eventos intermedios
+    subscription = event_bus.subscribe(job_id)
+    job = job_manager.get(job_id)
+    if not job:
+        event_bus.unsubscribe(job_id, subscription)
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    def generate():
+        try:
+            yield format_sse('snapshot', job)
+            if job['status'] not in ACTIVE_STATES:
+                return
+            while True:
+                try:
+                    event = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event['event'], event['job'])
+                if event['event'] == 'status' and event['job']['status'] not in ACTIVE_STATES:
+                    return
+        finally:
+            event_bus.unsubscribe(job_id, subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancelar un trabajo en cola o en ejecución"""
+    job = job_manager.cancel(job_id)
+    if job:
+        return jsonify(job)
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'error': 'El trabajo ya terminó', 'job': job}), 409
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Historial de trabajos, los más recientes primero (``type`` y ``limit`` opcionales)"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': "El parámetro 'limit' debe ser un entero"}), 400
+    return jsonify(job_manager.list(request.args.get('type'), limit=max(1, limit)))
+
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -264,19 +558,10 @@ def test_hubspot_connection():
                 'error': 'HUBSPOT_API_TOKEN no está configurado'
             }), 500
         
-        headers = {
-            'Authorization': f'Bearer {HUBSPOT_API_TOKEN}',
-            'Content-Type': 'application/json'
-        }
-        
         # Probar con un endpoint simple
-        response = requests.get(
-            f"{HUBSPOT_BASE_URL}/crm/v3/objects/contacts?limit=1",
-            headers=headers
-        )
+        response = hubspot_client.test_connection()
         
         logger.info(f"Test HubSpot - Status: {response.status_code}")
-        logger.info(f"Test HubSpot - Response: {response.text}")
         
         if response.status_code == 200:
             return jsonify({
@@ -301,9 +586,7 @@ def test_hubspot_connection():
 def send_to_hubspot():
     try:
         data = request.get_json()
-        logger.info(f"Datos recibidos en send_to_hubspot: {data}")
         selected_contacts = data.get('contacts', [])
-        logger.info(f"Contactos seleccionados: {selected_contacts}")
         
         if not selected_contacts:
             logger.warning("No se encontraron contactos en la petición")
@@ -320,79 +603,18 @@ def send_to_hubspot():
                 'error': 'Token de HubSpot no configurado en las variables de entorno'
             }), 500
         
-        logger.info(f"Token de HubSpot configurado: {HUBSPOT_API_TOKEN[:10]}...")
-        
-        # Configurar headers para la API de HubSpot
-        headers = {
-            'Authorization': f'Bearer {HUBSPOT_API_TOKEN}',
-            'Content-Type': 'application/json'
-        }
-        
-        logger.info(f"Headers configurados: {headers}")
-        
-        # Zona horaria GMT-5
-        tz = pytz.timezone('America/New_York')
-        current_time = datetime.now(tz)
-        
-        successful_contacts = []
-        failed_contacts = []
-        
-        for contact in selected_contacts:
-            try:
-                # Preparar los datos del contacto para HubSpot usando los nombres internos estándar
-                contact_data = {
-                    "properties": {
-                        "firstname": contact.get('fullName', '').split()[0] if contact.get('fullName') else '',
-                        "lastname": ' '.join(contact.get('fullName', '').split()[1:]) if contact.get('fullName') and len(contact.get('fullName', '').split()) > 1 else '',
-                        "email": contact.get('email', ''),
-                        "phone": contact.get('mobileNumber', ''),
-                        "city": contact.get('location', ''),
-                        "lifecyclestage": "lead",
-                        "hs_lead_status": "NEW"
-                    }
-                }
-                
-                logger.info(f"Enviando contacto a HubSpot: {contact.get('fullName', 'N/A')}")
-                logger.info(f"Datos del contacto: {contact_data}")
-                
-                # Enviar contacto a HubSpot
-                logger.info(f"URL de HubSpot: {HUBSPOT_BASE_URL}/crm/v3/objects/contacts")
-                response = requests.post(
-                    f"{HUBSPOT_BASE_URL}/crm/v3/objects/contacts",
-                    headers=headers,
-                    json=contact_data
-                )
-                
-                logger.info(f"Respuesta de HubSpot - Status: {response.status_code}")
-                logger.info(f"Respuesta de HubSpot - Headers: {dict(response.headers)}")
-                logger.info(f"Respuesta de HubSpot - Body: {response.text}")
-                
-                if response.status_code in [200, 201]:
-                    logger.info(f"Contacto {contact.get('fullName', 'N/A')} enviado exitosamente a HubSpot")
-                    successful_contacts.append({
-                        'name': contact.get('fullName', 'N/A'),
-                        'hubspot_id': response.json().get('id')
-                    })
-                else:
-                    logger.error(f"Error al enviar contacto {contact.get('fullName', 'N/A')}: {response.status_code} - {response.text}")
-                    failed_contacts.append({
-                        'name': contact.get('fullName', 'N/A'),
-                        'error': f"HTTP {response.status_code}: {response.text}"
-                    })
-                    
-            except Exception as e:
-                logger.error(f"Error procesando contacto {contact.get('fullName', 'N/A')}: {str(e)}")
-                failed_contacts.append({
-                    'name': contact.get('fullName', 'N/A'),
-                    'error': str(e)
-                })
+        # La exportación se ejecuta en segundo plano; el cliente consulta el trabajo
+        job = job_manager.submit(
+            'hubspot_export', run_hubspot_export, selected_contacts,
+            force=bool(data.get('force', False)),
+            params={'contacts': len(selected_contacts)}
+        )
         
         return jsonify({
-            'success': True,
-            'message': f'Proceso completado. {len(successful_contacts)} contactos enviados exitosamente, {len(failed_contacts)} fallidos.',
-            'successful_contacts': successful_contacts,
-            'failed_contacts': failed_contacts
-        })
+            'status': 'accepted',
+            'job_id': job['id'],
+            'job': job
+        }), 202
         
     except Exception as e:
         logger.error(f"Error en send_to_hubspot: {str(e)}")
@@ -401,6 +623,14 @@ def send_to_hubspot():
             'error': f'Error al enviar contactos a HubSpot: {str(e)}'
         }), 500
 
+@app.route('/api/hubspot-jobs/<job_id>', methods=['GET'])
+def get_hubspot_job(job_id):
+    """Consultar el estado, el progreso y el resultado de una exportación a HubSpot"""
+    job = job_manager.get(job_id)
+    if not job or job['type'] != 'hubspot_export':
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
+
 # Endpoints para manejar búsquedas
 @app.route('/api/searches', methods=['GET'])
 def get_searches():
@@ -456,8 +686,14 @@ def update_search(search_id):
         name = data.get('name')
         description = data.get('description')
         status = data.get('status')
+        refresh_interval_hours = data.get('refresh_interval_hours')
+        if refresh_interval_hours is not None:
+            try:
+                refresh_interval_hours = int(refresh_interval_hours)
+            except (TypeError, ValueError):
+                return jsonify({'error': "El parámetro 'refresh_interval_hours' debe ser un entero"}), 400
         
-        success = db_manager.update_search(search_id, name, description, status)
+        success = db_manager.update_search(search_id, name, description, status, refresh_interval_hours)
         if success:
             search = db_manager.get_search_by_id(search_id)
             return jsonify(search)
@@ -484,10 +720,18 @@ def delete_search(search_id):
 
 @app.route('/api/searches/<int:search_id>/profiles', methods=['GET'])
 def get_search_profiles(search_id):
-    """Obtener todos los perfiles de una búsqueda específica"""
+    """Obtener una página de perfiles de una búsqueda específica"""
     try:
-        profiles = db_manager.get_profiles_by_search(search_id)
-        return jsonify(profiles)
+        stream_format, stream_fields = parse_stream_args()
+        if stream_format:
+            rows = db_manager.iter_search_profiles(search_id, fields=stream_fields)
+            first = next(rows, None)
+            return stream_rows(_prepend(first, rows), stream_format)
+        limit, cursor, fields = parse_page_args()
+        page = db_manager.get_search_profiles_page(search_id, limit=limit, cursor=cursor, fields=fields)
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error al obtener perfiles de búsqueda: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -504,26 +748,45 @@ def get_search_statistics():
 
 @app.route('/api/run-email-search', methods=['POST'])
 def run_email_search():
-    """Ejecutar búsqueda de emails para perfiles sin verificar"""
+    """Encolar la búsqueda de emails para perfiles sin verificar.
+
+    Responde de inmediato con el id del trabajo. Varias búsquedas pueden
+    correr a la vez (hasta ``EMAIL_JOB_CONCURRENCY``): cada una reserva lotes
+    distintos del backlog.
+    """
     try:
-        logger.info("Iniciando búsqueda de emails...")
-        
-        # Ejecutar la búsqueda de emails
-        find_emails()
+        try:
+            job = job_manager.enqueue('email_enrichment')
+        except JobQueueFull as e:
+            logger.warning(f"Búsqueda de emails rechazada: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'error': 'Hay demasiadas búsquedas de emails en cola. Intente de nuevo más tarde.'
+            }), 429
+        logger.info(f"Búsqueda de emails en segundo plano: trabajo {job['id']}")
         
         return jsonify({
-            'status': 'success',
-            'message': 'Búsqueda de emails completada exitosamente'
-        })
+            'status': 'accepted',
+            'job_id': job['id'],
+            'job': job
+        }), 202
         
     except Exception as e:
-        logger.error(f"Error al ejecutar búsqueda de emails: {str(e)}")
+        logger.error(f"Error al encolar búsqueda de emails: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({
             'status': 'error',
-            'error': f'Error al ejecutar búsqueda de emails: {str(e)}'
+            'error': f'Error al encolar búsqueda de emails: {str(e)}'
         }), 500
 
+@app.route('/api/email-jobs/<job_id>', methods=['GET'])
+def get_email_job(job_id):
+    """Consultar el estado y el progreso de una búsqueda de emails"""
+    job = job_manager.get(job_id)
+    if not job or job['type'] != 'email_enrichment':
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     logger.info(f"Iniciando servidor en http://{os.getenv('HOST', 'localhost')}:5000")
     app.run(debug=True, port=5000, threaded=True, host=os.getenv('HOST', 'localhost')) 
\ No newline at end of file
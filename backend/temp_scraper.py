@@ -4,15 +4,14 @@ import json
 from datetime import datetime
 import os
 import sys
-import io
 from dotenv import load_dotenv
 
 # Cargar variables de entorno desde el archivo .env
 load_dotenv()
 
-# Configurar la codificación de la consola
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+# Configurar la codificación de la consola (sin envolver de nuevo stdout)
+sys.stdout.reconfigure(encoding='utf-8')
+sys.stderr.reconfigure(encoding='utf-8')
 
 def scrape_linkedin_profiles():
     print("\n=== Iniciando búsqueda de perfiles de LinkedIn ===")
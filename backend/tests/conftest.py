@@ -0,0 +1,57 @@
+"""Configuración de los tests del backend.
+
+Requieren las dependencias de ``requirements-dev.txt``; se ejecutan con
+``python -m pytest tests`` desde backend/.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# Base de datos temporal y tiempos cortos antes de importar los módulos del backend
+os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='alejo-tests-'), 'profiles.db')
+os.environ.setdefault('APIFY_API_KEY', 'test-token')
+os.environ['SEARCH_REFRESH_CHECK_SECONDS'] = '0'
+os.environ['DATASET_POLL_SECONDS'] = '0.01'
+os.environ['EMAIL_BATCH_DELAY'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_apify import FakeApifyClient
+
+def wait_for(condition, timeout=5.0):
+    """Esperar a que ``condition()`` sea verdadera; falla el test si se agota el tiempo"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = condition()
+        if value:
+            return value
+        time.sleep(0.01)
+    pytest.fail('La condición no se cumplió a tiempo')
+
+def wait_until_finished(client, job_id):
+    """Esperar a que el trabajo deje de estar activo y devolver su estado final"""
+    from jobs import ACTIVE_STATES
+    return wait_for(lambda: (lambda job: job['status'] not in ACTIVE_STATES and job)(
+        client.get(f'/api/jobs/{job_id}').get_json()))
+
+def profiles(prefix, count):
+    """Ítems del actor de scraping con URLs únicas por ``prefix``"""
+    return [{'linkedinUrl': f'https://www.linkedin.com/in/{prefix}-{index}/', 'fullName': f'{prefix} {index}'}
+            for index in range(count)]
+
+@pytest.fixture
+def fake_apify(monkeypatch):
+    import main
+    FakeApifyClient.reset()
+    monkeypatch.setattr(main, 'ApifyClient', FakeApifyClient)
+    return FakeApifyClient
+
+@pytest.fixture
+def client(fake_apify):
+    import server
+    return server.app.test_client()
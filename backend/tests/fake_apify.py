@@ -0,0 +1,77 @@
+"""Cliente de Apify falso: el actor de scraping devuelve ``profiles`` y el de emails un email por URL"""
+
+import itertools
+import threading
+
+class _Items:
+    def __init__(self, items):
+        self.items = items
+
+class _Dataset:
+    def __init__(self, items):
+        self._items = items
+
+    def list_items(self, offset=0, limit=None):
+        return _Items(self._items[offset:offset + limit if limit else None])
+
+    def iterate_items(self):
+        return iter(self._items)
+
+class _Run:
+    def __init__(self, run_id):
+        self.run_id = run_id
+
+    def get(self):
+        return {'id': self.run_id, 'status': 'SUCCEEDED'}
+
+    def abort(self):
+        FakeApifyClient.aborted.append(self.run_id)
+
+class _Actor:
+    def start(self, run_input):
+        FakeApifyClient.release.wait(5)
+        return FakeApifyClient._new_run(list(FakeApifyClient.profiles), 'READY')
+
+    def call(self, run_input):
+        FakeApifyClient.email_calls.append(list(run_input['profileUrls']))
+        if FakeApifyClient.email_error is not None:
+            raise FakeApifyClient.email_error
+        return FakeApifyClient._new_run([{'linkedinUrl': url, 'email': f'{url.rstrip("/").rsplit("/", 1)[-1]}@example.com',
+                                          'mobileNumber': ''} for url in run_input['profileUrls']], 'SUCCEEDED')
+
+class FakeApifyClient:
+    profiles = []
+    runs = []
+    aborted = []
+    datasets = {}
+    # Mientras no esté activado, el actor de scraping no arranca (deja el trabajo en ejecución)
+    release = threading.Event()
+    # Entradas de cada ejecución del actor de emails y, si se define, el error que lanza
+    email_calls = []
+    email_error = None
+    _ids = itertools.count()
+
+    def __init__(self, token=None):
+        pass
+
+    @classmethod
+    def reset(cls, profiles=()):
+        cls.profiles, cls.runs, cls.aborted, cls.datasets = list(profiles), [], [], {}
+        cls.email_calls, cls.email_error = [], None
+        cls.release.set()
+
+    @classmethod
+    def _new_run(cls, items, status):
+        run_id = str(next(cls._ids))
+        cls.runs.append(run_id)
+        cls.datasets[f'ds-{run_id}'] = items
+        return {'id': run_id, 'defaultDatasetId': f'ds-{run_id}', 'status': status}
+
+    def actor(self, actor_id):
+        return _Actor()
+
+    def run(self, run_id):
+        return _Run(run_id)
+
+    def dataset(self, dataset_id):
+        return _Dataset(FakeApifyClient.datasets[dataset_id])
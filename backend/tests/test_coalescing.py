@@ -0,0 +1,35 @@
+from conftest import wait_until_finished, profiles
+
+SEARCH_URL = 'https://www.linkedin.com/search/results/people/?keywords=product%20manager'
+# La misma búsqueda escrita de otra forma: otro orden, mayúsculas y parámetros de seguimiento
+SAME_SEARCH_URL = 'linkedin.com/search/results/people?origin=GLOBAL&keywords=Product+Manager'
+
+def test_same_search_joins_the_running_job(client, fake_apify):
+    fake_apify.reset(profiles('union', 2))
+    fake_apify.release.clear()
+    first = client.post('/api/run-scraper', json={'urlsearch': SEARCH_URL, 'search_name': 'uno',
+                                                  'force': True}).get_json()
+    second = client.post('/api/run-scraper', json={'urlsearch': SAME_SEARCH_URL, 'search_name': 'dos'}).get_json()
+    assert second['coalesced'] is True
+    assert second['job_id'] == first['job_id']
+    fake_apify.release.set()
+
+    assert wait_until_finished(client, first['job_id'])['status'] == 'completed'
+    assert len(fake_apify.runs) == 2  # una ejecución del actor de scraping y una del de emails
+    fresh = client.post('/api/run-scraper', json={'urlsearch': SAME_SEARCH_URL}).get_json()
+    assert fresh['status'] == 'completed'
+    assert fresh['fresh'] is True
+
+def test_refresh_is_skipped_while_the_search_is_scraping(client, fake_apify, monkeypatch):
+    import server
+    fake_apify.reset(profiles('refresco', 1))
+    fake_apify.release.clear()
+    running = client.post('/api/run-scraper', json={'urlsearch': SEARCH_URL + '&page=2', 'force': True}).get_json()
+    due = {'id': 999, 'name': 'refresco', 'search_url': SAME_SEARCH_URL + '&page=2'}
+    monkeypatch.setattr(server.db_manager, 'get_searches_due_for_refresh', lambda: [due])
+
+    server.enqueue_due_refreshes()
+
+    assert server.job_manager.active_count('scrape') == 1
+    fake_apify.release.set()
+    assert wait_until_finished(client, running['job_id'])['status'] == 'completed'
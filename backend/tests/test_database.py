@@ -0,0 +1,56 @@
+import pytest
+
+from database import DatabaseManager
+
+@pytest.fixture
+def store(tmp_path):
+    return DatabaseManager(str(tmp_path / 'profiles.db'))
+
+def profile(slug, **fields):
+    return dict({'fullName': slug, 'profileUrl': f'https://www.linkedin.com/in/{slug}/'}, **fields)
+
+def test_insert_count_excludes_rows_written_by_triggers(store):
+    # Cada perfil insertado también escribe en el índice de texto completo y en los
+    # contadores: la cuenta tiene que ser solo la de perfiles
+    assert store.insert_profiles_batch([profile('ana'), profile('beto')]) == 2
+    assert store.insert_profiles_batch([profile('ana'), profile('carla'), profile('carla')]) == 1
+
+def test_upsert_reports_exact_inserts_and_links(store):
+    search_id = store.create_search('conteo', '', 'https://www.linkedin.com/search/results/people/?keywords=conteo')
+
+    first = store.upsert_profiles_batch([profile('dana'), profile('eva')], search_id)
+    assert (len(first['inserted']), len(first['updated']), first['linked']) == (2, 0, 2)
+
+    second = store.upsert_profiles_batch([profile('dana', headline='Nuevo'), profile('eva'), profile('fede')], search_id)
+    assert (len(second['inserted']), len(second['updated']), len(second['unchanged'])) == (1, 1, 1)
+    assert second['linked'] == 1
+    assert store.get_search_profile_count(search_id) == 3
+
+@pytest.mark.parametrize('fts', [True, False], ids=['fts5', 'like'])
+def test_search_matches_contact_fields_with_and_without_fts(store, fts):
+    store.fts_enabled = store.fts_enabled and fts
+    store.insert_profiles_batch([profile('gabi', email='gabi@acme.com', mobileNumber='+57 300 123'),
+                                 profile('hugo', headline='Ingeniero en Acme')])
+
+    assert {row['fullName'] for row in store.search_profiles('acme')} == {'gabi', 'hugo'}
+    assert [row['fullName'] for row in store.search_profiles('300')] == ['gabi']
+
+@pytest.mark.parametrize('fts', [True, False], ids=['fts5', 'like'])
+def test_search_pages_follow_the_ranking_without_repeats(store, fts):
+    store.fts_enabled = store.fts_enabled and fts
+    store.insert_profiles_batch([profile(f'ingeniero-{index}', headline='Ingeniero de datos') for index in range(7)])
+    expected = [row['id'] for row in store.search_profiles('ingeniero')]
+
+    seen, cursor = [], None
+    while True:
+        page = store.search_profiles_page('ingeniero', limit=3, cursor=cursor, fields=['fullName'])
+        seen += [row['id'] for row in page['profiles']]
+        assert all('sort_key' not in row for row in page['profiles'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == expected
+    assert len(seen) == 7
+    with pytest.raises(ValueError):
+        store.search_profiles_page('ingeniero', cursor='WyJyYW5rIiwgM10=')  # cursor antiguo ['rank', 3]
@@ -0,0 +1,31 @@
+from conftest import wait_until_finished, profiles
+from url_utils import canonicalize_profile_url
+
+def test_email_actor_gets_the_stored_url_and_results_match_by_canonical_url(fake_apify):
+    import main
+    from database import db_manager
+    stored_url = 'https://es.linkedin.com/in/Jos%C3%A9-P%C3%A9rez/?trk=public_profile'
+    db_manager.upsert_profiles_batch([{'fullName': 'José Pérez', 'profileUrl': stored_url}])
+
+    summary = main.find_emails()
+
+    sent = [url for urls in fake_apify.email_calls for url in urls]
+    # Sin la query pero con el host, las mayúsculas y los escapes originales
+    assert 'https://es.linkedin.com/in/Jos%C3%A9-P%C3%A9rez/' in sent
+    assert canonicalize_profile_url(stored_url) not in sent
+    assert summary['done'] >= 1
+    profile = db_manager.get_profiles_by_canonical_urls([stored_url])[canonicalize_profile_url(stored_url)]
+    assert profile['email'] == 'Jos%C3%A9-P%C3%A9rez@example.com'
+
+def test_email_searches_run_as_separate_jobs_without_sharing_profiles(client, fake_apify):
+    from database import db_manager
+    db_manager.upsert_profiles_batch([dict(profile, profileUrl=profile['linkedinUrl'])
+                                      for profile in profiles('paralelo', 6)])
+
+    jobs = [client.post('/api/run-email-search').get_json()['job_id'] for _ in range(2)]
+
+    assert jobs[0] != jobs[1]
+    assert all(wait_until_finished(client, job_id)['status'] == 'completed' for job_id in jobs)
+    sent = [url for urls in fake_apify.email_calls for url in urls]
+    assert len(sent) == len(set(sent))
+    assert {url for url in sent if 'paralelo' in url} == {profile['linkedinUrl'] for profile in profiles('paralelo', 6)}
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hubspot import HubSpotClient, RateLimiter
+
+class HubSpotStub:
+    """Servidor HTTP local que responde en orden las respuestas de ``responses``.
+
+    Cada respuesta es ``(status, body, headers)`` o una función que recibe el
+    cuerpo de la petición y devuelve esa tupla; la última se repite.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.requests.append((self.path, payload, time.monotonic()))
+                response = stub.responses.pop(0) if len(stub.responses) > 1 else stub.responses[0]
+                status, body, headers = response(payload) if callable(response) else response
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+@pytest.fixture
+def hubspot():
+    stub = HubSpotStub()
+    yield stub
+    stub.server.shutdown()
+
+def make_client(stub, **options):
+    options.setdefault('backoff_seconds', 0.01)
+    return HubSpotClient('token', base_url=stub.url, **options)
+
+def contacts(prefix, count, with_email=True):
+    return [{'id': index, 'fullName': f'{prefix} {index}',
+             'email': f'{prefix}{index}@example.com' if with_email else ''} for index in range(count)]
+
+def test_create_results_are_matched_by_trace_id(hubspot):
+    def reversed_results(payload):
+        inputs = payload['inputs']
+        results = [{'id': f'hs-{item["properties"]["firstname"]}-{item["properties"]["lastname"]}',
+                    'objectWriteTraceId': item['objectWriteTraceId']} for item in reversed(inputs)]
+        return 201, {'status': 'COMPLETE', 'results': results}, {}
+    hubspot.responses = [reversed_results]
+
+    result = make_client(hubspot).export_contacts(contacts('sin-email', 3, with_email=False))
+
+    assert result['failed'] == []
+    assert {item['profile_id']: item['hubspot_id'] for item in result['successful']} == {
+        0: 'hs-sin-email-0', 1: 'hs-sin-email-1', 2: 'hs-sin-email-2'
+    }
+    path, payload, _ = hubspot.requests[0]
+    assert path == '/crm/v3/objects/contacts/batch/create'
+    assert [item['objectWriteTraceId'] for item in payload['inputs']] == ['0', '1', '2']
+
+def test_partial_failures_of_a_207_are_reported_per_contact(hubspot):
+    hubspot.responses = [(207, {
+        'status': 'COMPLETE',
+        'results': [{'id': '10', 'properties': {'email': 'parcial0@example.com'}},
+                    {'id': '12', 'properties': {'email': 'parcial2@example.com'}}],
+        'errors': [{'message': 'Email inválido'}]
+    }, {})]
+
+    result = make_client(hubspot).export_contacts(contacts('parcial', 3))
+
+    assert sorted((item['profile_id'], item['hubspot_id']) for item in result['successful']) == [(0, '10'), (2, '12')]
+    assert result['failed'] == [{'name': 'parcial 1', 'profile_id': 1, 'error': 'Email inválido'}]
+
+def test_rate_limit_waits_for_retry_after(hubspot):
+    ok = (200, {'status': 'COMPLETE', 'results': [{'id': '1', 'properties': {'email': 'limite0@example.com'}}]}, {})
+    hubspot.responses = [(429, {'message': 'Too many requests'}, {'Retry-After': '0.3'}), ok]
+
+    # Con Retry-After no se usa el backoff, que aquí sería mucho más largo
+    result = make_client(hubspot, backoff_seconds=30).export_contacts(contacts('limite', 1))
+
+    assert [item['hubspot_id'] for item in result['successful']] == ['1']
+    assert len(hubspot.requests) == 2
+    assert hubspot.requests[1][2] - hubspot.requests[0][2] >= 0.3
+
+def test_server_errors_fail_the_batch_after_the_last_retry(hubspot):
+    hubspot.responses = [(503, {'message': 'Service unavailable'}, {})]
+
+    result = make_client(hubspot, max_retries=2).export_contacts(contacts('caido', 2))
+
+    assert len(hubspot.requests) == 3
+    assert result['successful'] == []
+    assert [item['profile_id'] for item in result['failed']] == [0, 1]
+    assert all(item['error'].startswith('HTTP 503') for item in result['failed'])
+
+def test_rate_limiter_spreads_calls_over_the_window():
+    limiter = RateLimiter(max_calls=2, period=0.2)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.2
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from conftest import wait_for
+from database import DatabaseManager
+from jobs import (JobManager, DuplicateJobError, JobQueueFull, JOB_CANCELLED, JOB_COMPLETED,
+                  JOB_INTERRUPTED, JOB_QUEUED)
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+def make_manager(gate, store=None, max_workers=4, max_concurrent=1, max_queued=None):
+    """Planificador con el tipo ``task``: los trabajos cuyo nombre empieza con ``block`` esperan a ``gate``"""
+    manager = JobManager(store, max_workers=max_workers)
+    order = []
+
+    def task(name, progress_callback=None):
+        if name.startswith('block'):
+            gate.wait(5)
+        order.append(name)
+        return name
+
+    manager.register('task', task, max_concurrent=max_concurrent, max_queued=max_queued)
+    return manager, order
+
+def test_higher_priority_runs_first(gate):
+    manager, order = make_manager(gate)
+    blocker = manager.enqueue('task', {'name': 'block'})
+    wait_for(lambda: manager.get(blocker['id'])['status'] != JOB_QUEUED)
+
+    for name, priority in (('low', -1), ('normal', 0), ('high', 5), ('normal-2', 0)):
+        manager.enqueue('task', {'name': name}, priority=priority)
+    wait_for(lambda: len(manager._deferred['task']) == 4)
+    gate.set()
+
+    wait_for(lambda: len(order) == 5)
+    assert order == ['block', 'high', 'normal', 'normal-2', 'low']
+
+def test_dedup_key_and_max_queued(gate):
+    manager, _ = make_manager(gate, max_queued=2)
+    first = manager.enqueue('task', {'name': 'block'}, dedup_key='same')
+
+    with pytest.raises(DuplicateJobError) as error:
+        manager.enqueue('task', {'name': 'block-2'}, dedup_key='same')
+    assert error.value.job['id'] == first['id']
+
+    manager.enqueue('task', {'name': 'block-3'}, dedup_key='other')
+    with pytest.raises(JobQueueFull):
+        manager.enqueue('task', {'name': 'block-4'})
+
+def test_cancelled_deferred_job_frees_its_slot(gate):
+    manager, order = make_manager(gate)
+    blocker = manager.enqueue('task', {'name': 'block'})
+    wait_for(lambda: manager.get(blocker['id'])['status'] != JOB_QUEUED)
+    cancelled = manager.enqueue('task', {'name': 'cancelled'})
+    survivor = manager.enqueue('task', {'name': 'survivor'})
+    # Ambos esperan cupo en los diferidos del tipo
+    wait_for(lambda: len(manager._deferred['task']) == 2)
+
+    assert manager.cancel(cancelled['id'])['status'] == JOB_CANCELLED
+    assert [entry[2] for entry in manager._deferred['task']] == [survivor['id']]
+    gate.set()
+
+    wait_for(lambda: order == ['block', 'survivor'])
+    assert manager.active_count('task') == 0
+
+def test_recover_interrupts_running_and_resumes_queued(gate, tmp_path):
+    store = DatabaseManager(str(tmp_path / 'jobs.db'))
+    before, _ = make_manager(gate, store=store, max_workers=1)
+    running = before.enqueue('task', {'name': 'block'})
+    wait_for(lambda: store.get_job(running['id'])['status'] != JOB_QUEUED)
+    queued = before.enqueue('task', {'name': 'resumed'})
+
+    # Reinicio: un planificador nuevo sobre la misma base de datos
+    after, order = make_manager(gate, store=store)
+    after.recover()
+
+    wait_for(lambda: order == ['resumed'])
+    assert store.get_job(running['id'])['status'] == JOB_INTERRUPTED
+    wait_for(lambda: store.get_job(queued['id'])['status'] == JOB_COMPLETED)
+    assert store.get_job(queued['id'])['result'] == 'resumed'
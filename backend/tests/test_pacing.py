@@ -0,0 +1,71 @@
+import functools
+
+from conftest import profiles
+from pacing import AdaptivePacer, is_retryable_error
+
+class ApiError(Exception):
+    """Error con código HTTP, como los que lanza el cliente de Apify"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+def test_success_grows_batch_and_concurrency_additively():
+    pacer = AdaptivePacer(batch_size=50, batch_step=10, concurrency=2, max_concurrency=4, delay=4)
+
+    pacer.record_success(50, elapsed=10)
+    assert (pacer.batch_size, pacer.concurrency, pacer.delay) == (60, 2, 2)
+    # La concurrencia sube en uno por cada ronda completa de éxitos
+    pacer.record_success(60, elapsed=10)
+    assert (pacer.batch_size, pacer.concurrency, pacer.delay) == (70, 3, 1)
+
+def test_slow_success_shrinks_batch_to_target_time():
+    pacer = AdaptivePacer(batch_size=100, target_seconds=60)
+    pacer.record_success(100, elapsed=120)
+    assert pacer.batch_size == 50
+
+def test_rate_limit_and_server_errors_halve_batch_and_concurrency():
+    pacer = AdaptivePacer(batch_size=100, concurrency=4, max_concurrency=4, delay=2)
+
+    pacer.record_failure(ApiError('Too many requests', 429))
+    assert (pacer.batch_size, pacer.concurrency, pacer.delay) == (50, 2, 4)
+    pacer.record_failure(ApiError('Internal server error', 503))
+    assert (pacer.batch_size, pacer.concurrency, pacer.delay) == (25, 1, 8)
+    pacer.record_failure(retry_after=30)
+    assert pacer.delay == 30
+
+def test_limits_are_clamped():
+    pacer = AdaptivePacer(batch_size=500, min_batch_size=10, max_batch_size=200, batch_step=50,
+                          concurrency=1, max_concurrency=2, delay=500, min_delay=1, max_delay=60)
+    assert (pacer.batch_size, pacer.delay) == (200, 60)
+
+    for _ in range(10):
+        pacer.record_failure()
+    assert (pacer.batch_size, pacer.concurrency, pacer.delay) == (10, 1, 60)
+
+    for _ in range(10):
+        pacer.record_success(10, elapsed=1)
+    assert (pacer.batch_size, pacer.concurrency, pacer.delay) == (200, 2, 1)
+
+def test_retryable_errors():
+    assert is_retryable_error(ApiError('Too many requests', 429))
+    assert is_retryable_error(TimeoutError())
+    assert is_retryable_error(RuntimeError('Rate limit exceeded'))
+    assert not is_retryable_error(ApiError('Internal server error', 500))
+    assert not is_retryable_error(ValueError('Entrada inválida'))
+
+def test_rate_limited_batch_is_retried_up_to_the_cap(fake_apify, monkeypatch):
+    import main
+    from database import db_manager
+    db_manager.upsert_profiles_batch([dict(profile, profileUrl=profile['linkedinUrl'])
+                                      for profile in profiles('limitado', 3)])
+    fake_apify.email_error = ApiError('Too many requests', 429)
+    # Sin pausas entre reintentos
+    monkeypatch.setattr(main, 'AdaptivePacer', functools.partial(AdaptivePacer, max_delay=0))
+
+    summary = main.find_emails()
+
+    assert len(fake_apify.email_calls) == main.EMAIL_MAX_ATTEMPTS == 3
+    assert all(urls == fake_apify.email_calls[0] for urls in fake_apify.email_calls)
+    assert summary['failed'] == summary['total_urls'] == 3
+    assert summary['done'] == 0
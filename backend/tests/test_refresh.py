@@ -0,0 +1,18 @@
+from conftest import profiles
+
+SEARCH_URL = 'https://www.linkedin.com/search/results/people/?keywords=refresco%20diario'
+
+def test_incremental_refresh_skips_the_email_search(fake_apify):
+    import main
+    from database import db_manager
+    search_id = db_manager.create_search('diaria', '', SEARCH_URL)
+    fake_apify.reset(profiles('diaria', 3))
+    stages = []
+
+    result = main.scrape_linkedin_profiles(search_url=SEARCH_URL, search_id=search_id, incremental=True,
+                                           progress_callback=lambda **progress: stages.append(progress.get('stage')))
+
+    assert result == search_id
+    assert fake_apify.email_calls == []
+    assert 'enrichment' not in stages
+    assert db_manager.get_search_profile_count(search_id) == 3
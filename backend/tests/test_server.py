@@ -0,0 +1,50 @@
+import json
+
+from conftest import wait_for, wait_until_finished, profiles
+
+SEARCH_URL = 'https://www.linkedin.com/search/results/people/?keywords=data%20engineer'
+
+def read_events(response):
+    """Separar el stream SSE en pares (evento, datos), sin los keepalive"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+def test_scrape_job_streams_stages_until_finished(client, fake_apify):
+    fake_apify.reset(profiles('sse', 5))
+    fake_apify.release.clear()
+    started = client.post('/api/run-scraper', json={'urlsearch': SEARCH_URL, 'search_name': 'sse', 'force': True})
+    assert started.status_code == 200
+    job_id = started.get_json()['job_id']
+    wait_for(lambda: client.get(f'/api/jobs/{job_id}').get_json()['progress'].get('stage') == 'actor')
+
+    # El actor sigue detenido: el stream empieza con el trabajo en ejecución
+    response = client.get(f'/api/jobs/{job_id}/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    fake_apify.release.set()
+    events = read_events(response)
+
+    assert events[0][0] == 'snapshot'
+    assert events[0][1]['status'] == 'running'
+    # El evento de la etapa actor puede publicarse justo después de la suscripción
+    stages = [job['progress']['stage'] for name, job in events if name == 'stage']
+    assert [stage for stage in stages if stage != 'actor'] == ['ingest', 'enrichment']
+    name, finished = events[-1]
+    assert name == 'status'
+    assert finished['status'] == 'completed'
+    assert finished['result']['counts']['inserted'] == 5
+    assert set(finished['stages']) == {'actor', 'ingest', 'enrichment'}
+
+def test_events_of_finished_job_only_send_snapshot(client, fake_apify):
+    fake_apify.reset(profiles('fin', 1))
+    job_id = client.post('/api/run-scraper', json={'urlsearch': SEARCH_URL + '&page=2', 'search_name': 'fin',
+                                                   'force': True}).get_json()['job_id']
+    wait_until_finished(client, job_id)
+
+    events = read_events(client.get(f'/api/jobs/{job_id}/events'))
+    assert [name for name, _ in events] == ['snapshot']
+    assert events[0][1]['status'] == 'completed'
+    assert client.get('/api/jobs/no-existe/events').status_code == 404
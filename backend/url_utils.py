@@ -0,0 +1,72 @@
+"""Normalización de URLs de LinkedIn compartida por el scraper, el servidor y la base de datos"""
+
+from typing import Optional
+from urllib.parse import urlsplit, unquote, parse_qsl, urlencode
+
+# Parámetros de seguimiento de las URLs de búsqueda que no cambian los resultados
+_SEARCH_TRACKING_PARAMS = {'origin', 'sid', 'trk', 'trackingid', 'lipi', 'refid', 'searchid'}
+
+def canonicalize_profile_url(url: Optional[str]) -> Optional[str]:
+    """Forma canónica de la URL de un perfil: ``https://www.linkedin.com/in/<slug>``
+
+    Elimina query string, fragmento, barras finales y segmentos de idioma, y
+    unifica mayúsculas y subdominios (``es.linkedin.com``, ``linkedin.com``).
+    Los identificadores de miembro (``ACoAA...``) conservan sus mayúsculas
+    porque son sensibles a ellas. Devuelve None si la URL está vacía.
+    """
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip()
+    if not url:
+        return None
+    if '://' not in url:
+        url = 'https://' + url
+
+    parts = urlsplit(url)
+    host = parts.netloc.rsplit('@', 1)[-1].split(':')[0].lower()
+    if host == 'linkedin.com' or host.endswith('.linkedin.com'):
+        host = 'www.linkedin.com'
+
+    segments = [segment for segment in unquote(parts.path).split('/') if segment]
+    segments = [segment if segment.startswith('ACoAA') else segment.lower() for segment in segments]
+
+    if len(segments) >= 2 and segments[0] == 'in':
+        # /in/<slug>/<locale> y subrutas (/in/<slug>/details/...) apuntan al mismo perfil.
+        # Otras rutas se dejan completas: en las antiguas /pub/<nombre>/x/yy/zz el
+        # último segmento es parte del identificador aunque parezca un idioma
+        segments = segments[:2]
+
+    return f"https://{host}/" + '/'.join(segments)
+
+def canonicalize_search_url(url: Optional[str]) -> Optional[str]:
+    """Forma canónica de una URL de búsqueda de LinkedIn, para detectar búsquedas iguales.
+
+    Unifica el host como en ``canonicalize_profile_url``, quita el fragmento,
+    la barra final y los parámetros de seguimiento (``origin``, ``sid``...),
+    ordena los parámetros restantes y normaliza mayúsculas y espacios de
+    ``keywords``. Devuelve None si la URL está vacía.
+    """
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip()
+    if not url:
+        return None
+    if '://' not in url:
+        url = 'https://' + url
+
+    parts = urlsplit(url)
+    host = parts.netloc.rsplit('@', 1)[-1].split(':')[0].lower()
+    if host == 'linkedin.com' or host.endswith('.linkedin.com'):
+        host = 'www.linkedin.com'
+    path = '/'.join(segment for segment in unquote(parts.path).lower().split('/') if segment)
+
+    params = []
+    for key, value in parse_qsl(parts.query, keep_blank_values=False):
+        if key.lower() in _SEARCH_TRACKING_PARAMS:
+            continue
+        if key.lower() == 'keywords':
+            value = ' '.join(value.lower().split())
+        params.append((key, value))
+    query = urlencode(sorted(params))
+
+    return f"https://{host}/{path}" + (f"?{query}" if query else '')
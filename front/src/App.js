@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Container,
   Paper,
@@ -41,12 +41,16 @@ import {
   CloudUpload as CloudUploadIcon
 } from '@mui/icons-material';
 import axios from 'axios';
+import { pollJob } from './jobs';
 import ScraperConfig from './components/ScraperConfig';
 import SearchTabs from './components/SearchTabs';
 
 function App() {
   const [profiles, setProfiles] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [searching, setSearching] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [filteredProfiles, setFilteredProfiles] = useState([]);
   const [error, setError] = useState(null);
@@ -56,18 +60,27 @@ function App() {
   const [selectAll, setSelectAll] = useState(false);
   const [hubspotDialogOpen, setHubspotDialogOpen] = useState(false);
   const [hubspotResult, setHubspotResult] = useState(null);
+  const [hubspotProgress, setHubspotProgress] = useState(null);
   const [sendingToHubspot, setSendingToHubspot] = useState(false);
   const [isLoggedIn, setIsLoggedIn] = useState(!!sessionStorage.getItem('token'));
   const [loginLoading, setLoginLoading] = useState(false);
   const [loginError, setLoginError] = useState(null);
   const [loginUser, setLoginUser] = useState('');
   const [loginPass, setLoginPass] = useState('');
+  // Petición en curso de /api/profiles para el término actual
+  const searchRequestRef = useRef(null);
 
   useEffect(() => {
     checkStatus();
-    fetchProfiles();
   }, []);
 
+  // La búsqueda se resuelve en el servidor (índice de texto completo);
+  // se espera a que el usuario deje de escribir antes de consultar
+  useEffect(() => {
+    const timeout = setTimeout(() => fetchProfiles(searchTerm), searchTerm ? 300 : 0);
+    return () => clearTimeout(timeout);
+  }, [searchTerm]);
+
   useEffect(() => {
     if (!Array.isArray(profiles)) {
       console.error('Profiles is not an array:', profiles);
@@ -75,18 +88,7 @@ function App() {
       return;
     }
 
-    const filtered = profiles.filter(profile => {
-      if (!profile) return false;
-      
-      const searchLower = searchTerm.toLowerCase();
-      return (
-        (profile.fullName?.toLowerCase() || '').includes(searchLower) ||
-        (profile.headline?.toLowerCase() || '').includes(searchLower) ||
-        (profile.location?.toLowerCase() || '').includes(searchLower) ||
-        (profile.email?.toLowerCase() || '').includes(searchLower) ||
-        (profile.mobileNumber?.toLowerCase() || '').includes(searchLower)
-      );
-    });
+    const filtered = profiles.filter(profile => !!profile);
     setFilteredProfiles(filtered);
     
     // Actualizar selección cuando cambian los perfiles filtrados
@@ -99,9 +101,10 @@ function App() {
     
     // Actualizar estado de "seleccionar todo"
     setSelectAll(selectedContacts.length === filtered.length && filtered.length > 0);
-  }, [searchTerm, profiles]);
+  }, [profiles]);
 
   const API_URL = process.env.REACT_APP_API_URL || 'http://143.244.155.153:5000';
+  const PAGE_SIZE = 100;
 
   const checkStatus = async () => {
     try {
@@ -113,26 +116,66 @@ function App() {
     }
   };
 
-  const fetchProfiles = async () => {
+  const fetchProfiles = async (term = searchTerm) => {
+    // Una búsqueda nueva cancela la anterior (y su "cargar más"), así una respuesta
+    // lenta no pisa los resultados del término actual
+    searchRequestRef.current?.abort();
+    const controller = new AbortController();
+    searchRequestRef.current = controller;
     try {
-      setLoading(true);
+      // El spinner de página completa solo se muestra en la carga inicial
+      setSearching(true);
       setError(null);
-      const response = await axios.get(`${API_URL}/api/profiles`);
-      console.log('Profiles response:', response.data);
+      // Cargar solo la primera página; el resto se pide bajo demanda
+      const params = { limit: PAGE_SIZE };
+      if (term && term.trim()) {
+        params.q = term.trim();
+      }
+      const response = await axios.get(`${API_URL}/api/profiles`, { params, signal: controller.signal });
+      if (searchRequestRef.current !== controller) return;
       
       // Ensure we have an array of profiles
-      const profilesData = Array.isArray(response.data) ? response.data : [];
-      console.log('Processed profiles data:', profilesData);
+      const profilesData = Array.isArray(response.data?.profiles) ? response.data.profiles : [];
       
       setProfiles(profilesData);
       setFilteredProfiles(profilesData);
+      setNextCursor(response.data?.next_cursor || null);
     } catch (error) {
+      if (axios.isCancel(error)) return;
       console.error('Error fetching profiles:', error);
       setError(error.response?.data?.error || 'Error al cargar los perfiles');
       setProfiles([]);
       setFilteredProfiles([]);
+      setNextCursor(null);
     } finally {
-      setLoading(false);
+      if (searchRequestRef.current === controller) {
+        setLoading(false);
+        setSearching(false);
+      }
+    }
+  };
+
+  const fetchMoreProfiles = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const params = { limit: PAGE_SIZE, cursor: nextCursor };
+      if (searchTerm.trim()) {
+        params.q = searchTerm.trim();
+      }
+      const response = await axios.get(`${API_URL}/api/profiles`, {
+        params,
+        signal: searchRequestRef.current?.signal
+      });
+      const pageData = Array.isArray(response.data?.profiles) ? response.data.profiles : [];
+      setProfiles(prev => [...prev, ...pageData]);
+      setNextCursor(response.data?.next_cursor || null);
+    } catch (error) {
+      if (axios.isCancel(error)) return;
+      console.error('Error fetching more profiles:', error);
+      setError(error.response?.data?.error || 'Error al cargar más perfiles');
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -205,15 +248,22 @@ function App() {
     
     console.log('Enviando datos a HubSpot:', requestData);
 
+    setHubspotProgress(null);
+
     try {
+      // El envío se ejecuta como trabajo en segundo plano: consultar su progreso
       const response = await axios.post(`${API_URL}/api/send-to-hubspot`, requestData);
+      const job = await pollJob(
+        `${API_URL}/api/hubspot-jobs/${response.data.job_id}`,
+        (current) => setHubspotProgress(current.progress)
+      );
 
-      setHubspotResult(response.data);
+      setHubspotResult(job.result);
     } catch (error) {
       console.error('Error enviando a HubSpot:', error);
       setHubspotResult({
         success: false,
-        message: error.response?.data?.error || 'Error al enviar contactos a HubSpot'
+        message: error.response?.data?.error || error.message || 'Error al enviar contactos a HubSpot'
       });
     } finally {
       setSendingToHubspot(false);
@@ -324,7 +374,7 @@ function App() {
           Perfiles de LinkedIn
         </Typography>
         <Tooltip title="Actualizar datos">
-          <IconButton onClick={fetchProfiles} color="primary">
+          <IconButton onClick={() => fetchProfiles()} color="primary">
             <RefreshIcon />
           </IconButton>
         </Tooltip>
@@ -353,6 +403,7 @@ function App() {
               onChange={handleSearch}
               InputProps={{
                 startAdornment: <SearchIcon sx={{ mr: 1, color: 'text.secondary' }} />,
+                endAdornment: searching ? <CircularProgress size={20} /> : null,
               }}
             />
           </Box>
@@ -451,6 +502,18 @@ function App() {
                   </TableBody>
                 </Table>
               </TableContainer>
+              {nextCursor && (
+                <Box display="flex" justifyContent="center" sx={{ mt: 2 }}>
+                  <Button
+                    variant="outlined"
+                    onClick={fetchMoreProfiles}
+                    disabled={loadingMore}
+                    startIcon={loadingMore ? <CircularProgress size={20} /> : null}
+                  >
+                    {loadingMore ? 'Cargando...' : 'Cargar más perfiles'}
+                  </Button>
+                </Box>
+              )}
             </>
           )}
 
@@ -465,8 +528,13 @@ function App() {
                   <Alert severity="error">{hubspotResult.message}</Alert>
                 )
               ) : (
-                <Box display="flex" justifyContent="center" alignItems="center" py={3}>
+                <Box display="flex" flexDirection="column" justifyContent="center" alignItems="center" py={3}>
                   <CircularProgress />
+                  {hubspotProgress?.total > 0 && (
+                    <Typography variant="body2" sx={{ mt: 2 }}>
+                      {hubspotProgress.sent + hubspotProgress.failed} de {hubspotProgress.total} contactos procesados
+                    </Typography>
+                  )}
                 </Box>
               )}
             </DialogContent>
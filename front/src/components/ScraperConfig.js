@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Box,
   TextField,
@@ -11,6 +11,7 @@ import {
   LinearProgress,
 } from '@mui/material';
 import { PlayArrow as PlayArrowIcon } from '@mui/icons-material';
+import { ACTIVE_JOB_STATES, jobErrorMessage } from '../jobs';
 
 const ScraperConfig = ({ onScrapingComplete }) => {
   const [urlsearch, setUrlsearch] = useState('');
@@ -19,66 +20,118 @@ const ScraperConfig = ({ onScrapingComplete }) => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [status, setStatus] = useState(null);
-  const [pollingInterval, setPollingInterval] = useState(null);
   const [processId, setProcessId] = useState(null);
-  const [retryCount, setRetryCount] = useState(0);
+  const [progress, setProgress] = useState(null);
+  // El stream y el intervalo viven en refs: los callbacks siempre ven los actuales
+  const eventSourceRef = useRef(null);
+  const pollingRef = useRef(null);
   const MAX_RETRIES = 3;
 
+  const stopFollowing = () => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close();
+      eventSourceRef.current = null;
+    }
+    if (pollingRef.current) {
+      clearInterval(pollingRef.current);
+      pollingRef.current = null;
+    }
+  };
+
   useEffect(() => {
-    // Limpiar el intervalo cuando el componente se desmonte
-    return () => {
-      if (pollingInterval) {
-        clearInterval(pollingInterval);
-      }
-    };
-  }, [pollingInterval]);
+    // Cerrar el stream y el intervalo cuando el componente se desmonte
+    return stopFollowing;
+  }, []);
 
   const API_URL = process.env.REACT_APP_API_URL || 'http://143.244.155.153:5000';
 
-  const checkScrapingStatus = async () => {
-    try {
-      const response = await fetch(`${API_URL}/api/scraping-status`);
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
+  const STAGE_LABELS = {
+    actor: 'Ejecutando el scraper en LinkedIn',
+    ingest: 'Guardando perfiles',
+    enrichment: 'Buscando emails',
+  };
+
+  const formatProgress = (jobProgress) => {
+    if (!jobProgress || !jobProgress.stage) return 'En cola, esperando un turno...';
+    const label = STAGE_LABELS[jobProgress.stage] || jobProgress.stage;
+    if (jobProgress.profiles === undefined) return label;
+    return `${label}: ${jobProgress.profiles} perfiles procesados, ${jobProgress.inserted} nuevos`;
+  };
+
+  // Aplicar el estado de un trabajo recibido por el stream o por polling
+  const handleJobUpdate = (job) => {
+    setProgress(job.progress);
+
+    if (job.status === 'completed') {
+      // Dejar de seguir el trabajo y notificar que el scraping ha terminado
+      stopFollowing();
+      setLoading(false);
+      setStatus('success');
+      setProcessId(null);
+      if (onScrapingComplete) {
+        onScrapingComplete();
       }
-      const data = await response.json();
-      
-      if (data.status === 'success') {
-        // Limpiar el intervalo y notificar que el scraping ha terminado
-        clearInterval(pollingInterval);
-        setPollingInterval(null);
-        setLoading(false);
-        setStatus('success');
-        setProcessId(null);
-        setRetryCount(0);
-        if (onScrapingComplete) {
-          onScrapingComplete();
+    } else if (!ACTIVE_JOB_STATES.includes(job.status)) {
+      // Cualquier otro estado final (fallido, cancelado, interrumpido): dejar de
+      // seguir el trabajo y mostrar el error
+      stopFollowing();
+      setLoading(false);
+      setError(job.status === 'cancelled' ? 'El scraping fue cancelado' : jobErrorMessage(job));
+      setProcessId(null);
+    }
+    // Si el trabajo está en cola o en ejecución, seguimos esperando
+  };
+
+  // Alternativa al stream: consultar el trabajo cada 5 segundos
+  const startPolling = (jobId) => {
+    let retryCount = 0;
+
+    const checkScrapingStatus = async () => {
+      try {
+        const response = await fetch(`${API_URL}/api/jobs/${jobId}`);
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        retryCount = 0;
+        handleJobUpdate(await response.json());
+      } catch (error) {
+        console.error('Error checking scraping status:', error);
+        retryCount += 1;
+
+        // Si excedemos el número máximo de reintentos, dejar de consultar
+        if (retryCount > MAX_RETRIES) {
+          stopFollowing();
+          setLoading(false);
+          setError('Error al verificar el estado del scraping. Por favor, intente nuevamente.');
+          setProcessId(null);
         }
-      } else if (data.status === 'error') {
-        // Limpiar el intervalo y mostrar el error
-        clearInterval(pollingInterval);
-        setPollingInterval(null);
-        setLoading(false);
-        setError(data.error || 'Error durante el scraping');
-        setProcessId(null);
-        setRetryCount(0);
-      }
-      // Si el estado es 'running', continuamos con el polling
-    } catch (error) {
-      console.error('Error checking scraping status:', error);
-      // Incrementar el contador de reintentos
-      setRetryCount(prev => prev + 1);
-      
-      // Si excedemos el número máximo de reintentos, detener el polling
-      if (retryCount >= MAX_RETRIES) {
-        clearInterval(pollingInterval);
-        setPollingInterval(null);
-        setLoading(false);
-        setError('Error al verificar el estado del scraping. Por favor, intente nuevamente.');
-        setProcessId(null);
-        setRetryCount(0);
       }
+    };
+
+    pollingRef.current = setInterval(checkScrapingStatus, 5000);
+  };
+
+  // Cada scraping sigue su propio trabajo, así varias pestañas o scrapings
+  // simultáneos no se quitan los resultados entre sí. El servidor empuja los
+  // cambios por SSE; si el stream no está disponible se vuelve al polling
+  const followJob = (jobId) => {
+    stopFollowing();
+    if (!window.EventSource) {
+      startPolling(jobId);
+      return;
     }
+
+    const source = new EventSource(`${API_URL}/api/jobs/${jobId}/events`);
+    eventSourceRef.current = source;
+    const onJobEvent = (event) => handleJobUpdate(JSON.parse(event.data));
+    ['snapshot', 'status', 'stage', 'progress'].forEach((name) => source.addEventListener(name, onJobEvent));
+    source.onerror = () => {
+      // Conexión perdida antes de que el trabajo terminara: seguir por polling
+      if (eventSourceRef.current === source) {
+        stopFollowing();
+        startPolling(jobId);
+      }
+    };
   };
 
   const handleSubmit = async (e) => {
@@ -86,7 +139,7 @@ const ScraperConfig = ({ onScrapingComplete }) => {
     setLoading(true);
     setError(null);
     setStatus(null);
-    setRetryCount(0);
+    setProgress(null);
 
     try {
       const response = await fetch(`${API_URL}/api/run-scraper`, {
@@ -101,20 +154,24 @@ const ScraperConfig = ({ onScrapingComplete }) => {
         }),
       });
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-
       const data = await response.json();
 
-      if (data.error) {
-        setError(data.error);
+      if (!response.ok || data.error) {
+        setError(data.error || `HTTP error! status: ${response.status}`);
+        setLoading(false);
+      } else if (data.status === 'completed') {
+        // La búsqueda se scrapeó hace poco: el servidor devuelve lo guardado
         setLoading(false);
+        setStatus('success');
+        if (onScrapingComplete) {
+          onScrapingComplete();
+        }
       } else if (data.status === 'started') {
-        setProcessId(data.process_id);
-        // Iniciar el polling del estado
-        const interval = setInterval(checkScrapingStatus, 5000); // Verificar cada 5 segundos
-        setPollingInterval(interval);
+        // Si ya había un scraping igual en curso, el servidor devuelve ese trabajo
+        setProcessId(data.job_id);
+        setProgress(data.job && data.job.progress);
+        // Seguir el progreso del trabajo
+        followJob(data.job_id);
       }
     } catch (error) {
       console.error('Error starting scraping:', error);
@@ -123,6 +180,19 @@ const ScraperConfig = ({ onScrapingComplete }) => {
     }
   };
 
+  const handleCancel = async () => {
+    try {
+      const response = await fetch(`${API_URL}/api/jobs/${processId}/cancel`, { method: 'POST' });
+      if (!response.ok && response.status !== 409) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      // El stream (o el polling) recibe el estado 'cancelled' y detiene la espera
+    } catch (error) {
+      console.error('Error cancelling scraping:', error);
+      setError('Error al cancelar el scraping. Por favor, intente nuevamente.');
+    }
+  };
+
   return (
     <Paper elevation={3} sx={{ p: 3, maxWidth: 600, mx: 'auto', mt: 4 }}>
       <Typography variant="h5" gutterBottom>
@@ -175,6 +245,12 @@ const ScraperConfig = ({ onScrapingComplete }) => {
             {loading ? 'Ejecutando...' : 'Ejecutar Scraping'}
           </Button>
           
+          {loading && processId && (
+            <Button variant="outlined" color="secondary" onClick={handleCancel}>
+              Cancelar
+            </Button>
+          )}
+
           {loading && (
             <Typography variant="body2" color="textSecondary">
               El proceso puede tomar varios minutos...
@@ -187,6 +263,9 @@ const ScraperConfig = ({ onScrapingComplete }) => {
         <Box sx={{ mt: 2 }}>
           <LinearProgress />
           <Typography variant="body2" color="textSecondary" sx={{ mt: 1 }}>
+            {formatProgress(progress)}
+          </Typography>
+          <Typography variant="body2" color="textSecondary">
             Proceso ID: {processId}
           </Typography>
         </Box>
@@ -38,6 +38,7 @@ import {
   People as PeopleIcon,
   Email as EmailIcon,
 } from '@mui/icons-material';
+import { ACTIVE_JOB_STATES, jobErrorMessage } from '../jobs';
 
 const SearchManager = () => {
   const [searches, setSearches] = useState([]);
@@ -45,6 +46,8 @@ const SearchManager = () => {
   const [error, setError] = useState(null);
   const [selectedSearch, setSelectedSearch] = useState(null);
   const [searchProfiles, setSearchProfiles] = useState([]);
+  const [profilesCursor, setProfilesCursor] = useState(null);
+  const [loadingMoreProfiles, setLoadingMoreProfiles] = useState(false);
   const [showCreateDialog, setShowCreateDialog] = useState(false);
   const [showEditDialog, setShowEditDialog] = useState(false);
   const [showProfilesDialog, setShowProfilesDialog] = useState(false);
@@ -52,6 +55,7 @@ const SearchManager = () => {
   const [editSearch, setEditSearch] = useState({});
   const [statistics, setStatistics] = useState({});
   const [emailSearchLoading, setEmailSearchLoading] = useState(false);
+  const [emailJob, setEmailJob] = useState(null);
 
   useEffect(() => {
     fetchSearches();
@@ -59,6 +63,7 @@ const SearchManager = () => {
   }, []);
 
   const API_URL = process.env.REACT_APP_API_URL || 'http://143.244.155.153:5000';
+  const PAGE_SIZE = 100;
 
   const fetchSearches = async () => {
     try {
@@ -85,17 +90,30 @@ const SearchManager = () => {
     }
   };
 
-  const fetchSearchProfiles = async (searchId) => {
+  // El endpoint devuelve páginas de PAGE_SIZE perfiles; con cursor se pide la siguiente
+  const fetchSearchProfiles = async (searchId, cursor = null) => {
     try {
-      const response = await fetch(`${API_URL}/api/searches/${searchId}/profiles`);
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${API_URL}/api/searches/${searchId}/profiles?${params}`);
       if (!response.ok) throw new Error('Error al obtener perfiles de la búsqueda');
       const data = await response.json();
-      setSearchProfiles(data);
+      const page = Array.isArray(data.profiles) ? data.profiles : [];
+      setSearchProfiles(prev => (cursor ? [...prev, ...page] : page));
+      setProfilesCursor(data.next_cursor || null);
     } catch (error) {
+      setProfilesCursor(null);
       setError('Error al cargar perfiles: ' + error.message);
     }
   };
 
+  const fetchMoreSearchProfiles = async () => {
+    if (!profilesCursor || loadingMoreProfiles || !selectedSearch) return;
+    setLoadingMoreProfiles(true);
+    await fetchSearchProfiles(selectedSearch.id, profilesCursor);
+    setLoadingMoreProfiles(false);
+  };
+
   const handleCreateSearch = async () => {
     try {
       const response = await fetch(`${API_URL}/api/searches`, {
@@ -151,6 +169,33 @@ const SearchManager = () => {
     }
   };
 
+  // Consultar el trabajo de búsqueda de emails hasta que termine
+  useEffect(() => {
+    if (!emailJob || !ACTIVE_JOB_STATES.includes(emailJob.status)) return undefined;
+
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${API_URL}/api/email-jobs/${emailJob.id}`);
+        if (!response.ok) throw new Error('Error al consultar la búsqueda de emails');
+        const job = await response.json();
+        setEmailJob(job);
+        // Cualquier estado fuera de queued/running es final (incluye cancelado e interrumpido)
+        if (job.status === 'completed') {
+          setEmailSearchLoading(false);
+          fetchStatistics();
+        } else if (!ACTIVE_JOB_STATES.includes(job.status)) {
+          setEmailSearchLoading(false);
+          setError('Error al ejecutar búsqueda de emails: ' + jobErrorMessage(job));
+        }
+      } catch (error) {
+        setEmailSearchLoading(false);
+        setError(error.message);
+      }
+    }, 3000);
+
+    return () => clearTimeout(timer);
+  }, [emailJob]);
+
   const handleRunEmailSearch = async () => {
     try {
       setEmailSearchLoading(true);
@@ -164,20 +209,24 @@ const SearchManager = () => {
       if (!response.ok) throw new Error('Error al ejecutar búsqueda de emails');
       
       const data = await response.json();
-      if (data.status === 'success') {
-        setError(null);
-        // Recargar estadísticas después de la búsqueda
-        fetchStatistics();
+      if (data.status === 'accepted') {
+        setEmailJob(data.job);
       } else {
         throw new Error(data.error || 'Error desconocido');
       }
     } catch (error) {
       setError('Error al ejecutar búsqueda de emails: ' + error.message);
-    } finally {
       setEmailSearchLoading(false);
     }
   };
 
+  const formatEmailProgress = (progress) => {
+    if (!progress || !progress.total_urls) return 'Buscando...';
+    const finished = (progress.done || 0) + (progress.failed || 0);
+    const eta = progress.eta_seconds != null ? ` · ~${Math.ceil(progress.eta_seconds / 60)} min` : '';
+    return `${finished}/${progress.total_urls}${eta}`;
+  };
+
   const handleViewProfiles = (search) => {
     setSelectedSearch(search);
     fetchSearchProfiles(search.id);
@@ -271,8 +320,13 @@ const SearchManager = () => {
                 disabled={emailSearchLoading}
                 fullWidth
               >
-                {emailSearchLoading ? 'Buscando...' : 'Buscar Emails'}
+                {emailSearchLoading ? formatEmailProgress(emailJob?.progress) : 'Buscar Emails'}
               </Button>
+              {emailJob?.progress?.failed > 0 && (
+                <Typography variant="caption" display="block" color="error">
+                  {emailJob.progress.failed} URLs fallidas
+                </Typography>
+              )}
             </CardContent>
           </Card>
         </Grid>
@@ -327,8 +381,13 @@ const SearchManager = () => {
                         startIcon={<PeopleIcon />}
                         onClick={() => handleViewProfiles(search)}
                       >
-                        Ver Perfiles
+                        Ver Perfiles ({search.profile_count || 0})
                       </Button>
+                      {search.last_found_at && (
+                        <Typography variant="caption" display="block" color="textSecondary">
+                          Último: {formatDate(search.last_found_at)}
+                        </Typography>
+                      )}
                     </TableCell>
                     <TableCell>
                       {formatDate(search.created_at)}
@@ -432,6 +491,20 @@ const SearchManager = () => {
             <option value="inactive">Inactiva</option>
             <option value="completed">Completada</option>
           </TextField>
+          <TextField
+            fullWidth
+            label="Refresco automático"
+            value={editSearch.refresh_interval_hours || 0}
+            onChange={(e) => setEditSearch({ ...editSearch, refresh_interval_hours: Number(e.target.value) })}
+            margin="normal"
+            select
+            SelectProps={{ native: true }}
+            helperText="Las búsquedas activas se vuelven a scrapear buscando solo perfiles nuevos"
+          >
+            <option value={0}>Nunca</option>
+            <option value={24}>Diario</option>
+            <option value={168}>Semanal</option>
+          </TextField>
         </DialogContent>
         <DialogActions>
           <Button onClick={() => setShowEditDialog(false)}>Cancelar</Button>
@@ -478,6 +551,19 @@ const SearchManager = () => {
             </Table>
           </TableContainer>
           
+          {profilesCursor && (
+            <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+              <Button
+                variant="outlined"
+                onClick={fetchMoreSearchProfiles}
+                disabled={loadingMoreProfiles}
+                startIcon={loadingMoreProfiles ? <CircularProgress size={20} /> : null}
+              >
+                {loadingMoreProfiles ? 'Cargando...' : 'Cargar más perfiles'}
+              </Button>
+            </Box>
+          )}
+          
           {searchProfiles.length === 0 && (
             <Typography variant="body2" color="textSecondary" sx={{ textAlign: 'center', py: 3 }}>
               No se encontraron perfiles para esta búsqueda
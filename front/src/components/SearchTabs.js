@@ -28,6 +28,7 @@ import {
   LinkedIn as LinkedInIcon,
 } from '@mui/icons-material';
 import axios from 'axios';
+import { pollJob } from '../jobs';
 
 function a11yProps(index) {
   return {
@@ -40,9 +41,12 @@ const SearchTabs = ({ selectedContacts, setSelectedContacts }) => {
   const [searches, setSearches] = useState([]);
   const [selectedIndex, setSelectedIndex] = useState(0);
   const [profiles, setProfiles] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(false);
   const [hubspotDialogOpen, setHubspotDialogOpen] = useState(false);
   const [hubspotResult, setHubspotResult] = useState(null);
+  const [hubspotProgress, setHubspotProgress] = useState(null);
   const [sendingToHubspot, setSendingToHubspot] = useState(false);
   const [selectAll, setSelectAll] = useState(false);
 
@@ -58,6 +62,7 @@ const SearchTabs = ({ selectedContacts, setSelectedContacts }) => {
   }, [searches]);
 
   const API_URL = process.env.REACT_APP_API_URL || 'http://143.244.155.153:5000';
+  const PAGE_SIZE = 100;
 
   const fetchSearches = async () => {
     try {
@@ -73,15 +78,33 @@ const SearchTabs = ({ selectedContacts, setSelectedContacts }) => {
   const fetchProfiles = async (searchId) => {
     setLoading(true);
     try {
-      const response = await fetch(`${API_URL}/api/searches/${searchId}/profiles`);
+      const response = await fetch(`${API_URL}/api/searches/${searchId}/profiles?limit=${PAGE_SIZE}`);
       const data = await response.json();
-      setProfiles(data);
+      setProfiles(Array.isArray(data.profiles) ? data.profiles : []);
+      setNextCursor(data.next_cursor || null);
     } catch (err) {
       setProfiles([]);
+      setNextCursor(null);
     }
     setLoading(false);
   };
 
+  const fetchMoreProfiles = async () => {
+    if (!nextCursor || loadingMore || searches.length === 0) return;
+    setLoadingMore(true);
+    try {
+      const searchId = searches[selectedIndex].id;
+      const params = new URLSearchParams({ limit: PAGE_SIZE, cursor: nextCursor });
+      const response = await fetch(`${API_URL}/api/searches/${searchId}/profiles?${params}`);
+      const data = await response.json();
+      setProfiles(prev => [...prev, ...(Array.isArray(data.profiles) ? data.profiles : [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      setNextCursor(null);
+    }
+    setLoadingMore(false);
+  };
+
   const handleTabChange = (event, newIndex) => {
     setSelectedIndex(newIndex);
     fetchProfiles(searches[newIndex].id);
@@ -119,18 +142,21 @@ const SearchTabs = ({ selectedContacts, setSelectedContacts }) => {
     setSendingToHubspot(true);
     setHubspotDialogOpen(true);
     setHubspotResult(null);
+    setHubspotProgress(null);
     try {
+      // El envío se ejecuta como trabajo en segundo plano: consultar su progreso
       const response = await axios.post(`${API_URL}/api/send-to-hubspot`, {
         contacts: selectedProfilesData
       });
-      setHubspotResult({
-        success: true,
-        message: `Se enviaron ${selectedProfilesData.length} contactos a HubSpot exitosamente.`
-      });
+      const job = await pollJob(
+        `${API_URL}/api/hubspot-jobs/${response.data.job_id}`,
+        (current) => setHubspotProgress(current.progress)
+      );
+      setHubspotResult(job.result);
     } catch (error) {
       setHubspotResult({
         success: false,
-        message: error.response?.data?.error || 'Error al enviar a HubSpot'
+        message: error.response?.data?.error || error.message || 'Error al enviar a HubSpot'
       });
     } finally {
       setSendingToHubspot(false);
@@ -273,6 +299,18 @@ const SearchTabs = ({ selectedContacts, setSelectedContacts }) => {
                 </TableBody>
               </Table>
             </TableContainer>
+            {nextCursor && (
+              <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+                <Button
+                  variant="outlined"
+                  onClick={fetchMoreProfiles}
+                  disabled={loadingMore}
+                  startIcon={loadingMore ? <CircularProgress size={20} /> : null}
+                >
+                  {loadingMore ? 'Cargando...' : 'Cargar más perfiles'}
+                </Button>
+              </Box>
+            )}
           </>
         )}
       </Box>
@@ -288,8 +326,13 @@ const SearchTabs = ({ selectedContacts, setSelectedContacts }) => {
               <Alert severity="error">{hubspotResult.message}</Alert>
             )
           ) : (
-            <Box display="flex" justifyContent="center" alignItems="center" py={3}>
+            <Box display="flex" flexDirection="column" justifyContent="center" alignItems="center" py={3}>
               <CircularProgress />
+              {hubspotProgress?.total > 0 && (
+                <Typography variant="body2" sx={{ mt: 2 }}>
+                  {hubspotProgress.sent + hubspotProgress.failed} de {hubspotProgress.total} contactos procesados
+                </Typography>
+              )}
             </Box>
           )}
         </DialogContent>
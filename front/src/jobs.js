@@ -0,0 +1,25 @@
+import axios from 'axios';
+
+// Estados de un trabajo que todavía no terminó
+export const ACTIVE_JOB_STATES = ['queued', 'running'];
+
+// Mensaje de error de un trabajo terminado sin completarse
+export const jobErrorMessage = (job) => {
+  if (job.status === 'cancelled') return 'El trabajo fue cancelado';
+  if (job.status === 'interrupted') return job.error || 'El servidor se reinició antes de terminar el trabajo';
+  return job.error || 'El trabajo falló';
+};
+
+// Consulta un trabajo en segundo plano hasta que termina.
+// onProgress recibe el trabajo en cada consulta; la promesa se resuelve con el
+// trabajo completado o se rechaza si termina de cualquier otra forma
+// (fallido, cancelado o interrumpido por un reinicio).
+export const pollJob = async (jobUrl, onProgress, interval = 2000) => {
+  for (;;) {
+    const { data: job } = await axios.get(jobUrl);
+    if (onProgress) onProgress(job);
+    if (job.status === 'completed') return job;
+    if (!ACTIVE_JOB_STATES.includes(job.status)) throw new Error(jobErrorMessage(job));
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+};